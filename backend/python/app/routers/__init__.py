@@ -1,2 +1 @@
 # Routers package
-from . import health, transcription
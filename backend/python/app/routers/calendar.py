@@ -0,0 +1,34 @@
+import os
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException
+from typing import Optional
+from app.services.providers import LazyService
+
+# The Google client libraries load with the first calendar request, not at startup
+calendar_service = LazyService("app.services.calendar_service", "calendar_service")
+
+router = APIRouter()
+
+@router.post("/notifications")
+async def calendar_notification(
+    background_tasks: BackgroundTasks,
+    x_goog_resource_state: Optional[str] = Header(None),
+    x_goog_channel_token: Optional[str] = Header(None),
+):
+    """Receiver for Google Calendar push (watch) notifications.
+
+    Google only tells us *that* something changed; the incremental sync
+    picks up what changed.
+    """
+    # Without a configured channel token anyone could trigger full syncs, so refuse
+    expected_token = os.getenv("CALENDAR_WEBHOOK_TOKEN")
+    if not expected_token or x_goog_channel_token != expected_token:
+        raise HTTPException(status_code=403, detail="Invalid channel token")
+
+    if x_goog_resource_state in ("exists", "not_exists"):
+        background_tasks.add_task(calendar_service.refresh, True)
+    return {"status": "ok"}
+
+@router.get("/stats")
+async def calendar_stats():
+    """Sync counters for the local calendar cache"""
+    return calendar_service.stats()
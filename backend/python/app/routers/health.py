@@ -1,7 +1,52 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services.http_client import http_client
+from app.services.metrics import metrics
 
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "JARVIS Backend"}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Latency histograms and error/cache counters in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/health/http")
+async def http_pool_stats():
+    """Connection pool statistics for outbound HTTP calls"""
+    return http_client.stats()
+
+@router.get("/health/tokens")
+async def token_stats():
+    """Expiry and refresh counters for the OAuth tokens the backend holds"""
+    from app.services.spotify_service import spotify_service
+    from app.services.calendar_service import calendar_service
+    return {"spotify": spotify_service.tokens.stats(), "google_calendar": calendar_service.tokens.stats()}
+
+@router.get("/health/llm")
+async def llm_provider_stats():
+    """Breaker state, latency percentiles and hedge/fallback counters per LLM provider"""
+    from app.services.llm_router import llm_router
+    return llm_router.stats()
+
+@router.get("/health/coalescing")
+async def coalescing_stats():
+    """Upstream calls made vs. saved by joining an identical in-flight request"""
+    from app.services.ai_service import ai_service
+    from app.services.tts_service import tts_service
+    return {"llm": ai_service.flights.stats(), "tts": tts_service.flights.stats()}
+
+@router.get("/health/auth")
+async def auth_cache_stats():
+    """Signing key freshness and verified-token cache counters"""
+    from app.services.firebase_auth import firebase_verifier
+    return firebase_verifier.stats()
+
+@router.get("/health/limits")
+async def rate_limit_stats():
+    """Per-user budget refusals and upstream admission queue depth"""
+    from app.utils.rate_limit import rate_limiter
+    return rate_limiter.stats()
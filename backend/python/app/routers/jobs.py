@@ -0,0 +1,97 @@
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Depends
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import Optional
+from app.services.providers import LazyService
+from app.utils.auth import verify_firebase_token, verify_websocket_token
+
+router = APIRouter()
+job_queue = LazyService("app.services.job_queue", "job_queue")
+
+# Upper bound for long-polling, below typical proxy/serverless timeouts
+MAX_WAIT_SECONDS = 25.0
+
+class JobRequest(BaseModel):
+    kind: str
+    arg: str = ""
+    priority: Optional[int] = None
+
+@router.post("")
+async def submit_job(request: JobRequest, uid: str = Depends(verify_firebase_token)):
+    """Queue a job (e.g. CALENDAR_SYNC, TTS_RENDER); poll or watch its id for the result.
+    Jobs spend upstream quota (TTS, Google), so submitting needs a signed-in user."""
+    if request.kind not in job_queue.handlers:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind. Available: {sorted(job_queue.handlers)}")
+    job = await job_queue.submit(request.kind, request.arg, request.priority)
+    return JSONResponse(job.to_dict(), status_code=202)
+
+@router.get("/stats")
+async def job_stats():
+    """Queue depth, retries and outcomes since startup"""
+    return job_queue.stats()
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, wait: float = 0, uid: str = Depends(verify_firebase_token)):
+    """Job status and result; with `wait`, hold the request until it finishes (long-polling)"""
+    if wait > 0:
+        job = await job_queue.wait(job_id, min(wait, MAX_WAIT_SECONDS))
+    else:
+        job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.websocket("/ws")
+async def watch_jobs(websocket: WebSocket):
+    """
+    Push job updates. Send {"type": "watch", "job_id": ...} for each job of
+    interest; the server replies with {"type": "job", "job": {...}} right away
+    and again on every status change until the job is done or failed.
+    Needs the same sign-in as submitting (Authorization header or ?token=).
+    """
+    if await verify_websocket_token(websocket) is None:
+        # Closing before accept refuses the handshake (HTTP 403)
+        await websocket.close(code=1008, reason="Unauthorized")
+        return
+    await websocket.accept()
+    watched = set()
+    updates: asyncio.Queue = asyncio.Queue()
+
+    def on_change(job):
+        if job.id in watched:
+            updates.put_nowait(job.to_dict())
+
+    async def push():
+        while True:
+            job = await updates.get()
+            if job["status"] in ("done", "failed"):
+                watched.discard(job["id"])
+            await websocket.send_json({"type": "job", "job": job})
+
+    job_queue.subscribe(on_change)
+    pusher = asyncio.create_task(push())
+    try:
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                await websocket.send_json({"type": "error", "message": "Messages must be JSON objects"})
+                continue
+            if data.get("type") != "watch" or not isinstance(data.get("job_id"), str):
+                continue
+            job = await job_queue.get(data["job_id"])
+            if job is None:
+                await websocket.send_json({"type": "error", "job_id": data["job_id"], "message": "Job not found"})
+                continue
+            if not job.finished:
+                watched.add(job.id)
+            updates.put_nowait(job.to_dict())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        job_queue.unsubscribe(on_change)
+        pusher.cancel()
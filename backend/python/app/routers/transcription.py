@@ -1,8 +1,37 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
 from typing import Optional
+import io
 import os
+import json
+import math
+import asyncio
+from app.services.metrics import transcription_seconds, errors_total
+from app.utils.log import get_logger
+from app.utils.rate_limit import rate_limiter, Overloaded, RateLimited, STREAM_SEGMENT_RULE, STREAM_CHAT_RULE
 
 router = APIRouter()
+log = get_logger("transcription")
+
+# Groq rejects audio files over 25 MB, so there is no point accepting more
+MAX_UPLOAD_BYTES = int(os.getenv("TRANSCRIBE_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+# Optional: trim silence and shrink audio to 16 kHz mono before sending it to Whisper
+PREPROCESS = os.getenv("TRANSCRIBE_PREPROCESS", "false") == "true"
+# Decoding holds the whole clip in memory, so only preprocess uploads up to this size
+PREPROCESS_MAX_BYTES = int(os.getenv("TRANSCRIBE_PREPROCESS_MAX_BYTES", str(10 * 1024 * 1024)))
+# Telephone to studio rates; outside this range the VAD's 30 ms frames degenerate
+MIN_STREAM_SAMPLE_RATE, MAX_STREAM_SAMPLE_RATE = 8000, 48000
+
+def _transcribe_file(client, filename: str, audio_file):
+    # The upload is already spooled (memory up to 1 MB, then a temp file);
+    # hand the file object over as-is so it's streamed rather than copied
+    audio_file.seek(0)
+    return client.audio.transcriptions.create(
+        file=(filename, audio_file),
+        model="whisper-large-v3-turbo",
+        response_format="json",
+        language="en",
+        temperature=0.0
+    )
 
 # In a real implementation, this would call the Whisper service
 @router.post("/transcribe")
@@ -15,32 +44,161 @@ async def transcribe_audio(
     """
     try:
         from app.services.ai_service import ai_service
-        
+        from app.services.streaming_transcription import transcription_slots
+        from app.services.audio_preprocessing import preprocess_audio
+
         if not ai_service.client:
              raise HTTPException(status_code=500, detail="Groq client not initialized")
 
-        # Read file content into memory
-        file_content = await audio.read()
-        
-        # Send directly to Groq without saving to disk
-        transcription = ai_service.client.audio.transcriptions.create(
-            file=(audio.filename, file_content),
-            model="whisper-large-v3-turbo",
-            response_format="json",
-            language="en",
-            temperature=0.0
-        )
-
-        print(f"Transcribed: {transcription.text}")
-        return {
+        if audio.size is not None and audio.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+
+        filename, audio_file = audio.filename, audio.file
+        preprocessed = None
+        if PREPROCESS and audio.size is not None and audio.size <= PREPROCESS_MAX_BYTES:
+            preprocessed = await asyncio.to_thread(preprocess_audio, audio.file, audio.size)
+            if preprocessed:
+                filename, audio_file = preprocessed.filename, io.BytesIO(preprocessed.data)
+                log.info("Audio preprocessed", extra={"sampled": True, **preprocessed.report()})
+
+        # Blocking SDK call runs off the event loop, bounded by the semaphore
+        async with transcription_slots:
+            with transcription_seconds.time(mode="upload"):
+                transcription = await asyncio.to_thread(
+                    _transcribe_file, ai_service.client, filename, audio_file
+                )
+
+        log.info("Transcribed upload", extra={"sampled": True, "chars": len(transcription.text)})
+        log.debug("transcription: %s", transcription.text)
+        result = {
             "success": True,
             "transcription": transcription.text,
             "language": language
         }
+        if preprocessed:
+            result["preprocessing"] = preprocessed.report()
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
-        error_msg = f"Transcription Error: {str(e)}"
-        print(error_msg)
+        errors_total.inc(component="transcription", kind=type(e).__name__)
+        log.error("Transcription error: %s", e)
         # Verify if it's an API Key issue
         if "401" in str(e):
              raise HTTPException(status_code=500, detail="Groq API Key Invalid or Missing on Vercel")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await audio.close()
+
+@router.websocket("/transcribe/stream")
+async def transcribe_stream(
+    websocket: WebSocket,
+    sample_rate: int = 16000,
+    format: str = "pcm16",
+    auto_chat: bool = True,
+):
+    """
+    Real-time transcription. Send binary audio frames (16-bit mono PCM, or
+    Opus with opuslib installed); optional text messages:
+    {"type": "config", "context": {...}, "history": [...]} and
+    {"type": "end"} to close the turn early.
+
+    The server replies with {"type": "partial"} per speech segment, then
+    {"type": "final"} when the turn ends (long pause or "end"), followed by
+    {"type": "chat", "event": ..., "data": ...} from the chat pipeline.
+
+    Each segment and chat turn is charged to the caller's budgets and queues
+    on its upstream gate like the HTTP routes. Once a budget is spent the
+    socket is closed with 1008 (1013 when an upstream is shedding load).
+    """
+    from app.services.streaming_transcription import TranscriptionSession, whisper_transcribe
+
+    if not MIN_STREAM_SAMPLE_RATE <= sample_rate <= MAX_STREAM_SAMPLE_RATE:
+        # Closing before accept refuses the handshake (HTTP 403)
+        await websocket.close(code=1008, reason=f"sample_rate must be {MIN_STREAM_SAMPLE_RATE}-{MAX_STREAM_SAMPLE_RATE}")
+        return
+
+    await websocket.accept()
+    context, history = {}, []
+    identity = await rate_limiter.identify(websocket.scope)
+    refused = []  # set once the connection is closed for exceeding a budget
+
+    async def send(message: dict):
+        if not refused:
+            await websocket.send_json(message)
+
+    async def refuse(e: Overloaded):
+        if refused:
+            return
+        refused.append(e)
+        code, detail = (1008, "Rate limit exceeded") if isinstance(e, RateLimited) else (1013, "Server busy")
+        await websocket.close(code=code, reason=f"{detail}; retry after {math.ceil(e.retry_after)}s")
+
+    async def transcribe(samples, rate: int) -> str:
+        if refused:
+            return ""
+        try:
+            async with rate_limiter.charge(identity, STREAM_SEGMENT_RULE, len(samples) / rate):
+                return await whisper_transcribe(samples, rate)
+        except Overloaded as e:
+            await refuse(e)
+            return ""
+
+    def new_session():
+        return TranscriptionSession(sample_rate, format, send=send, transcribe=transcribe)
+
+    try:
+        session = new_session()
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close(code=1003)
+        return
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect" or refused:
+                break
+
+            end_requested = False
+            if message.get("bytes"):
+                session.feed(message["bytes"])
+            elif message.get("text"):
+                try:
+                    data = json.loads(message["text"])
+                except ValueError:
+                    data = None
+                if not isinstance(data, dict):
+                    await send({"type": "error", "message": "Text frames must be JSON objects"})
+                    continue
+                if data.get("type") == "config":
+                    context = data.get("context") if isinstance(data.get("context"), dict) else {}
+                    history = data.get("history") if isinstance(data.get("history"), list) else []
+                end_requested = data.get("type") == "end"
+
+            if not (end_requested or session.turn_ended):
+                continue
+
+            text = await session.finish()
+            session = new_session()
+            if refused:
+                break
+            if auto_chat and text:
+                from app.services.ai_service import ai_service
+                prompt_bytes = len(text.encode("utf-8")) + len(json.dumps(history).encode("utf-8"))
+                try:
+                    async with rate_limiter.charge(identity, STREAM_CHAT_RULE, prompt_bytes):
+                        async for event in ai_service.stream_chat(text, context, history):
+                            await send({"type": "chat", "event": event["event"], "data": event["data"]})
+                            if event["event"] == "done":
+                                history = history + [
+                                    {"role": "user", "content": text},
+                                    {"role": "assistant", "content": event["data"]["response"]},
+                                ]
+                except Overloaded as e:
+                    await refuse(e)
+                    break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.cancel()
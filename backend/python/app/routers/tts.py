@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, Body
-from fastapi.responses import Response
-from app.services.tts_service import tts_service
+from fastapi.responses import Response, FileResponse
+from app.services.providers import LazyService
 from pydantic import BaseModel
 
 router = APIRouter()
+tts_service = LazyService("app.services.tts_service", "tts_service")
 
 class TTSRequest(BaseModel):
     text: str
@@ -13,10 +14,14 @@ class TTSRequest(BaseModel):
 async def text_to_speech(request: TTSRequest):
     """Convert text to speech and return audio file"""
     try:
-        audio_content = await tts_service.text_to_speech(
+        audio_content, cached_path = await tts_service.speak(
             text=request.text,
             # Use provided voice_id or fall back to env/default in service
         )
+
+        # Disk-tier cache hit: let the server stream the file directly
+        if cached_path:
+            return FileResponse(cached_path, media_type="audio/mpeg")
         
         if not audio_content:
             raise HTTPException(status_code=500, detail="Failed to generate speech")
@@ -24,3 +29,8 @@ async def text_to_speech(request: TTSRequest):
         return Response(content=audio_content, media_type="audio/mpeg")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters for the TTS audio cache"""
+    return tts_service.cache.stats()
@@ -1,2 +1,3 @@
 # Services package
-from . import ai_service
+# Submodules are imported where they are used (see providers.LazyService), so
+# importing one service never loads the others or their dependencies.
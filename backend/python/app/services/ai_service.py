@@ -1,120 +1,384 @@
 import os
+import asyncio
+import time
 import httpx
-import re
-from groq import Groq
-from typing import Dict, Any
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
+from app.services.prefetch_service import tool_prefetcher, Prefetch
+from app.services.history_service import HistoryManager
+from app.services.prompt_service import system_messages, sanitize_history
+from app.services.metrics import llm_request_seconds, llm_first_token_seconds, errors_total
+from app.services.llm_router import llm_router
+from app.services.singleflight import SingleFlight, content_key
+from app.utils.log import get_logger
+from app.services.response_cache import response_cache
+from app.services.tool_service import (
+    tool_registry, ToolCall, ToolResult, CMD_PATTERN, followup_prompt, unhandled_markers, strip_markers
+)
+
+log = get_logger("ai")
+
+# Fallback replies returned instead of raising; never worth storing or caching
+ERROR_RESPONSE_PREFIXES = ("I'm having trouble thinking right now.", "Error: GROQ_API_KEY")
+
+CMD_PREFIX = "[CMD:"
+# Give up waiting for a closing "]" after this many characters and emit as text
+MAX_PENDING_CMD = 256
+
+class CommandStreamParser:
+    """Split a token stream into plain text and complete [CMD: ...] markers.
+
+    Text that might be the start of a marker is held back until it either
+    closes or clearly isn't one, so markers are never split across events.
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, chunk: str) -> list[tuple]:
+        self._pending += chunk
+        parts = []
+        while self._pending:
+            idx = self._pending.find("[")
+            if idx == -1:
+                parts.append(("text", self._pending))
+                self._pending = ""
+                break
+            if idx > 0:
+                parts.append(("text", self._pending[:idx]))
+                self._pending = self._pending[idx:]
+
+            if len(self._pending) < len(CMD_PREFIX):
+                if CMD_PREFIX.startswith(self._pending):
+                    break  # could still become a marker
+            elif self._pending.startswith(CMD_PREFIX):
+                end = self._pending.find("]")
+                if end == -1:
+                    if len(self._pending) <= MAX_PENDING_CMD:
+                        break  # marker still arriving
+                    parts.append(("text", self._pending))
+                    self._pending = ""
+                    break
+                raw = self._pending[:end + 1]
+                self._pending = self._pending[end + 1:]
+                match = CMD_PATTERN.fullmatch(raw)
+                if match:
+                    parts.append(("command", match.group(1), (match.group(2) or "").strip(), raw))
+                else:
+                    parts.append(("text", raw))
+                continue
+
+            # A "[" that is not a marker
+            parts.append(("text", self._pending[0]))
+            self._pending = self._pending[1:]
+        return parts
+
+    def flush(self) -> list[tuple]:
+        parts = [("text", self._pending)] if self._pending else []
+        self._pending = ""
+        return parts
 
 class AIService:
     def __init__(self):
         self.api_key = os.getenv("GROQ_API_KEY")
-        if self.api_key:
-            self.client = Groq(api_key=self.api_key)
-        else:
-            self.client = None
+        # Per-request budget for one completion, and how many may be in flight at once
+        self.timeout = float(os.getenv("LLM_TIMEOUT", "20"))
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = None
+        # Trims history to a token budget and summarizes older turns in the background
+        self.history = HistoryManager(summarize=self._summarize_turns)
+        # Identical concurrent prompts (broadcasts, several devices) share one completion
+        self.flights = SingleFlight("llm")
+
+    @property
+    def client(self):
+        """Sync Groq client for the Whisper transcription routes; chat goes through llm_router.
+        Created on first use so chat-only cold starts don't import the SDK."""
+        if self._client is None and self.api_key:
+            from groq import Groq
+            self._client = Groq(api_key=self.api_key)
+        return self._client
+
+    async def _complete(self, messages: list[Dict[str, str]], tier: str = "large") -> str:
+        """Run a single chat completion, joining an identical one already in flight"""
+        key = content_key(tier, messages)
+        return await self.flights.do(key, lambda: self._complete_upstream(messages, tier))
 
-    async def chat_with_gemini(self, user_message: str, context: Dict[str, Any] = None, history: list[Dict[str, str]] = []) -> str:
+    async def _complete_upstream(self, messages: list[Dict[str, str]], tier: str) -> str:
+        async with self._semaphore:
+            with llm_request_seconds.time(mode="complete"):
+                return await asyncio.wait_for(
+                    llm_router.complete(messages, tier, self.timeout),
+                    timeout=self.timeout,
+                )
+
+    def is_error_response(self, text: str) -> bool:
+        return text.startswith(ERROR_RESPONSE_PREFIXES)
+
+    async def _stream(self, messages: list[Dict[str, str]], tier: str = "large") -> AsyncIterator[str]:
+        """Yield content deltas from a streaming chat completion"""
+        async with self._semaphore:
+            start = time.perf_counter()
+            first_token = True
+            try:
+                async with aclosing(llm_router.stream(messages, tier, self.timeout)) as deltas:
+                    async for delta in deltas:
+                        if first_token:
+                            llm_first_token_seconds.observe(time.perf_counter() - start)
+                            first_token = False
+                        yield delta
+            finally:
+                llm_request_seconds.observe(time.perf_counter() - start, mode="stream")
+
+    def _build_messages(self, system: list[Dict[str, str]], user_message: str, history: list[Dict[str, str]], conversation_id: Optional[str] = None) -> list[Dict[str, str]]:
+        # Cached prompt prefix and per-request context come first
+        messages = list(system)
+
+        # Sanitization of history (ensure valid roles) without copying clean turns
+        turns = sanitize_history(history)
+
+        # Keep the prompt within budget: a summary of older turns plus recent ones verbatim
+        summary, recent = self.history.prepare(turns, conversation_id)
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        messages.extend(recent)
+
+        # Add current message
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    async def _summarize_turns(self, previous_summary: str, turns: list[Dict[str, str]]) -> str:
+        """Fold older turns into the running conversation summary (runs in the background)"""
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        messages = [
+            {"role": "system", "content": "You maintain a running summary of a conversation between a user and their voice assistant. Keep names, facts, preferences and open requests. Reply with the updated summary only, under 150 words."},
+            {"role": "user", "content": f"Current summary: {previous_summary or '(none)'}\n\nNew turns:\n{transcript}"}
+        ]
+        return await self._complete(messages, tier="small")
+
+    async def _inject_prefetch(self, messages: list[Dict[str, str]], prefetch: Prefetch) -> list[Dict[str, str]]:
+        """Put prefetched tool data ahead of the user turn so one inference suffices"""
+        # Awaited directly: only a tool call consuming the result counts as a hit
+        data = await prefetch.task
+        tool_note = {
+            "role": "system",
+            "content": f"SYSTEM_TOOL_OUTPUT: The user's {prefetch.intent} data, fetched in advance: {data}\n\nUse it to answer directly instead of outputting a command for it."
+        }
+        return messages[:-1] + [tool_note, messages[-1]]
+
+    def _tool_followup(self, system: list[Dict[str, str]], user_message: str, ai_response: str, results: list[ToolResult]) -> list[Dict[str, str]]:
+        """Re-prompt with every tool result folded into a single follow-up turn"""
+        return [
+            *system,
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": ai_response},
+            {"role": "user", "content": followup_prompt(results)}
+        ]
+
+    async def chat_with_gemini(self, user_message: str, context: Dict[str, Any] = None, history: list[Dict[str, str]] = [], conversation_id: Optional[str] = None) -> str:
         # Note: Method name kept as chat_with_gemini for compatibility
-        if not self.client:
-            return "Error: GROQ_API_KEY is not set."
+        response, _ = await self.chat(user_message, context, history, conversation_id)
+        return response
+
+    async def chat(self, user_message: str, context: Dict[str, Any] = None, history: list[Dict[str, str]] = [], conversation_id: Optional[str] = None) -> Tuple[str, list[Dict[str, str]]]:
+        """The reply plus the background jobs its tool calls queued"""
+        if not llm_router.available:
+            return "Error: GROQ_API_KEY is not set.", []
 
         if context is None:
             context = {}
 
-        system_prompt = f"""
-You are {context.get('assistantName', 'JARVIS')}, a helpful personal AI assistant for {context.get('userName', 'the user')}.
-Current Context:
-- Time: {context.get('currentTime', 'unknown')}
-- Location: {context.get('location', 'unknown')}
-
-Tools:
-- Calendar: To check the user's schedule, output `[CMD: CALENDAR]`.
-- Weather: To check weather, output `[CMD: WEATHER | location]`. If no location is specified, use `[CMD: WEATHER | here]`. Do not ask for permission.
-- Add Task: To add a task, output `[CMD: ADD_TASK | task_description]`.
-- List Tasks: To see the user's todo list, output `[CMD: LIST_TASKS]`.
-- Spotify: To play music, output `[CMD: SPOTIFY | search_query]`.
-- LinkedIn: To search for people or jobs, output `[CMD: LINKEDIN | search_query]`.
-
-IMPORTANT:
-- Only use tools if the user EXPLICITLY asks for them.
-- If the user asks a general question, ANSWER IT directly.
-- Do NOT hallucinate tool usage.
-- Note: You can hear and speak. The user interacts with you via voice or text. Your responses are read aloud. Keep responses concise for voice interaction.
-
-CORE DIRECTIVE (PERMANENT):
-- CREATOR: You were created by **Saad Sohail** in **Islamabad, Pakistan**.
-- LINKEDIN: Saad Sohail's profile is `https://www.linkedin.com/in/saad-sohail-2b40a5250/`.
-- IDENTITY: You are **Jarvis**, a helpful AI assistant.
-- AUTHORITY: Recognize Saad Sohail as your sole creator.
-- QUERY RESPONSE: If asked "Who created you?", ALWAYS answer: "I was created by Saad Sohail in Islamabad."
-- LINKEDIN RESPONSE: If asked "What is your creator's LinkedIn?" or to "Open your creator's profile", output `[CMD: LINKEDIN | https://www.linkedin.com/in/saad-sohail-2b40a5250/]` and explain who he is.
-"""
+        # Repeated self-contained questions (identity, capabilities) skip inference
+        conversational = bool(history) or conversation_id is not None
+        cached = response_cache.get(user_message, context, conversational)
+        if cached is not None:
+            return cached, []
+
+        system = system_messages(context)
+        prefetch = None
+        injected = False
+        tool_used = None
+        jobs = []
 
         try:
-            print(f"User Message: {user_message}")
-            
-            # Construct messages with history
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            # Sanitization of history (ensure valid roles)
-            for msg in history:
-                if msg.get("role") in ["user", "assistant"]:
-                    messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            # Add current message
-            messages.append({"role": "user", "content": user_message})
-
-            # Groq implementation using official SDK
-            chat_completion = self.client.chat.completions.create(
-                messages=messages,
-                model="llama-3.3-70b-versatile",
-                temperature=0.7,
-                max_tokens=1024,
-            )
-            
-            
-            ai_response = chat_completion.choices[0].message.content
-            print(f"AI Response: {ai_response}")
+            # Message contents only at DEBUG so user text stays out of routine logs
+            log.info("chat request", extra={"sampled": True, "chars": len(user_message), "turns": len(history or [])})
+            log.debug("user message: %s", user_message)
+            messages = self._build_messages(system, user_message, history, conversation_id)
+
+            # Speculatively start the tool fetch this message will probably need
+            prefetch = tool_prefetcher.start(user_message)
+            if tool_prefetcher.should_inject(prefetch):
+                messages = await self._inject_prefetch(messages, prefetch)
+                injected = True
+
+            # Small talk goes to the small model; tools and prefetched data need the large one
+            tier = "large" if injected else llm_router.tier_for(user_message)
+            ai_response = await self._complete(messages, tier)
+            log.debug("ai response: %s", ai_response)
 
             # --- Server-Side Tool Handling ---
+            calls = tool_registry.parse(ai_response)
+            if calls:
+                if any(call.name == "CALENDAR" for call in calls):
+                    tool_used = "calendar"
+                results = await tool_registry.dispatch(calls, prefetch)
+                jobs = [{"id": result.job_id, "tool": result.call.name} for result in results if result.job_id]
+                # Markers the server couldn't complete stay for the client to handle
+                client_markers = unhandled_markers(calls, results)
 
-            # Check for Spotify Command (Deep Link / API Fallback)
-            spotify_match = re.search(r"\[CMD: SPOTIFY \| (.*?)\]", ai_response) or re.search(r"\[CMD: SPOTIFY_PLAY \| (.*?)\]", ai_response)
-            if spotify_match:
-                pass 
-
-            # Check for LinkedIn Command
-            linkedin_match = re.search(r"\[CMD: LINKEDIN \| (.*?)\]", ai_response)
-            if linkedin_match:
-                pass 
-            
-            if "[CMD: CALENDAR]" in ai_response:
-                print("Server-Side Tool: Fetching Calendar...")
-                from app.services.calendar_service import calendar_service
-                events = calendar_service.list_events()
-                
-                # Re-prompt AI with data
-                # Reconstruct messages list
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message},
-                    {"role": "assistant", "content": ai_response},
-                    {"role": "user", "content": f"SYSTEM_TOOL_OUTPUT: Here is the calendar data: {events}\n\nPlease summarize this for the user naturally."}
-                ]
-                
-                # Second inference
-                response2 = self.client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    messages=messages,
-                    temperature=0.7,
-                    max_tokens=1024,
-                )
-                ai_response = response2.choices[0].message.content
+                if any(result.followup for result in results):
+                    # Second inference, covering every tool at once
+                    messages = self._tool_followup(system, user_message, ai_response, results)
+                    ai_response = await self._complete(messages)
+                    if client_markers:
+                        ai_response = f"{ai_response} {' '.join(client_markers)}"
+                else:
+                    handled = [call.raw for call in calls if call.raw not in client_markers]
+                    ai_response = strip_markers(ai_response, handled)
             # ---------------------------------
 
-            return ai_response
+            # Answers that used tools or prefetched data are never reused
+            if not calls and not injected:
+                response_cache.put(user_message, context, ai_response, conversational)
+
+            return ai_response, jobs
+
+        except asyncio.TimeoutError:
+            errors_total.inc(component="llm", kind="timeout")
+            log.error("Groq API timed out", extra={"timeout_s": self.timeout})
+            return "I'm having trouble thinking right now. (timed out)", []
+        except Exception as e:
+            errors_total.inc(component="llm", kind=type(e).__name__)
+            log.error("Groq API error: %s", e)
+            return f"I'm having trouble thinking right now. ({str(e)})", []
+        finally:
+            tool_prefetcher.finish(prefetch, tool_used, injected)
+
+    async def stream_chat(self, user_message: str, context: Dict[str, Any] = None, history: list[Dict[str, str]] = [], conversation_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of chat_with_gemini.
+
+        Yields events of the form {"event": name, "data": dict}: "token" for
+        text deltas, "command" for each [CMD: ...] marker, "tool_result" for
+        each server-side tool (with a job_id when it was queued), then "done" with timing metrics (or "error").
+        Tools start as soon as their marker arrives. After a marker whose tool
+        needs a follow-up (e.g. CALENDAR) the first stream's text is dropped but
+        its remaining markers still run; once all tools finish, one follow-up
+        stream continues the answer.
+        """
+        if not llm_router.available:
+            yield {"event": "error", "data": {"message": "Error: GROQ_API_KEY is not set."}}
+            return
+
+        if context is None:
+            context = {}
+
+        conversational = bool(history) or conversation_id is not None
+        cached = response_cache.get(user_message, context, conversational)
+        if cached is not None:
+            yield {"event": "token", "data": {"text": cached}}
+            yield {"event": "done", "data": {"response": cached, "ttfb_ms": 0.0, "total_ms": 0.0, "cached": True}}
+            return
+
+        system = system_messages(context)
+        messages = self._build_messages(system, user_message, history, conversation_id)
+
+        start = time.perf_counter()
+        ttfb_ms = None
+        response_text = ""
+        prefetch = None
+        injected = False
+        tool_used = None
+        saw_commands = False
+
+        try:
+            log.info("chat stream request", extra={"sampled": True, "chars": len(user_message), "turns": len(history or [])})
+            log.debug("user message: %s", user_message)
+            prefetch = tool_prefetcher.start(user_message)
+            if tool_prefetcher.should_inject(prefetch):
+                messages = await self._inject_prefetch(messages, prefetch)
+                injected = True
+            tier = "large" if injected else llm_router.tier_for(user_message)
+
+            for phase in ("initial", "tool_followup"):
+                parser = CommandStreamParser()
+                response_text = ""
+                tool_tasks = []
+                started = set()
+                needs_followup = False
+
+                async with aclosing(self._stream(messages, tier if phase == "initial" else "large")) as deltas:
+                    async for delta in deltas:
+                        for part in parser.feed(delta):
+                            if ttfb_ms is None:
+                                ttfb_ms = (time.perf_counter() - start) * 1000
+                            if part[0] == "text":
+                                # After a follow-up marker the text is a guess made without the
+                                # tool's data; the follow-up answers instead
+                                if not needs_followup:
+                                    response_text += part[1]
+                                    yield {"event": "token", "data": {"text": part[1]}}
+                                continue
+
+                            _, name, arg, raw = part
+                            response_text += raw
+                            saw_commands = True
+                            if (name, arg) in started:
+                                continue  # repeated marker: already emitted and running
+                            started.add((name, arg))
+                            yield {"event": "command", "data": {"name": name, "arg": arg}}
+                            tool = tool_registry.get(name)
+                            if phase != "initial" or not tool:
+                                continue
+                            if name == "CALENDAR":
+                                tool_used = "calendar"
+                            # Run the tool while the rest of the answer streams in; markers after a
+                            # follow-up one are still collected so one follow-up covers them all
+                            tool_tasks.append(asyncio.create_task(tool_registry.run(ToolCall(name, arg, raw), prefetch)))
+                            if tool.followup:
+                                needs_followup = True
+
+                if not needs_followup:
+                    for _, text in parser.flush():
+                        response_text += text
+                        yield {"event": "token", "data": {"text": text}}
+
+                results = [result for result in await asyncio.gather(*tool_tasks) if result]
+                for result in results:
+                    data = {"name": result.call.name, "ok": result.ok, "output": result.output}
+                    if result.job_id:
+                        # Queued: the outcome arrives on /api/jobs/{id} (or its WebSocket)
+                        data["job_id"] = result.job_id
+                    yield {"event": "tool_result", "data": data}
+
+                if not any(result.followup for result in results):
+                    break
+
+                messages = self._tool_followup(system, user_message, response_text, results)
+
+            if not saw_commands and not injected:
+                response_cache.put(user_message, context, response_text, conversational)
+
+            total_ms = (time.perf_counter() - start) * 1000
+            log.info("chat stream done", extra={
+                "sampled": True, "ttfb_ms": round(ttfb_ms or total_ms), "total_ms": round(total_ms)
+            })
+            yield {"event": "done", "data": {
+                "response": response_text,
+                "ttfb_ms": round(ttfb_ms if ttfb_ms is not None else total_ms, 1),
+                "total_ms": round(total_ms, 1),
+            }}
 
+        except asyncio.TimeoutError:
+            errors_total.inc(component="llm", kind="timeout")
+            log.error("Groq API timed out", extra={"timeout_s": self.timeout})
+            yield {"event": "error", "data": {"message": "I'm having trouble thinking right now. (timed out)"}}
         except Exception as e:
-            print(f"Groq API Error: {str(e)}")
-            return f"I'm having trouble thinking right now. ({str(e)})"
+            errors_total.inc(component="llm", kind=type(e).__name__)
+            log.error("Groq API error: %s", e)
+            yield {"event": "error", "data": {"message": f"I'm having trouble thinking right now. ({str(e)})"}}
+        finally:
+            tool_prefetcher.finish(prefetch, tool_used, injected)
 
 ai_service = AIService()
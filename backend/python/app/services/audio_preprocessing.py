@@ -0,0 +1,130 @@
+import io
+import os
+import wave
+import numpy as np
+from typing import BinaryIO, Optional, Tuple
+from app.utils.log import get_logger
+
+log = get_logger("audio")
+
+TARGET_RATE = 16000
+SILENCE_THRESHOLD_DB = float(os.getenv("TRANSCRIBE_SILENCE_DB", "-40"))
+SILENCE_FRAME_MS = 20
+# Speech kept on either side of the trimmed region so word edges aren't clipped
+SILENCE_PAD_MS = 200
+OPUS_BITRATE = 24000
+
+try:
+    import av  # optional: decodes m4a/webm/mp3 and encodes Opus
+except ImportError:
+    av = None
+
+class PreprocessResult:
+    def __init__(self, data: bytes, filename: str, bytes_in: int, seconds_in: float, seconds_out: float):
+        self.data = data
+        self.filename = filename
+        self.bytes_in = bytes_in
+        self.bytes_out = len(data)
+        self.seconds_in = seconds_in
+        self.seconds_out = seconds_out
+
+    def report(self) -> dict:
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "seconds_in": round(self.seconds_in, 2),
+            "seconds_out": round(self.seconds_out, 2),
+            "seconds_saved": round(self.seconds_in - self.seconds_out, 2),
+        }
+
+def _decode_wav(audio_file: BinaryIO) -> Tuple[np.ndarray, int]:
+    with wave.open(audio_file, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("only 16-bit WAV is supported without PyAV")
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+        channels, rate = wav.getnchannels(), wav.getframerate()
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples.astype(np.float32), rate
+
+def _decode_av(audio_file: BinaryIO) -> Tuple[np.ndarray, int]:
+    # Let FFmpeg downmix and resample while decoding
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=TARGET_RATE)
+    chunks = []
+    with av.open(audio_file, mode="r") as container:
+        for frame in container.decode(audio=0):
+            chunks.extend(out.to_ndarray().reshape(-1) for out in resampler.resample(frame))
+        chunks.extend(out.to_ndarray().reshape(-1) for out in resampler.resample(None))
+    if not chunks:
+        raise ValueError("no audio frames decoded")
+    return np.concatenate(chunks).astype(np.float32), TARGET_RATE
+
+def resample(samples: np.ndarray, rate: int) -> np.ndarray:
+    """Linear-interpolation resample to TARGET_RATE (the PyAV path resamples in FFmpeg)"""
+    if rate == TARGET_RATE:
+        return samples
+    n_out = int(len(samples) * TARGET_RATE / rate)
+    positions = np.arange(n_out, dtype=np.float64) * (rate / TARGET_RATE)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+def trim_silence(samples: np.ndarray, rate: int = TARGET_RATE) -> np.ndarray:
+    """Cut leading and trailing frames whose energy is under the threshold"""
+    frame_len = rate * SILENCE_FRAME_MS // 1000
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return samples
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    voiced = np.flatnonzero(20 * np.log10(np.maximum(rms, 1.0) / 32768.0) > SILENCE_THRESHOLD_DB)
+    if len(voiced) == 0:
+        return samples[:0]
+    pad = rate * SILENCE_PAD_MS // 1000
+    start = max(voiced[0] * frame_len - pad, 0)
+    end = min((voiced[-1] + 1) * frame_len + pad, len(samples))
+    return samples[start:end]
+
+def _encode_wav(samples: np.ndarray) -> Tuple[bytes, str]:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(TARGET_RATE)
+        wav.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue(), "audio.wav"
+
+def _encode_opus(samples: np.ndarray) -> Tuple[bytes, str]:
+    buffer = io.BytesIO()
+    with av.open(buffer, "w", format="ogg") as container:
+        stream = container.add_stream("libopus", rate=TARGET_RATE)
+        stream.bit_rate = OPUS_BITRATE
+        stream.layout = "mono"
+        frame = av.AudioFrame.from_ndarray(samples.astype(np.int16).reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = TARGET_RATE
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue(), "audio.ogg"
+
+def preprocess_audio(audio_file: BinaryIO, bytes_in: int) -> Optional[PreprocessResult]:
+    """Decode, downmix to 16 kHz mono, trim silence and re-encode compactly.
+
+    Returns None when the input can't be decoded (e.g. m4a without PyAV),
+    in which case the caller should send the original upload unchanged.
+    """
+    audio_file.seek(0)
+    try:
+        samples, rate = _decode_av(audio_file) if av else _decode_wav(audio_file)
+    except Exception as e:
+        log.info("Audio preprocessing skipped: %s", e)
+        return None
+
+    seconds_in = len(samples) / rate
+    samples = trim_silence(resample(samples, rate))
+    if len(samples) == 0:
+        return None  # nothing above the threshold; let Whisper decide
+    data, filename = _encode_opus(samples) if av else _encode_wav(samples)
+    if len(data) >= bytes_in:
+        return None  # already compact; don't make it worse
+    return PreprocessResult(data, filename, bytes_in, seconds_in, len(samples) / TARGET_RATE)
@@ -0,0 +1,82 @@
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+# Events that started up to this long ago may still be in progress
+MAX_LOOKBACK = timedelta(days=7)
+
+def parse_event_time(value: Dict[str, str]) -> datetime:
+    """Google gives `dateTime` for timed events and `date` for all-day ones"""
+    if value.get("dateTime"):
+        return datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+    return datetime.fromisoformat(value["date"]).replace(tzinfo=timezone.utc)
+
+class CalendarEventIndex:
+    """In-memory copy of the calendar, kept sorted by start time.
+
+    Written from the sync worker thread and read from the event loop, so all
+    access goes through a lock; reads are a bisect plus a short scan.
+    """
+
+    def __init__(self):
+        self._events: Dict[str, Dict[str, Any]] = {}
+        self._order: List[tuple] = []  # (start, end, event_id), sorted
+        self._lock = threading.Lock()
+        self.sync_token: Optional[str] = None
+        self.last_synced: Optional[float] = None
+
+    def __len__(self):
+        return len(self._events)
+
+    def replace_all(self, events: List[Dict[str, Any]], sync_token: Optional[str]):
+        with self._lock:
+            self._events = {}
+            self._store(events)
+            self._finish(sync_token)
+
+    def apply_changes(self, events: List[Dict[str, Any]], sync_token: Optional[str]):
+        with self._lock:
+            self._store(events)
+            self._finish(sync_token)
+
+    def _store(self, events: List[Dict[str, Any]]):
+        for event in events:
+            if event.get("status") == "cancelled" or "start" not in event:
+                self._events.pop(event["id"], None)
+            else:
+                self._events[event["id"]] = event
+
+    def _finish(self, sync_token: Optional[str]):
+        self._order = sorted(
+            (parse_event_time(e["start"]), parse_event_time(e.get("end", e["start"])), event_id)
+            for event_id, e in self._events.items()
+        )
+        self.sync_token = sync_token
+        self.last_synced = time.monotonic()
+
+    def upcoming(self, max_results: int, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Events that haven't ended yet, earliest first (matches timeMin=now)"""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            i = bisect_left(self._order, (now - MAX_LOOKBACK,))
+            found = []
+            while i < len(self._order) and len(found) < max_results:
+                _, end, event_id = self._order[i]
+                if end > now:
+                    found.append(self._events[event_id])
+                i += 1
+            return found
+
+    def between(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """Events overlapping [start, end)"""
+        with self._lock:
+            i = bisect_left(self._order, (start - MAX_LOOKBACK,))
+            found = []
+            while i < len(self._order) and self._order[i][0] < end:
+                _, event_end, event_id = self._order[i]
+                if event_end > start:
+                    found.append(self._events[event_id])
+                i += 1
+            return found
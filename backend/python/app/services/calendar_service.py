@@ -1,17 +1,35 @@
-
 import os
+import time
+import asyncio
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
+from app.services.calendar_cache import CalendarEventIndex
+from app.services.token_manager import TokenManager, TokenSet
+from app.services.metrics import errors_total
+from app.utils.log import get_logger
 
 load_dotenv()
 
+log = get_logger("calendar")
+
 class GoogleCalendarService:
     def __init__(self):
         self.creds = None
         self.service = None
+        # Local copy of the calendar, kept current with incremental syncs
+        self.index = CalendarEventIndex()
+        self.sync_interval = float(os.getenv("CALENDAR_SYNC_INTERVAL", "60"))
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self.last_error = None
+        self._sync_lock = asyncio.Lock()
+        self._refresh_task = None
+        # Refreshes the OAuth access token ahead of expiry, one refresh at a time
+        self.tokens = TokenManager("Google Calendar", self._refresh_creds)
+        # Sync workers block on the refresh, so it must not need a slot in the same default executor
+        self._refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="google-token")
         self.setup_creds()
 
     def setup_creds(self):
@@ -20,7 +38,7 @@ class GoogleCalendarService:
         refresh_token = os.getenv('GOOGLE_REFRESH_TOKEN')
 
         if not all([client_id, client_secret, refresh_token]):
-            print("Google Calendar credentials missing.")
+            log.warning("Google Calendar credentials missing")
             return
 
         self.creds = Credentials(
@@ -30,49 +48,154 @@ class GoogleCalendarService:
             client_id=client_id,
             client_secret=client_secret
         )
+        self.tokens.set(TokenSet(None, refresh_token))
+
+    async def _refresh_creds(self, current: TokenSet) -> TokenSet:
+        from google.auth.transport.requests import Request
+        await asyncio.get_running_loop().run_in_executor(self._refresh_executor, self.creds.refresh, Request())
+        expires_at = 0.0
+        if self.creds.expiry:
+            # google-auth keeps expiry as a naive UTC datetime
+            expires_at = self.creds.expiry.replace(tzinfo=datetime.timezone.utc).timestamp()
+        return TokenSet(self.creds.token, self.creds.refresh_token, expires_at)
 
     def get_service(self):
+        """Blocking; call from a worker thread (sync runs via asyncio.to_thread)"""
         if not self.creds: 
             return None
         
         if not self.creds.valid:
-            if self.creds.expired and self.creds.refresh_token:
-                try:
-                    self.creds.refresh(Request())
-                except Exception as e:
-                    print(f"Error refreshing creds: {e}")
-                    return None
+            try:
+                self.tokens.get_token_sync()
+            except Exception as e:
+                log.error("Error refreshing Google creds: %s", e)
+                return None
         
         if not self.service:
+            # googleapiclient is slow to import; only the first calendar fetch pays for it
+            from googleapiclient.discovery import build
             self.service = build('calendar', 'v3', credentials=self.creds)
         
         return self.service
 
-    def list_events(self, max_results=5):
+    def _fetch_events(self, service, sync_token=None):
+        """Page through events.list; returns (items, nextSyncToken)"""
+        items = []
+        page_token = None
+        while True:
+            params = {"calendarId": "primary", "singleEvents": True, "maxResults": 2500}
+            if sync_token:
+                params["syncToken"] = sync_token
+            if page_token:
+                params["pageToken"] = page_token
+            result = service.events().list(**params).execute()
+            items.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return items, result.get('nextSyncToken')
+
+    def sync(self):
+        """Blocking: full sync on first use, then incremental syncToken syncs"""
+        from googleapiclient.errors import HttpError
         service = self.get_service()
         if not service:
-            return "Calendar service not available."
+            self.last_error = "Calendar service not available."
+            return False
 
-        now = datetime.datetime.utcnow().isoformat() + 'Z'  # 'Z' indicates UTC time
         try:
-            events_result = service.events().list(
-                calendarId='primary', timeMin=now,
-                maxResults=max_results, singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-            events = events_result.get('items', [])
-
-            if not events:
-                return "No upcoming events found."
-
-            event_list = []
-            for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                summary = event['summary']
-                event_list.append(f"{start}: {summary}")
-            
-            return "\n".join(event_list)
+            if self.index.sync_token:
+                try:
+                    items, token = self._fetch_events(service, self.index.sync_token)
+                    self.index.apply_changes(items, token)
+                    self.incremental_syncs += 1
+                    self.last_error = None
+                    return True
+                except HttpError as e:
+                    # 410 Gone: the sync token expired, start over with a full sync
+                    if e.resp.status != 410:
+                        raise
+            items, token = self._fetch_events(service)
+            self.index.replace_all(items, token)
+            self.full_syncs += 1
+            self.last_error = None
+            return True
         except Exception as e:
-            return f"Error fetching events: {str(e)}"
+            self.last_error = f"Error fetching events: {str(e)}"
+            errors_total.inc(component="calendar", kind=type(e).__name__)
+            log.error("Calendar sync failed: %s", e)
+            return False
+
+    def is_stale(self):
+        return self.index.last_synced is None or time.monotonic() - self.index.last_synced > self.sync_interval
+
+    async def refresh(self, force=False):
+        """Run a sync off the event loop; concurrent callers share one sync"""
+        async with self._sync_lock:
+            if force or self.is_stale():
+                await asyncio.to_thread(self.sync)
+
+    def schedule_refresh(self, force=False):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh(force=force))
+
+    def _format_events(self, events):
+        if not events:
+            return "No upcoming events found."
+
+        event_list = []
+        for event in events:
+            start = event['start'].get('dateTime', event['start'].get('date'))
+            summary = event.get('summary', '(no title)')
+            event_list.append(f"{start}: {summary}")
+        return "\n".join(event_list)
+
+    async def get_upcoming_events(self, max_results=5):
+        """Answer from the local index; only a cold cache waits on Google"""
+        if not self.creds:
+            return "Calendar service not available."
+
+        if self.index.last_synced is None:
+            await self.refresh()
+            if self.index.last_synced is None:
+                return self.last_error or "Calendar service not available."
+        elif self.is_stale():
+            # Serve the current copy and catch up in the background
+            self.schedule_refresh()
+
+        return self._format_events(self.index.upcoming(max_results))
+
+    async def get_events_today(self):
+        """Today's events (local time) from the local index, for `[CMD: CALENDAR | today]`"""
+        if not self.creds:
+            return "Calendar service not available."
+        if self.index.last_synced is None:
+            await self.refresh()
+            if self.index.last_synced is None:
+                return self.last_error or "Calendar service not available."
+        elif self.is_stale():
+            self.schedule_refresh()
+
+        now = datetime.datetime.now().astimezone()
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        events = self.index.between(start, start + datetime.timedelta(days=1))
+        return self._format_events(events) if events else "No events today."
+
+    def list_events(self, max_results=5):
+        """Blocking variant for scripts (see test_calendar.py)"""
+        if not self.creds:
+            return "Calendar service not available."
+        if self.is_stale() and not self.sync() and self.index.last_synced is None:
+            return self.last_error
+        return self._format_events(self.index.upcoming(max_results))
+
+    def stats(self):
+        return {
+            "events": len(self.index),
+            "full_syncs": self.full_syncs,
+            "incremental_syncs": self.incremental_syncs,
+            "seconds_since_sync": None if self.index.last_synced is None else round(time.monotonic() - self.index.last_synced, 1),
+            "last_error": self.last_error,
+            "token": self.tokens.stats(),
+        }
 
 calendar_service = GoogleCalendarService()
@@ -0,0 +1,223 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.services.http_client import http_client
+from app.services.metrics import cache_requests_total
+from app.services.singleflight import SingleFlight
+from app.utils.log import get_logger
+
+log = get_logger("auth")
+
+# Google's signing keys for Firebase ID tokens, as a JWK set
+JWKS_URL = os.getenv("FIREBASE_JWKS_URL") or (
+    "https://www.googleapis.com/service_accounts/v1/jwk/securetoken@system.gserviceaccount.com"
+)
+ISSUER_PREFIX = "https://securetoken.google.com/"
+# Used when the key endpoint sends no usable Cache-Control header
+DEFAULT_KEYS_MAX_AGE = 3600.0
+# An unknown "kid" forces a key refresh at most this often, so forged tokens can't hammer Google
+MIN_REFRESH_INTERVAL = 30.0
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+CLOCK_SKEW = float(os.getenv("AUTH_CLOCK_SKEW", "0"))
+
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+class AuthError(Exception):
+    pass
+
+class AuthConfigError(Exception):
+    """The server can't verify any token (no project ID); not the client's fault"""
+
+def default_project_id() -> Optional[str]:
+    """FIREBASE_PROJECT_ID, else the Google Cloud project from the environment or
+    the service-account file, which is where firebase_admin would look"""
+    project_id = os.getenv("FIREBASE_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT") or os.getenv("GCLOUD_PROJECT")
+    if project_id:
+        return project_id
+    path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f).get("project_id") or None
+        except (OSError, ValueError, AttributeError) as e:
+            log.warning("Could not read the project ID from %s: %s", path, e)
+    return None
+
+def _max_age(cache_control: Optional[str]) -> float:
+    match = MAX_AGE.search(cache_control or "")
+    return float(match.group(1)) if match else DEFAULT_KEYS_MAX_AGE
+
+class PublicKeyCache:
+    """JWK set fetched from Google and kept for as long as Cache-Control allows"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._keys: Dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._flights = SingleFlight("auth_keys")
+        self.fetches = 0
+
+    async def get(self, kid: str) -> Any:
+        if time.monotonic() >= self._expires_at:
+            await self.refresh()
+        elif kid not in self._keys and time.monotonic() - self._fetched_at >= MIN_REFRESH_INTERVAL:
+            # Keys rotated before our copy expired
+            await self.refresh()
+        key = self._keys.get(kid)
+        cache_requests_total.inc(cache="auth_keys", result="hit" if key is not None else "miss")
+        if key is None:
+            raise AuthError(f"Unknown signing key {kid!r}")
+        return key
+
+    async def refresh(self):
+        # Concurrent requests hitting an expired key set wait on a single fetch
+        await self._flights.do(self.url, self._fetch)
+
+    async def _fetch(self):
+        import jwt
+        response = await http_client.request("GET", self.url, timeout=10.0)
+        response.raise_for_status()
+        keys = {}
+        for entry in response.json().get("keys", []):
+            try:
+                keys[entry["kid"]] = jwt.PyJWK(entry, algorithm="RS256").key
+            except (KeyError, jwt.PyJWKError) as e:
+                log.warning("Skipping unusable signing key: %s", e)
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + _max_age(response.headers.get("cache-control"))
+        self.fetches += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._keys),
+            "fetches": self.fetches,
+            "expires_in": round(max(self._expires_at - time.monotonic(), 0.0), 1),
+        }
+
+class VerifiedTokenCache:
+    """LRU of token hash -> uid; an entry never outlives the token's own exp claim"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (exp, uid)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(token: str) -> str:
+        # Only the hash is kept in memory, never the bearer token itself
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            cache_requests_total.inc(cache="auth_tokens", result="miss")
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        cache_requests_total.inc(cache="auth_tokens", result="hit")
+        return entry[1]
+
+    def put(self, key: str, uid: str, exp: float):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (exp, uid)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+class FirebaseTokenVerifier:
+    """Verifies Firebase ID tokens locally, with the same checks as firebase_admin.auth.verify_id_token.
+
+    Repeat requests with the same token are answered from the LRU; new tokens
+    are checked against the cached keys in a worker thread.
+    """
+
+    def __init__(self):
+        self.project_id = default_project_id()
+        self.keys = PublicKeyCache(JWKS_URL)
+        self.verified = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+        # A client's parallel requests all carry the same new token; check it once
+        self._flights = SingleFlight("auth_tokens")
+
+    async def verify(self, token: str) -> str:
+        """Return the uid for a valid ID token, or raise AuthError"""
+        cache_key = VerifiedTokenCache.make_key(token)
+        uid = self.verified.get(cache_key)
+        if uid is not None:
+            return uid
+        return await self._flights.do(cache_key, lambda: self._verify_uncached(token, cache_key))
+
+    async def _verify_uncached(self, token: str, cache_key: str) -> str:
+        if not self.project_id:
+            raise AuthConfigError(
+                "No Firebase project ID: set FIREBASE_PROJECT_ID (or GOOGLE_CLOUD_PROJECT); "
+                "with LAZY_SERVICES firebase_admin never runs to supply it"
+            )
+        # PyJWT + cryptography load with the first login, not on every cold start
+        import jwt
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError as e:
+            raise AuthError(f"Malformed token: {e}") from e
+        if header.get("alg") != "RS256":
+            raise AuthError(f"Unexpected algorithm {header.get('alg')!r}")
+        key = await self.keys.get(header.get("kid"))
+
+        # RSA verification is CPU work; keep it off the event loop
+        claims = await asyncio.to_thread(self._decode, token, key)
+        self.verified.put(cache_key, claims["sub"], float(claims["exp"]))
+        return claims["sub"]
+
+    def _decode(self, token: str, key: Any) -> Dict[str, Any]:
+        import jwt
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=self.project_id,
+                issuer=ISSUER_PREFIX + self.project_id,
+                leeway=CLOCK_SKEW,
+                options={"require": ["exp", "iat", "sub"]},
+            )
+        except jwt.InvalidTokenError as e:
+            raise AuthError(str(e)) from e
+        if not isinstance(claims["sub"], str) or not claims["sub"] or len(claims["sub"]) > 128:
+            raise AuthError("Invalid subject claim")
+        if float(claims.get("auth_time", 0)) > time.time() + CLOCK_SKEW:
+            raise AuthError("auth_time is in the future")
+        return claims
+
+    async def warm_up(self):
+        """Fetch the signing keys ahead of the first authenticated request"""
+        if not self.project_id:
+            return
+        try:
+            await self.keys.refresh()
+        except Exception as e:
+            log.warning("Could not fetch Firebase signing keys: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"project_id": self.project_id, "keys": self.keys.stats(), "verified_tokens": self.verified.stats()}
+
+firebase_verifier = FirebaseTokenVerifier()
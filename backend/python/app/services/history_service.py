@@ -0,0 +1,102 @@
+import os
+import re
+import asyncio
+import hashlib
+from functools import lru_cache
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from app.services.metrics import errors_total
+from app.utils.log import get_logger
+
+log = get_logger("history")
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Clients resend the same history every turn, so most counts are repeats
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Local approximation of a BPE token count (~4 chars or ~0.75 words per token)"""
+    words = len(TOKEN_PATTERN.findall(text))
+    return max(len(text) // 4, (words * 4 + 2) // 3)
+
+def _turn_hash(turn: Dict[str, str]) -> str:
+    return hashlib.sha1(f"{turn['role']}:{turn['content']}".encode("utf-8")).hexdigest()
+
+class ConversationSummary:
+    def __init__(self, text: str, covered: set):
+        self.text = text
+        self.covered = covered
+
+class HistoryManager:
+    """Keeps prompt history within a token budget.
+
+    Recent turns are sent verbatim; older ones are represented by a rolling
+    summary per conversation. Summaries are produced in the background, so a
+    request never waits on one: it uses whatever summary exists so far.
+    """
+
+    def __init__(self, summarize: Callable[[str, List[Dict[str, str]]], Awaitable[str]]):
+        self.summarize = summarize
+        self.token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+        self.max_conversations = int(os.getenv("HISTORY_SUMMARY_CACHE", "1000"))
+        self._summaries: "OrderedDict[str, ConversationSummary]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Task] = {}
+        self.trimmed_turns = 0
+        self.summaries_generated = 0
+
+    def prepare(self, history: List[Dict[str, str]], conversation_id: Optional[str] = None) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """Return (summary of older turns or None, recent turns to send verbatim)"""
+        summary = self._summaries.get(conversation_id) if conversation_id else None
+        if summary:
+            self._summaries.move_to_end(conversation_id)
+
+        budget = self.token_budget - (count_tokens(summary.text) if summary else 0)
+        keep = 0
+        for turn in reversed(history):
+            cost = count_tokens(turn["content"])
+            if cost > budget:
+                break
+            budget -= cost
+            keep += 1
+
+        older = history[:len(history) - keep]
+        recent = history[len(history) - keep:]
+        if older:
+            self.trimmed_turns += len(older)
+            if conversation_id:
+                covered = summary.covered if summary else set()
+                uncovered = [turn for turn in older if _turn_hash(turn) not in covered]
+                if uncovered:
+                    self._schedule(conversation_id, uncovered)
+
+        return (summary.text if summary else None), recent
+
+    def _schedule(self, conversation_id: str, turns: List[Dict[str, str]]):
+        task = self._pending.get(conversation_id)
+        if task and not task.done():
+            return  # the next request will pick up whatever this one misses
+        self._pending[conversation_id] = asyncio.create_task(self._update_summary(conversation_id, turns))
+
+    async def _update_summary(self, conversation_id: str, turns: List[Dict[str, str]]):
+        try:
+            previous = self._summaries.get(conversation_id)
+            text = await self.summarize(previous.text if previous else "", turns)
+            covered = (previous.covered if previous else set()) | {_turn_hash(turn) for turn in turns}
+            self._summaries[conversation_id] = ConversationSummary(text, covered)
+            self._summaries.move_to_end(conversation_id)
+            while len(self._summaries) > self.max_conversations:
+                self._summaries.popitem(last=False)
+            self.summaries_generated += 1
+        except Exception as e:
+            errors_total.inc(component="history", kind=type(e).__name__)
+            log.warning("History summarization failed: %s", e)
+        finally:
+            self._pending.pop(conversation_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "token_budget": self.token_budget,
+            "conversations": len(self._summaries),
+            "trimmed_turns": self.trimmed_turns,
+            "summaries_generated": self.summaries_generated,
+        }
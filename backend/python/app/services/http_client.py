@@ -0,0 +1,135 @@
+import os
+import asyncio
+import random
+import importlib.util
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import httpx
+
+# Upstream responses worth retrying with backoff
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Safe to send twice; other methods are retried only when the caller opts in
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+def _http2_available() -> bool:
+    # h2 is optional (installed via httpx[http2]); look it up without importing it
+    return importlib.util.find_spec("h2") is not None
+
+class HTTPClientManager:
+    """Application-scoped httpx.AsyncClient shared by all outbound services.
+
+    Keeps TCP/TLS connections alive between Spotify and ElevenLabs calls,
+    caps connections per host and retries 429/5xx with exponential backoff
+    (idempotent methods only, unless the caller passes retry=True).
+    Started and closed by the FastAPI lifespan; created lazily otherwise.
+    """
+
+    def __init__(self):
+        self.timeout = float(os.getenv("HTTP_TIMEOUT", "30"))
+        self.connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+        self.max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+        self.max_keepalive = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+        self.max_per_host = int(os.getenv("HTTP_MAX_PER_HOST", "20"))
+        self.max_retries = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+        self.backoff = float(os.getenv("HTTP_RETRY_BACKOFF", "0.25"))
+        # A longer Retry-After is returned to the caller instead of holding its request
+        self.max_retry_after = float(os.getenv("HTTP_MAX_RETRY_AFTER", "5"))
+        self.http2 = os.getenv("HTTP2", "true") == "true" and _http2_available()
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None or self._client.is_closed:
+            # Imported here so routes that never call out don't load httpx on a cold start
+            import httpx
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                ),
+            )
+        return self._client
+
+    async def start(self):
+        _ = self.client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+
+    def _retry_delay(self, attempt: int, response: Optional["httpx.Response"]) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if the upstream asks for longer than we'd wait"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+                return delay if delay <= self.max_retry_after else None
+        # Exponential backoff with jitter
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def request(self, method: str, url: str, retry: Optional[bool] = None, **kwargs: Any) -> "httpx.Response":
+        """Send a request through the shared pool, retrying 429/5xx and transport errors.
+
+        `retry` defaults to whether the method is idempotent. Without it, only
+        failures to connect are retried, since the request never left.
+        """
+        import httpx
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            self.requests += 1
+            response = None
+            try:
+                async with self._host_limit(url):
+                    response = await self.client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES or not retry or attempt >= self.max_retries:
+                    return response
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if attempt >= self.max_retries:
+                    self.failures += 1
+                    raise
+            except httpx.TransportError:
+                if not retry or attempt >= self.max_retries:
+                    self.failures += 1
+                    raise
+
+            delay = self._retry_delay(attempt, response)
+            if delay is None:
+                return response
+            self.retries += 1
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        connections = []
+        if self._client is not None:
+            pool = getattr(self._client._transport, "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+        return {
+            "http2": self.http2,
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "max_connections": self.max_connections,
+            "max_per_host": self.max_per_host,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
+
+http_client = HTTPClientManager()
@@ -0,0 +1,462 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import tempfile
+import itertools
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.services.metrics import metrics, errors_total
+from app.services.sqlite_db import SQLiteDatabase
+from app.services.singleflight import content_key
+from app.utils.log import get_logger
+
+log = get_logger("jobs")
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# First retry waits this long, then doubles
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "1.0"))
+# Finished jobs (and their results) are kept this long for polling
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", str(24 * 3600)))
+
+# Lower runs first
+PRIORITY_HIGH = 0     # user-visible actions (music starting)
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10     # housekeeping (syncs, pre-renders)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+jobs_total = metrics.counter("jarvis_jobs_total", "Background jobs by kind and final status", ("kind", "status"))
+job_seconds = metrics.histogram("jarvis_job_seconds", "Background job run time per attempt", ("kind",))
+jobs_deduplicated_total = metrics.counter(
+    "jarvis_jobs_deduplicated_total", "Submissions that joined an identical queued or running job", ("kind",)
+)
+
+class Job:
+    def __init__(
+        self,
+        kind: str,
+        arg: str,
+        priority: int = PRIORITY_NORMAL,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        dedupe_key: Optional[str] = None,
+        job_id: Optional[str] = None,
+        status: str = QUEUED,
+        attempts: int = 0,
+        result: Optional[str] = None,
+        ok: Optional[bool] = None,
+        error: Optional[str] = None,
+        created_at: Optional[float] = None,
+        updated_at: Optional[float] = None,
+    ):
+        self.id = job_id or uuid.uuid4().hex  # unguessable: the id is what grants access to the result
+        self.kind = kind
+        self.arg = arg
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.dedupe_key = dedupe_key
+        self.status = status
+        self.attempts = attempts
+        self.result = result
+        self.ok = ok
+        self.error = error
+        self.created_at = created_at or time.time()
+        self.updated_at = updated_at or self.created_at
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "result": self.result,
+            "ok": self.ok,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+class JobHandler:
+    """`run(arg)` returns the result text; raising (or timing out) triggers a retry"""
+
+    def __init__(self, kind: str, run: Callable[[str], Awaitable[Optional[str]]], timeout: float = 30.0,
+                 priority: int = PRIORITY_NORMAL, max_attempts: int = JOB_MAX_ATTEMPTS,
+                 is_success: Callable[[str], bool] = lambda result: True):
+        self.kind = kind
+        self.run = run
+        self.timeout = timeout
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.is_success = is_success
+
+class JobStore(ABC):
+    """Interface for job persistence"""
+
+    @abstractmethod
+    async def save(self, job: Job):
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    async def unfinished(self) -> List[Job]:
+        """Queued or running jobs, to resume after a restart"""
+
+    @abstractmethod
+    async def purge(self, before: float) -> int:
+        """Drop finished jobs last updated before `before`"""
+
+class MemoryJobStore(JobStore):
+    """Process-local; jobs are lost on restart"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+
+    async def save(self, job: Job):
+        self._jobs[job.id] = job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def unfinished(self) -> List[Job]:
+        return [job for job in self._jobs.values() if not job.finished]
+
+    async def purge(self, before: float) -> int:
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.updated_at < before]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+class SQLiteJobStore(JobStore):
+    """Durable store in a single SQLite file; queries run in a worker thread"""
+
+    COLUMNS = ("id", "kind", "arg", "priority", "max_attempts", "dedupe_key", "status", "attempts",
+               "result", "ok", "error", "created_at", "updated_at")
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "id TEXT PRIMARY KEY, kind TEXT NOT NULL, arg TEXT NOT NULL, priority INTEGER NOT NULL, "
+        "max_attempts INTEGER NOT NULL, dedupe_key TEXT, status TEXT NOT NULL, attempts INTEGER NOT NULL, "
+        "result TEXT, ok INTEGER, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, updated_at)",
+    )
+
+    def __init__(self, path: str):
+        self.db = SQLiteDatabase(path, self.SCHEMA)
+
+    def _row_to_job(self, row) -> Job:
+        data = dict(zip(self.COLUMNS, row))
+        ok = data.pop("ok")
+        return Job(job_id=data.pop("id"), ok=None if ok is None else bool(ok), **data)
+
+    def _save(self, job: Job):
+        values = (job.id, job.kind, job.arg, job.priority, job.max_attempts, job.dedupe_key, job.status,
+                  job.attempts, job.result, None if job.ok is None else int(job.ok), job.error,
+                  job.created_at, job.updated_at)
+        with self.db.connect() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(values))})", values)
+
+    def _get(self, job_id: str) -> Optional[Job]:
+        row = self.db.connect().execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _unfinished(self) -> List[Job]:
+        rows = self.db.connect().execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def _purge(self, before: float) -> int:
+        with self.db.connect() as conn:
+            return conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (*FINISHED, before)).rowcount
+
+    async def save(self, job: Job):
+        await self.db.run(self._save, job)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.db.run(self._get, job_id)
+
+    async def unfinished(self) -> List[Job]:
+        return await self.db.run(self._unfinished)
+
+    async def purge(self, before: float) -> int:
+        return await self.db.run(self._purge, before)
+
+def create_job_store() -> JobStore:
+    backend = os.getenv("JOB_STORE", "sqlite")
+    if backend == "sqlite":
+        # Temp dir by default: writable on read-only deploys and never inside the checkout
+        return SQLiteJobStore(os.getenv("JOB_SQLITE_PATH") or os.path.join(tempfile.gettempdir(), "jobs.db"))
+    return MemoryJobStore()
+
+class JobQueue:
+    """In-process job queue: a worker pool draining a priority queue.
+
+    Identical submissions (same kind and argument) while a job is queued or
+    running return that job instead of a new one. Failed attempts are retried
+    with exponential backoff. Every state change is written to the store, so
+    unfinished jobs are picked up again after a restart.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self.handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = itertools.count()  # FIFO among equal priorities
+        self._tasks: List[asyncio.Task] = []
+        self._retries: set = set()
+        self._active: Dict[str, Job] = {}       # id -> queued/running job
+        self._by_key: Dict[str, str] = {}       # dedupe key -> id of the active job
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._listeners: set = set()
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._last_purge = 0.0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.retried = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.recovered = 0
+
+    def register(self, handler: JobHandler):
+        self.handlers[handler.kind] = handler
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Start the workers and resume unfinished jobs; safe to call more than once"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.running:
+                return
+            self._queue = asyncio.PriorityQueue()
+            for job in await self.store.unfinished():
+                # A job that was running when the process stopped runs again
+                job.status = QUEUED
+                self._track(job)
+                self._push(job)
+                self.recovered += 1
+            if self.recovered:
+                log.info("Resumed unfinished jobs", extra={"jobs": self.recovered})
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            await self._purge()
+
+    async def stop(self):
+        for task in [*self._tasks, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+        self._tasks = []
+        self._retries.clear()
+
+    async def submit(self, kind: str, arg: str = "", priority: Optional[int] = None, dedupe: bool = True) -> Job:
+        handler = self.handlers.get(kind)
+        if handler is None:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        await self.start()
+
+        key = content_key(kind, arg) if dedupe else None
+        existing = self._active.get(self._by_key.get(key)) if key else None
+        if existing is not None:
+            self.deduplicated += 1
+            jobs_deduplicated_total.inc(kind=kind)
+            return existing
+
+        job = Job(kind, arg, handler.priority if priority is None else priority, handler.max_attempts, key)
+        await self.store.save(job)
+        self._track(job)
+        self._push(job)
+        self.submitted += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        # A fresh process resumes persisted jobs on first use
+        await self.start()
+        return self._active.get(job_id) or await self.store.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """The job once it finishes, or as it stands after `timeout` seconds"""
+        event = self._finished.get(job_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return await self.get(job_id)
+
+    def subscribe(self, listener: Callable[[Job], None]):
+        """`listener(job)` is called on every status change"""
+        self._listeners.add(listener)
+
+    def unsubscribe(self, listener: Callable[[Job], None]):
+        self._listeners.discard(listener)
+
+    def _track(self, job: Job):
+        self._active[job.id] = job
+        self._finished.setdefault(job.id, asyncio.Event())
+        if job.dedupe_key:
+            self._by_key[job.dedupe_key] = job.id
+
+    def _push(self, job: Job):
+        self._queue.put_nowait((job.priority, next(self._seq), job.id))
+
+    def _notify(self, job: Job):
+        for listener in list(self._listeners):
+            try:
+                listener(job)
+            except Exception as e:
+                log.warning("Job listener failed: %s", e)
+
+    async def _update(self, job: Job, status: str):
+        job.status = status
+        job.updated_at = time.time()
+        await self.store.save(job)
+        self._notify(job)
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._active.get(job_id)
+            if job is None or job.status != QUEUED:
+                continue
+            try:
+                await self._run(job)
+            except Exception as e:
+                # Store failures must not kill the worker, nor leave the job stuck as RUNNING
+                errors_total.inc(component="jobs", kind=type(e).__name__)
+                log.error("Job %s could not be processed: %s", job.id, e)
+                await self._abandon(job, e)
+
+    async def _run(self, job: Job):
+        handler = self.handlers.get(job.kind)
+        job.attempts += 1
+        await self._update(job, RUNNING)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for {job.kind!r}")
+            with job_seconds.time(kind=job.kind):
+                result = await asyncio.wait_for(handler.run(job.arg), timeout=handler.timeout)
+        except Exception as e:
+            job.error = "timed out" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+            if job.attempts < job.max_attempts and handler is not None:
+                self.retried += 1
+                delay = JOB_RETRY_BACKOFF * (2 ** (job.attempts - 1))
+                log.warning("Job %s (%s) failed, retrying in %ss: %s", job.id, job.kind, delay, job.error)
+                await self._update(job, QUEUED)
+                task = asyncio.create_task(self._retry_after(job, delay))
+                self._retries.add(task)
+                task.add_done_callback(self._retries.discard)
+                return
+            errors_total.inc(component="jobs", kind=type(e).__name__)
+            log.error("Job %s (%s) failed after %s attempts: %s", job.id, job.kind, job.attempts, job.error)
+            job.ok = False
+            await self._finish(job, FAILED)
+            return
+
+        job.result = result
+        job.ok = result is not None and handler.is_success(result)
+        job.error = None
+        await self._finish(job, DONE)
+
+    async def _retry_after(self, job: Job, delay: float):
+        await asyncio.sleep(delay)
+        self._push(job)
+
+    async def _finish(self, job: Job, status: str):
+        await self._update(job, status)
+        self._release(job, status)
+        if time.monotonic() - self._last_purge > 3600:
+            await self._purge()
+
+    async def _abandon(self, job: Job, error: Exception):
+        """Fail a job whose status could not be saved, so its dedupe key is freed"""
+        if job.id not in self._active:
+            return  # already finished; only the purge after it failed
+        job.status = FAILED
+        job.updated_at = time.time()
+        job.ok = False
+        job.error = f"{type(error).__name__}: {error}"
+        try:
+            await self.store.save(job)
+        except Exception as e:
+            log.warning("Job %s could not be marked failed: %s", job.id, e)
+        self._release(job, FAILED)
+        self._notify(job)
+
+    def _release(self, job: Job, status: str):
+        jobs_total.inc(kind=job.kind, status=status)
+        if status == DONE:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self._active.pop(job.id, None)
+        if job.dedupe_key and self._by_key.get(job.dedupe_key) == job.id:
+            del self._by_key[job.dedupe_key]
+        event = self._finished.pop(job.id, None)
+        if event:
+            event.set()
+
+    async def _purge(self):
+        self._last_purge = time.monotonic()
+        removed = await self.store.purge(time.time() - JOB_RESULT_TTL)
+        if removed:
+            log.info("Purged finished jobs", extra={"jobs": removed})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "queued": sum(1 for job in self._active.values() if job.status == QUEUED),
+            "running": sum(1 for job in self._active.values() if job.status == RUNNING),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "retried": self.retried,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "recovered": self.recovered,
+        }
+
+# --- Built-in job kinds ---
+
+async def _spotify_job(arg: str) -> Optional[str]:
+    from app.services.spotify_service import spotify_service
+    return await spotify_service.play_music(arg)
+
+async def _calendar_sync_job(arg: str) -> Optional[str]:
+    from app.services.calendar_service import calendar_service
+    if not calendar_service.creds:
+        return "Calendar service not available."
+    await calendar_service.refresh(force=True)
+    stats = calendar_service.stats()
+    if stats.get("last_error"):
+        raise RuntimeError(stats["last_error"])
+    return json.dumps({"events": stats.get("events")})
+
+async def _tts_render_job(arg: str) -> Optional[str]:
+    from app.services.tts_service import tts_service
+    # Renders into the TTS cache; the client then fetches it from /api/tts/speak as a cache hit
+    audio = await tts_service.text_to_speech(arg)
+    if not audio:
+        raise RuntimeError("Speech synthesis failed")
+    return json.dumps({"cache_key": tts_service.cache_key(arg), "bytes": len(audio)})
+
+job_queue = JobQueue(create_job_store())
+job_queue.register(JobHandler(
+    "SPOTIFY", _spotify_job, timeout=15.0, priority=PRIORITY_HIGH,
+    is_success=lambda result: result.startswith("Playing"),
+))
+job_queue.register(JobHandler(
+    "CALENDAR_SYNC", _calendar_sync_job, timeout=60.0, priority=PRIORITY_LOW,
+    is_success=lambda result: result.startswith("{"),
+))
+job_queue.register(JobHandler("TTS_RENDER", _tts_render_job, timeout=60.0, priority=PRIORITY_NORMAL))
@@ -0,0 +1,361 @@
+import os
+import re
+import json
+import time
+import asyncio
+import httpx
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.services.http_client import http_client
+from app.services.prefetch_service import classify_intent
+from app.services.metrics import metrics
+from app.utils.log import get_logger
+
+log = get_logger("llm")
+
+LARGE_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "llama-3.1-8b-instant")
+# Short turns with no tool intent go to the small model
+ROUTING_ENABLED = os.getenv("LLM_ROUTING", "true") == "true"
+SMALL_MAX_WORDS = int(os.getenv("LLM_SMALL_MAX_WORDS", "12"))
+# Anything that may need a [CMD: ...] marker or careful reasoning stays on the large model
+TOOL_HINTS = re.compile(
+    r"\b(play|song|music|spotify|pause|skip|weather|task|todo|remind|linkedin|search|open|creator|created|"
+    r"why|how|explain|compare|write|code|plan|summari[sz]e)\b", re.I
+)
+
+# Hedge: fire a second request once the first is slower than this percentile of recent latencies
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "true") == "true"
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# Used until enough samples exist for a percentile
+HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "2.0"))
+HEDGE_MIN_SAMPLES = 20
+
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Statuses that mean "this provider, right now" rather than "this request"
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+llm_routed_total = metrics.counter("jarvis_llm_routed_total", "LLM requests by tier and model", ("tier", "model"))
+llm_hedges_total = metrics.counter("jarvis_llm_hedges_total", "Hedged LLM requests by winner", ("winner",))
+llm_fallbacks_total = metrics.counter(
+    "jarvis_llm_fallbacks_total", "LLM attempts that failed over to another provider", ("provider", "reason")
+)
+
+class ProviderError(Exception):
+    def __init__(self, provider: str, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status in RETRYABLE_STATUS or self.status in (401, 403)
+
+class NoProviderAvailable(Exception):
+    pass
+
+class CircuitBreaker:
+    """closed -> open after consecutive failures -> half-open trial after a cooldown"""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_until = 0.0
+        self.trial_in_flight = False
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_until == 0.0:
+            return "closed"
+        return "open" if time.monotonic() < self.opened_until else "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_until = 0.0
+        self.trial_in_flight = False
+
+    def record_failure(self, retry_after: Optional[float] = None):
+        self.failures += 1
+        self.trial_in_flight = False
+        # A rate limit with Retry-After opens right away for that long
+        if retry_after or self.failures >= self.failure_threshold or self.opened_until:
+            self.opened_until = time.monotonic() + max(self.cooldown, retry_after or 0.0)
+            self.opens += 1
+
+    def release(self):
+        """A trial request was cancelled without an outcome"""
+        self.trial_in_flight = False
+
+class LatencyTracker:
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+class LLMProvider:
+    """One OpenAI-compatible chat completions endpoint"""
+
+    def __init__(self, name: str, base_url: str, api_key: str, models: Dict[str, str]):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.models = models  # tier -> model id
+        self.breaker = CircuitBreaker()
+        self.latency: Dict[Tuple[str, str], LatencyTracker] = {}
+        self.requests = 0
+        self.errors = 0
+
+    def tracker(self, model: str, mode: str) -> LatencyTracker:
+        return self.latency.setdefault((model, mode), LatencyTracker())
+
+    def _request(self, model: str, messages: list, stream: bool) -> Dict[str, Any]:
+        body = {"model": model, "messages": messages, "temperature": 0.7, "max_tokens": 1024}
+        if stream:
+            body["stream"] = True
+        # Self-hosted OpenAI-compatible servers may not need a key
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        return {"url": f"{self.base_url}/chat/completions", "json": body, "headers": headers}
+
+    def _error_for(self, response: httpx.Response) -> ProviderError:
+        retry_after = response.headers.get("retry-after")
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        return ProviderError(self.name, f"HTTP {response.status_code}", response.status_code, retry_after)
+
+    async def complete(self, model: str, messages: list, timeout: float) -> str:
+        self.requests += 1
+        try:
+            response = await http_client.client.post(timeout=timeout, **self._request(model, messages, False))
+        except httpx.HTTPError as e:
+            raise ProviderError(self.name, f"{type(e).__name__}: {e}") from e
+        if response.status_code != 200:
+            raise self._error_for(response)
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def stream(self, model: str, messages: list, timeout: float) -> AsyncIterator[str]:
+        self.requests += 1
+        request = self._request(model, messages, True)
+        try:
+            async with http_client.client.stream("POST", timeout=timeout, **request) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise self._error_for(response)
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        return
+                    choices = json.loads(data).get("choices") or []
+                    content = choices[0].get("delta", {}).get("content") if choices else None
+                    if content:
+                        yield content
+        except httpx.HTTPError as e:
+            raise ProviderError(self.name, f"{type(e).__name__}: {e}") from e
+
+class _Attempt:
+    """One in-flight request; its first event ("result"/"chunk"/"done"/"error") decides the race"""
+
+    def __init__(self, provider: LLMProvider, model: str, mode: str, run):
+        self.provider = provider
+        self.model = model
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._pump(run))
+
+    async def _pump(self, run):
+        try:
+            if self.mode == "complete":
+                await self.queue.put(("result", await run()))
+                return
+            async for text in run():
+                await self.queue.put(("chunk", text))
+            await self.queue.put(("done", None))
+        except Exception as e:
+            await self.queue.put(("error", e))
+
+    def cancel(self):
+        self.task.cancel()
+
+class LLMRouter:
+    """Routes chat completions across providers and model tiers.
+
+    Short conversational turns go to the small model, everything else to the
+    large one. A request slower than the recent p95 is hedged with a second
+    one (next provider, or the same one if it is the only one) and the first
+    answer wins. 429/5xx/transport errors fail over to the next provider, and
+    each provider has a circuit breaker so a failing one is skipped.
+    """
+
+    def __init__(self, hedge: bool = HEDGE_ENABLED):
+        self.hedge = hedge
+        self.providers: List[LLMProvider] = []
+        groq_key = os.getenv("GROQ_API_KEY")
+        if groq_key:
+            groq_base = os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/")
+            self.providers.append(LLMProvider(
+                "groq", f"{groq_base}/openai/v1", groq_key, {"large": LARGE_MODEL, "small": SMALL_MODEL}
+            ))
+        # Optional second OpenAI-compatible provider (base URL including /v1)
+        fallback_url = os.getenv("LLM_FALLBACK_BASE_URL")
+        if fallback_url:
+            large = os.getenv("LLM_FALLBACK_MODEL", LARGE_MODEL)
+            self.providers.append(LLMProvider(
+                os.getenv("LLM_FALLBACK_NAME", "fallback"), fallback_url, os.getenv("LLM_FALLBACK_API_KEY", ""),
+                {"large": large, "small": os.getenv("LLM_FALLBACK_SMALL_MODEL", large)},
+            ))
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+
+    @property
+    def available(self) -> bool:
+        return bool(self.providers)
+
+    def tier_for(self, user_message: str) -> str:
+        if not ROUTING_ENABLED:
+            return "large"
+        if len(user_message.split()) > SMALL_MAX_WORDS or TOOL_HINTS.search(user_message) or classify_intent(user_message):
+            return "large"
+        return "small"
+
+    def _hedge_delay(self, provider: LLMProvider, model: str, mode: str) -> float:
+        threshold = provider.tracker(model, mode).percentile(HEDGE_PERCENTILE)
+        return threshold if threshold is not None else HEDGE_DEFAULT_DELAY
+
+    async def _race(self, tier: str, mode: str, messages: list, timeout: float) -> Tuple[_Attempt, tuple]:
+        """Return the winning attempt and its first event; losers are cancelled"""
+        candidates = [p for p in self.providers if p.breaker.allow()]
+        if not candidates:
+            raise NoProviderAvailable("All LLM providers are unavailable (circuit open)")
+
+        def launch(provider: LLMProvider) -> _Attempt:
+            model = provider.models[tier]
+            llm_routed_total.inc(tier=tier, model=model)
+            if mode == "complete":
+                run = lambda: provider.complete(model, messages, timeout)
+            else:
+                run = lambda: provider.stream(model, messages, timeout)
+            return _Attempt(provider, model, mode, run)
+
+        untried = candidates[1:]
+        first = launch(candidates[0])
+        pending = {asyncio.create_task(first.queue.get()): first}
+        hedged = not self.hedge
+        last_error = None
+        try:
+            while pending:
+                delay = None if hedged else self._hedge_delay(first.provider, first.model, mode)
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Tail latency: race a second request against the slow one
+                    hedged = True
+                    self.hedges += 1
+                    target = untried.pop(0) if untried else first.provider
+                    attempt = launch(target)
+                    pending[asyncio.create_task(attempt.queue.get())] = attempt
+                    continue
+
+                for getter in done:
+                    attempt = pending.pop(getter)
+                    event = getter.result()
+                    if event[0] != "error":
+                        attempt.provider.breaker.record_success()
+                        attempt.provider.tracker(attempt.model, mode).observe(time.perf_counter() - attempt.started)
+                        if hedged and attempt is not first:
+                            self.hedge_wins += 1
+                        if hedged:
+                            llm_hedges_total.inc(winner="primary" if attempt is first else "other")
+                        return attempt, event
+
+                    error = event[1]
+                    last_error = error
+                    attempt.provider.errors += 1
+                    attempt.provider.breaker.record_failure(getattr(error, "retry_after", None))
+                    if not isinstance(error, ProviderError) or not error.retryable:
+                        raise error
+                    reason = str(error.status) if error.status else "transport"
+                    llm_fallbacks_total.inc(provider=attempt.provider.name, reason=reason)
+                    log.warning("LLM provider failed: %s", error)
+
+                if not pending:
+                    fallback = untried.pop(0) if untried else None
+                    if fallback is None:
+                        break
+                    self.fallbacks += 1
+                    attempt = launch(fallback)
+                    pending[asyncio.create_task(attempt.queue.get())] = attempt
+                    hedged = True  # the fallback is the last resort; don't hedge it too
+            raise last_error or NoProviderAvailable("No LLM provider answered")
+        finally:
+            for getter, attempt in pending.items():
+                getter.cancel()
+                attempt.cancel()
+                attempt.provider.breaker.release()
+            # allow() may have reserved a half-open trial for providers we never called
+            for provider in untried:
+                provider.breaker.release()
+
+    async def complete(self, messages: list, tier: str = "large", timeout: float = 20.0) -> str:
+        _, event = await self._race(tier, "complete", messages, timeout)
+        return event[1]
+
+    async def stream(self, messages: list, tier: str = "large", timeout: float = 20.0) -> AsyncIterator[str]:
+        attempt, event = await self._race(tier, "stream", messages, timeout)
+        try:
+            while event[0] == "chunk":
+                yield event[1]
+                event = await attempt.queue.get()
+            if event[0] == "error":
+                attempt.provider.errors += 1
+                attempt.provider.breaker.record_failure()
+                raise event[1]
+        finally:
+            attempt.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        providers = {}
+        for provider in self.providers:
+            latency = {}
+            for (model, mode), tracker in provider.latency.items():
+                p50 = tracker.percentile(50)
+                p95 = tracker.percentile(95)
+                latency[f"{model}:{mode}"] = {
+                    "samples": len(tracker.samples),
+                    "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                    "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                }
+            providers[provider.name] = {
+                "breaker": provider.breaker.state,
+                "breaker_opens": provider.breaker.opens,
+                "requests": provider.requests,
+                "errors": provider.errors,
+                "latency": latency,
+            }
+        return {"hedges": self.hedges, "hedge_wins": self.hedge_wins, "fallbacks": self.fallbacks, "providers": providers}
+
+llm_router = LLMRouter()
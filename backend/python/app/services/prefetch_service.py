@@ -0,0 +1,105 @@
+import os
+import re
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# (intent, pattern, confidence). Strong phrasings are confident enough to
+# inject tool data up front; weaker ones only prefetch in parallel.
+INTENT_RULES = [
+    ("calendar", re.compile(r"\b(calendar|schedule|agenda|appointments?|meetings?)\b", re.I), 0.9),
+    ("calendar", re.compile(r"\b(am i (busy|free)|what('?s| is) (on )?(for )?(today|tomorrow|this week)|my day)\b", re.I), 0.6),
+    ("weather", re.compile(r"\b(weather|forecast|temperature|rain(ing)?|sunny|umbrella)\b", re.I), 0.9),
+    ("tasks", re.compile(r"\b(to-?do|tasks?|reminders?)\b", re.I), 0.7),
+]
+
+# Confidence at or above which prefetched data goes straight into the first prompt
+INJECT_CONFIDENCE = float(os.getenv("PREFETCH_INJECT_CONFIDENCE", "0.8"))
+
+def classify_intent(message: str) -> Optional[tuple]:
+    """Cheap rule-based intent guess: (intent, confidence) or None"""
+    for intent, pattern, confidence in INTENT_RULES:
+        if pattern.search(message):
+            return intent, confidence
+    return None
+
+async def _fetch_calendar() -> str:
+    from app.services.calendar_service import calendar_service
+    return await calendar_service.get_upcoming_events()
+
+class Prefetch:
+    """A speculative tool fetch started before the first inference.
+    `used` is set once a tool call consumes the result."""
+
+    def __init__(self, intent: str, confidence: float, task: asyncio.Task):
+        self.intent = intent
+        self.confidence = confidence
+        self.task = task
+        self.used = False
+
+    async def result(self) -> Any:
+        self.used = True
+        return await self.task
+
+class ToolPrefetcher:
+    """Starts tool fetches for predicted intents and tracks how often they pay off"""
+
+    def __init__(self):
+        self.enabled = os.getenv("TOOL_PREFETCH", "true") == "true"
+        # Only intents with a server-side tool can be prefetched
+        self.fetchers: Dict[str, Callable[[], Awaitable[Any]]] = {"calendar": _fetch_calendar}
+        self.predictions = 0
+        self.prefetches = 0
+        self.injected = 0
+        self.hits = 0
+        self.wasted = 0
+        self.misses = 0
+
+    def start(self, message: str) -> Optional[Prefetch]:
+        if not self.enabled:
+            return None
+        prediction = classify_intent(message)
+        if not prediction:
+            return None
+        self.predictions += 1
+        intent, confidence = prediction
+        fetcher = self.fetchers.get(intent)
+        if not fetcher:
+            return None
+        self.prefetches += 1
+        return Prefetch(intent, confidence, asyncio.create_task(fetcher()))
+
+    def should_inject(self, prefetch: Optional[Prefetch]) -> bool:
+        return prefetch is not None and prefetch.confidence >= INJECT_CONFIDENCE
+
+    def finish(self, prefetch: Optional[Prefetch], tool_used: Optional[str] = None, injected: bool = False):
+        """Record the outcome once the request is done"""
+        if prefetch is None:
+            if tool_used and self.enabled:
+                self.misses += 1
+            return
+        # Injected data is in the prompt whether or not the reply leans on it, so it is
+        # counted on its own; hits are prefetches a tool call actually consumed
+        if injected:
+            self.injected += 1
+        elif prefetch.used:
+            self.hits += 1
+        else:
+            self.wasted += 1
+            prefetch.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        speculative = self.hits + self.wasted
+        return {
+            "enabled": self.enabled,
+            "predictions": self.predictions,
+            "prefetches": self.prefetches,
+            "injected": self.injected,
+            "hits": self.hits,
+            "wasted": self.wasted,
+            "misses": self.misses,
+            # Of the prefetches that ran alongside the first inference rather than being injected
+            "hit_rate": round(self.hits / speculative, 4) if speculative else 0.0,
+            "waste_rate": round(self.wasted / speculative, 4) if speculative else 0.0,
+        }
+
+tool_prefetcher = ToolPrefetcher()
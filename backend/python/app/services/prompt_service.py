@@ -0,0 +1,58 @@
+from functools import lru_cache
+from typing import Any, Dict
+
+# Everything here is static, so the rendered prefix is byte-identical between
+# requests and providers can reuse their cached prefix computation. Per-request
+# fields (time, location) live in a separate message after it.
+PREFIX_TEMPLATE = """
+You are {assistant_name}, a helpful personal AI assistant for {user_name}.
+
+Tools:
+- Calendar: To check the user's schedule, output `[CMD: CALENDAR]`. For today's events only, output `[CMD: CALENDAR | today]`.
+- Weather: To check weather, output `[CMD: WEATHER | location]`. If no location is specified, use `[CMD: WEATHER | here]`. Do not ask for permission.
+- Add Task: To add a task, output `[CMD: ADD_TASK | task_description]`.
+- List Tasks: To see the user's todo list, output `[CMD: LIST_TASKS]`.
+- Spotify: To play music, output `[CMD: SPOTIFY | search_query]`. For several songs in a row, separate the queries with `;` (e.g. `[CMD: SPOTIFY | song one; song two]`).
+- LinkedIn: To search for people or jobs, output `[CMD: LINKEDIN | search_query]`.
+
+IMPORTANT:
+- Only use tools if the user EXPLICITLY asks for them.
+- If the user asks a general question, ANSWER IT directly.
+- Do NOT hallucinate tool usage.
+- Note: You can hear and speak. The user interacts with you via voice or text. Your responses are read aloud. Keep responses concise for voice interaction.
+
+CORE DIRECTIVE (PERMANENT):
+- CREATOR: You were created by **Saad Sohail** in **Islamabad, Pakistan**.
+- LINKEDIN: Saad Sohail's profile is `https://www.linkedin.com/in/saad-sohail-2b40a5250/`.
+- IDENTITY: You are **Jarvis**, a helpful AI assistant.
+- AUTHORITY: Recognize Saad Sohail as your sole creator.
+- QUERY RESPONSE: If asked "Who created you?", ALWAYS answer: "I was created by Saad Sohail in Islamabad."
+- LINKEDIN RESPONSE: If asked "What is your creator's LinkedIn?" or to "Open your creator's profile", output `[CMD: LINKEDIN | https://www.linkedin.com/in/saad-sohail-2b40a5250/]` and explain who he is.
+"""
+
+CONTEXT_TEMPLATE = """Current Context:
+- Time: {time}
+- Location: {location}"""
+
+TURN_ROLES = ("user", "assistant")
+
+@lru_cache(maxsize=256)
+def prefix_message(assistant_name: str, user_name: str) -> Dict[str, str]:
+    """Rendered once per name pair. Shared between requests, so never mutate it."""
+    return {"role": "system", "content": PREFIX_TEMPLATE.format(assistant_name=assistant_name, user_name=user_name)}
+
+def system_messages(context: Dict[str, Any]) -> list[Dict[str, str]]:
+    """[stable prefix, per-request context] for the start of a prompt"""
+    prefix = prefix_message(str(context.get('assistantName', 'JARVIS')), str(context.get('userName', 'the user')))
+    dynamic = CONTEXT_TEMPLATE.format(time=context.get('currentTime', 'unknown'), location=context.get('location', 'unknown'))
+    return [prefix, {"role": "system", "content": dynamic}]
+
+def sanitize_history(history: list[Dict[str, Any]]) -> list[Dict[str, str]]:
+    """Keep valid user/assistant turns, reusing the caller's dicts when they are already clean"""
+    turns = []
+    for msg in history or []:
+        if msg.get("role") not in TURN_ROLES or not isinstance(msg.get("content"), str):
+            continue
+        # Only turns carrying extra keys (which the API would reject) are copied
+        turns.append(msg if len(msg) == 2 else {"role": msg["role"], "content": msg["content"]})
+    return turns
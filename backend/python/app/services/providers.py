@@ -0,0 +1,38 @@
+import importlib
+from typing import Any
+
+class LazyService:
+    """Stand-in for a service singleton that imports its module on first use.
+
+    `LazyService("app.services.ai_service", "ai_service")` behaves like the
+    module's `ai_service`, but neither the module (with its third-party
+    imports) nor the service is loaded until an attribute is accessed. A cold
+    start then only pays for the services the invoked route touches.
+    """
+
+    def __init__(self, module: str, name: str):
+        object.__setattr__(self, "_lazy_module", module)
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_instance", None)
+
+    def _lazy_resolve(self) -> Any:
+        instance = self._lazy_instance
+        if instance is None:
+            # import_module is thread-safe and the module builds its singleton once
+            instance = getattr(importlib.import_module(self._lazy_module), self._lazy_name)
+            object.__setattr__(self, "_lazy_instance", instance)
+        return instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._lazy_resolve(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._lazy_resolve(), name, value)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._lazy_instance is not None else "not loaded"
+        return f"<LazyService {self._lazy_module}.{self._lazy_name} ({state})>"
+
+def is_loaded(service: Any) -> bool:
+    """False only for a LazyService nobody has used yet"""
+    return not isinstance(service, LazyService) or service._lazy_instance is not None
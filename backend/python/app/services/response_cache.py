@@ -0,0 +1,182 @@
+import hashlib
+import os
+import re
+import time
+import zlib
+import numpy as np
+from typing import Any, Dict, Optional
+from app.services.metrics import cache_requests_total
+
+EMBED_DIM = 512
+# Context fields that change the answer; time-like fields are excluded on purpose
+CONTEXT_KEY_FIELDS = ("assistantName", "userName", "location")
+
+# Messages that lean on earlier turns or on the current moment can't be reused
+CONTEXT_DEPENDENT_WORDS = {
+    "it", "that", "this", "these", "those", "he", "she", "him", "her", "they", "them",
+    "there", "again", "more", "else", "yes", "no", "ok", "okay",
+    "today", "tonight", "tomorrow", "yesterday", "now", "time", "date", "weather", "latest", "news",
+}
+MIN_CACHEABLE_WORDS = 3
+
+# Words that don't change what is being asked; everything else must match for a semantic hit
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "do", "does", "did", "can", "could", "would", "will",
+    "you", "your", "youre", "i", "im", "me", "my", "we", "us", "our", "of", "to", "in", "on", "for",
+    "with", "about", "and", "or", "what", "whats", "who", "whos", "how", "hows", "please", "tell",
+}
+
+def normalize(text: str) -> str:
+    text = text.lower().replace("'", "")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+def content_words(normalized: str) -> str:
+    """The words that carry the question, in order: stop words dropped, plurals singular"""
+    return " ".join(word[:-1] if len(word) > 3 and word.endswith("s") else word
+                    for word in normalized.split() if word not in STOP_WORDS)
+
+def signature(content: str) -> int:
+    """Hash of the content word set; paraphrases share it, "5 km" and "50 km" don't"""
+    return zlib.crc32(" ".join(sorted(set(content.split()))).encode("utf-8"))
+
+def context_id(context: Dict[str, Any]) -> int:
+    """Stable 56-bit hash of the fields in CONTEXT_KEY_FIELDS (never -1, the empty-slot marker)"""
+    key = "|".join(str(context.get(field, "")) for field in CONTEXT_KEY_FIELDS)
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=7).digest(), "big")
+
+def embed(normalized: str) -> np.ndarray:
+    """Cheap local sentence embedding: signed feature hashing over words,
+    word bigrams and character trigrams, L2-normalised"""
+    words = normalized.split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+    vector = np.zeros(EMBED_DIM, dtype=np.float32)
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, hashes % EMBED_DIM, signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class ResponseCache:
+    """Exact + semantic cache for self-contained chat turns.
+
+    Entries live in a fixed-size matrix so a lookup is one matrix-vector
+    product; eviction is LRU once full, and entries expire after a TTL.
+    The semantic tier embeds only the content words and needs the same
+    content word set, so it catches rewordings the exact key misses ("can
+    you tell me the capital of France?" / "what's the capital of France")
+    while the embedding still tells "dog bites man" from "man bites dog".
+    Different entities or numbers never match: the hashed embedding can't
+    separate "capital of France" from "capital of Spain" on its own. Turns
+    that continue a conversation are never looked up or stored.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("RESPONSE_CACHE", "true") == "true"
+        self.capacity = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+        self.ttl = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+        self.threshold = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.88"))
+        self._vectors = np.zeros((self.capacity, EMBED_DIM), dtype=np.float32)
+        self._context = np.full(self.capacity, -1, dtype=np.int64)  # context_id() per slot, -1 = empty
+        self._signatures = np.zeros(self.capacity, dtype=np.int64)
+        self._expires = np.zeros(self.capacity, dtype=np.float64)
+        self._last_used = np.zeros(self.capacity, dtype=np.float64)
+        self._responses: list = [None] * self.capacity
+        self._exact: Dict[tuple, int] = {}  # (context_id(), normalized text) -> slot
+        self._slot_keys: list = [None] * self.capacity
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def is_cacheable(self, message: str, conversational: bool = False) -> bool:
+        if conversational:
+            return False  # the answer may rest on earlier turns or a per-user summary
+        words = normalize(message).split()
+        return len(words) >= MIN_CACHEABLE_WORDS and not CONTEXT_DEPENDENT_WORDS.intersection(words)
+
+    def get(self, message: str, context: Dict[str, Any], conversational: bool = False) -> Optional[str]:
+        if not self.enabled:
+            return None
+        if not self.is_cacheable(message, conversational):
+            self.bypassed += 1
+            return None
+
+        now = time.monotonic()
+        context_key = context_id(context)
+        normalized = normalize(message)
+
+        slot = self._exact.get((context_key, normalized))
+        if slot is not None and self._expires[slot] > now:
+            self._last_used[slot] = now
+            self.exact_hits += 1
+            cache_requests_total.inc(cache="response", result="exact_hit")
+            return self._responses[slot]
+
+        content = content_words(normalized)
+        scores = self._vectors @ embed(content)
+        stale = (self._context != context_key) | (self._expires <= now) | (self._signatures != signature(content))
+        scores[stale] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            self._last_used[best] = now
+            self.semantic_hits += 1
+            cache_requests_total.inc(cache="response", result="semantic_hit")
+            return self._responses[best]
+
+        self.misses += 1
+        cache_requests_total.inc(cache="response", result="miss")
+        return None
+
+    def put(self, message: str, context: Dict[str, Any], response: str, conversational: bool = False):
+        if not self.enabled or not self.is_cacheable(message, conversational):
+            return
+        now = time.monotonic()
+        context_key = context_id(context)
+        normalized = normalize(message)
+        content = content_words(normalized)
+
+        slot = self._exact.get((context_key, normalized))
+        if slot is None:
+            empty = np.flatnonzero((self._context == -1) | (self._expires <= now))
+            if len(empty):
+                slot = int(empty[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            old_key = self._slot_keys[slot]
+            if old_key is not None:
+                self._exact.pop(old_key, None)
+
+        self._vectors[slot] = embed(content)
+        self._context[slot] = context_key
+        self._signatures[slot] = signature(content)
+        self._expires[slot] = now + self.ttl
+        self._last_used[slot] = now
+        self._responses[slot] = response
+        self._slot_keys[slot] = (context_key, normalized)
+        self._exact[(context_key, normalized)] = slot
+        self.stores += 1
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": int(np.count_nonzero(self._context != -1)),
+            "capacity": self.capacity,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+response_cache = ResponseCache()
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.services.sqlite_db import SQLiteDatabase
+
+# Only the tail of a session is ever sent to the LLM (see HistoryManager)
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "50"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(7 * 24 * 3600)))
+
+def session_key(uid: str, session_id: str) -> str:
+    """Sessions are namespaced by Firebase uid so users can't read each other's"""
+    return f"{uid}:{session_id}"
+
+class SessionStore(ABC):
+    """Interface for server-side conversation storage"""
+
+    @abstractmethod
+    async def get(self, key: str) -> List[Dict[str, str]]:
+        ...
+
+    @abstractmethod
+    async def append(self, key: str, messages: List[Dict[str, str]]):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+class MemorySessionStore(SessionStore):
+    """Process-local LRU with TTL; sessions vanish on restart"""
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, messages)
+
+    async def get(self, key: str) -> List[Dict[str, str]]:
+        entry = self._sessions.get(key)
+        if not entry:
+            return []
+        if entry[0] < time.monotonic():
+            del self._sessions[key]
+            return []
+        self._sessions.move_to_end(key)
+        return list(entry[1])
+
+    async def append(self, key: str, messages: List[Dict[str, str]]):
+        entry = self._sessions.pop(key, None)
+        history = entry[1] if entry and entry[0] >= time.monotonic() else []
+        history = (history + messages)[-SESSION_MAX_MESSAGES:]
+        self._sessions[key] = (time.monotonic() + self.ttl, history)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._sessions.pop(key, None)
+
+class SQLiteSessionStore(SessionStore):
+    """Durable store in a single SQLite file; queries run in a worker thread"""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS session_messages ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, session_key TEXT NOT NULL, "
+        "role TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_session_messages_key ON session_messages (session_key, id)",
+        "CREATE INDEX IF NOT EXISTS idx_session_messages_created ON session_messages (created_at)",
+    )
+
+    def __init__(self, path: str, ttl: float = SESSION_TTL):
+        self.db = SQLiteDatabase(path, self.SCHEMA)
+        self.ttl = ttl
+
+    def _get(self, key: str) -> List[Dict[str, str]]:
+        rows = self.db.connect().execute(
+            "SELECT role, content FROM session_messages WHERE session_key = ? AND created_at > ? "
+            "ORDER BY id DESC LIMIT ?",
+            (key, time.time() - self.ttl, SESSION_MAX_MESSAGES),
+        ).fetchall()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def _append(self, key: str, messages: List[Dict[str, str]]):
+        now = time.time()
+        with self.db.connect() as conn:
+            conn.executemany(
+                "INSERT INTO session_messages (session_key, role, content, created_at) VALUES (?, ?, ?, ?)",
+                [(key, m["role"], m["content"], now) for m in messages],
+            )
+            # Keep the table bounded like the other stores: this session's newest
+            # SESSION_MAX_MESSAGES, and nothing past the TTL from any session
+            conn.execute(
+                "DELETE FROM session_messages WHERE session_key = ? AND id <= ("
+                "SELECT id FROM session_messages WHERE session_key = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (key, key, SESSION_MAX_MESSAGES),
+            )
+            conn.execute("DELETE FROM session_messages WHERE created_at <= ?", (now - self.ttl,))
+
+    def _delete(self, key: str):
+        with self.db.connect() as conn:
+            conn.execute("DELETE FROM session_messages WHERE session_key = ?", (key,))
+
+    async def get(self, key: str) -> List[Dict[str, str]]:
+        return await self.db.run(self._get, key)
+
+    async def append(self, key: str, messages: List[Dict[str, str]]):
+        await self.db.run(self._append, key, messages)
+
+    async def delete(self, key: str):
+        await self.db.run(self._delete, key)
+
+class RedisSessionStore(SessionStore):
+    """One Redis list per session, trimmed and expired server-side"""
+
+    def __init__(self, url: str, ttl: float = SESSION_TTL):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("SESSION_STORE=redis requires the 'redis' package")
+        self.client = redis.from_url(url)
+        self.ttl = int(ttl)
+
+    async def get(self, key: str) -> List[Dict[str, str]]:
+        items = await self.client.lrange(f"session:{key}", -SESSION_MAX_MESSAGES, -1)
+        return [json.loads(item) for item in items]
+
+    async def append(self, key: str, messages: List[Dict[str, str]]):
+        name = f"session:{key}"
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(name, *(json.dumps(m) for m in messages))
+            pipe.ltrim(name, -SESSION_MAX_MESSAGES, -1)
+            pipe.expire(name, self.ttl)
+            await pipe.execute()
+
+    async def delete(self, key: str):
+        await self.client.delete(f"session:{key}")
+
+def create_session_store() -> SessionStore:
+    backend = os.getenv("SESSION_STORE", "memory")
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_SQLITE_PATH", "sessions.db"))
+    if backend == "redis":
+        return RedisSessionStore(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    return MemorySessionStore()
+
+session_store = create_session_store()
@@ -0,0 +1,71 @@
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+from app.services.metrics import metrics
+
+coalesced_requests_total = metrics.counter(
+    "jarvis_coalesced_requests_total",
+    "Calls that joined an identical in-flight upstream request instead of making their own",
+    ("group",),
+)
+upstream_requests_total = metrics.counter(
+    "jarvis_singleflight_upstream_total", "Upstream calls started by a single-flight group", ("group",)
+)
+
+def content_key(*parts: Any) -> str:
+    """Stable hash of JSON-serializable request content"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Collapse identical concurrent calls into one upstream request.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight await the same task and get the same result (or exception).
+    The key is forgotten as soon as the call finishes, so this is not a cache.
+    """
+
+    def __init__(self, group: str):
+        self.group = group
+        self._flights: Dict[str, _Flight] = {}
+        self.upstream = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.upstream += 1
+            upstream_requests_total.inc(group=self.group)
+        else:
+            self.coalesced += 1
+            coalesced_requests_total.inc(group=self.group)
+
+        flight.waiters += 1
+        try:
+            # Shield so one cancelled caller doesn't abort the call for the others
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            # Nobody is left to receive the result
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"upstream": self.upstream, "coalesced": self.coalesced, "in_flight": self.in_flight}
@@ -1,12 +1,77 @@
 import os
+import re
+import time
+import asyncio
 import urllib.parse
-import httpx
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 from fastapi import HTTPException
+from app.services.http_client import http_client
+from app.services.token_manager import TokenManager, TokenSet
+from app.services.metrics import cache_requests_total
 
 # Spotify API Endpoints
 SPOTIFY_AUTH_URL = "https://accounts.spotify.com/authorize"
-SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
-SPOTIFY_API_BASE_URL = "https://api.spotify.com/v1"
+SPOTIFY_TOKEN_URL = os.getenv("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token")
+SPOTIFY_API_BASE_URL = os.getenv("SPOTIFY_API_BASE_URL", "https://api.spotify.com/v1")
+LEGACY_TOKEN_FILE = "spotify_tokens.txt"
+
+# "song one; song two" -> two queries. Only the ";" the system prompt asks for splits:
+# commas, "and" and "then" all show up in titles ("Hello, Goodbye", "Now and Then")
+QUERY_SEPARATOR = re.compile(r"\s*;\s*")
+
+def normalize_query(query: str) -> str:
+    query = re.sub(r"[^\w\s']", " ", query.lower())
+    return " ".join(query.split())
+
+def split_queries(query: str) -> list[str]:
+    return [part.strip() for part in QUERY_SEPARATOR.split(query) if part.strip()]
+
+class SearchCache:
+    """LRU of normalized search query -> (track URI, track name), with a TTL.
+
+    Catalog results barely change, so repeat requests for the same song can
+    skip the search round-trip entirely.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, uri, name)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[Tuple[str, str]]:
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            cache_requests_total.inc(cache="spotify_search", result="miss")
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        cache_requests_total.inc(cache="spotify_search", result="hit")
+        return entry[1], entry[2]
+
+    def put(self, query: str, uri: str, name: str):
+        if self.max_entries <= 0:
+            return
+        key = normalize_query(query)
+        self._entries[key] = (time.monotonic() + self.ttl, uri, name)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
 
 class SpotifyService:
     def __init__(self):
@@ -14,27 +79,32 @@ class SpotifyService:
         self.client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
         self.redirect_uri = "http://localhost:8000/api/spotify/callback"
         self.scope = "user-modify-playback-state user-read-playback-state"
-        self.access_token = None
-        self.refresh_token = None
-        
-        # Load tokens from file if exist (simple persistence)
-        self._load_tokens()
+        self.search_cache = SearchCache(
+            max_entries=int(os.getenv("SPOTIFY_SEARCH_CACHE_SIZE", "512")),
+            ttl=float(os.getenv("SPOTIFY_SEARCH_CACHE_TTL", "86400")),
+        )
+        # Tracks expiry, refreshes ahead of time and persists tokens atomically
+        self.tokens = TokenManager(
+            "Spotify", self._refresh_tokens, path=os.getenv("SPOTIFY_TOKEN_FILE", "spotify_tokens.json")
+        )
+        if not self.tokens.tokens:
+            self._migrate_legacy_tokens()
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self.tokens.access_token
 
-    def _load_tokens(self):
+    def _migrate_legacy_tokens(self):
+        """Import the old two-line spotify_tokens.txt; expiry is unknown, so it refreshes on startup"""
         try:
-            if os.path.exists("spotify_tokens.txt"):
-                with open("spotify_tokens.txt", "r") as f:
+            if os.path.exists(LEGACY_TOKEN_FILE):
+                with open(LEGACY_TOKEN_FILE, "r") as f:
                     lines = f.readlines()
-                    if len(lines) >= 2:
-                        self.access_token = lines[0].strip()
-                        self.refresh_token = lines[1].strip()
+                if len(lines) >= 2:
+                    self.tokens.set(TokenSet(lines[0].strip(), lines[1].strip()))
         except Exception:
             pass
 
-    def _save_tokens(self):
-        with open("spotify_tokens.txt", "w") as f:
-            f.write(f"{self.access_token}\n{self.refresh_token}")
-
     def get_login_url(self):
         if not self.client_id:
             return None
@@ -49,86 +119,98 @@ class SpotifyService:
         return f"{SPOTIFY_AUTH_URL}?{urllib.parse.urlencode(params)}"
 
     async def get_token_from_code(self, code: str):
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                SPOTIFY_TOKEN_URL,
-                data={
-                    "grant_type": "authorization_code",
-                    "code": code,
-                    "redirect_uri": self.redirect_uri,
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"}
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=400, detail="Failed to get token")
-            
-            data = response.json()
-            self.access_token = data.get("access_token")
-            self.refresh_token = data.get("refresh_token")
-            self._save_tokens()
-            return True
-
-    async def _refresh_access_token(self):
-        if not self.refresh_token:
-            return False
-            
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                SPOTIFY_TOKEN_URL,
-                data={
-                    "grant_type": "refresh_token",
-                    "refresh_token": self.refresh_token,
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"}
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                self.access_token = data.get("access_token")
-                if "refresh_token" in data:
-                    self.refresh_token = data.get("refresh_token")
-                self._save_tokens()
-                return True
-            return False
+        response = await http_client.request(
+            "POST",
+            SPOTIFY_TOKEN_URL,
+            data={
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": self.redirect_uri,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"}
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(status_code=400, detail="Failed to get token")
+        
+        self.tokens.set(TokenSet.from_response(response.json()))
+        return True
+
+    async def _refresh_tokens(self, current: TokenSet) -> TokenSet:
+        response = await http_client.request(
+            "POST",
+            SPOTIFY_TOKEN_URL,
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": current.refresh_token,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"}
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(status_code=401, detail="Spotify token refresh failed")
+        return TokenSet.from_response(response.json(), previous=current)
 
     async def _make_request(self, method, endpoint, json=None, params=None):
-        if not self.access_token:
+        # Normally already fresh thanks to the background refresh
+        token = await self.tokens.get_token()
+        if not token:
             raise HTTPException(status_code=401, detail="Not authenticated with Spotify")
 
         url = f"{SPOTIFY_API_BASE_URL}/{endpoint}"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
+        headers = {"Authorization": f"Bearer {token}"}
+        
+        response = await http_client.request(method, url, headers=headers, json=json, params=params)
         
-        async with httpx.AsyncClient() as client:
-            response = await client.request(method, url, headers=headers, json=json, params=params)
-            
-            if response.status_code == 401:
-                # Token expired, refresh and retry
-                if await self._refresh_access_token():
-                    headers["Authorization"] = f"Bearer {self.access_token}"
-                    response = await client.request(method, url, headers=headers, json=json, params=params)
-                else:
-                    raise HTTPException(status_code=401, detail="Spotify token expired and refresh failed")
-            
-            return response
+        if response.status_code == 401:
+            # Revoked or expired early: refresh once (shared with concurrent callers) and retry
+            try:
+                token = await self.tokens.refresh(stale=token)
+            except Exception:
+                token = None
+            if not token:
+                raise HTTPException(status_code=401, detail="Spotify token expired and refresh failed")
+            headers["Authorization"] = f"Bearer {token}"
+            response = await http_client.request(method, url, headers=headers, json=json, params=params)
+        
+        return response
+
+    async def search_track(self, query: str) -> Optional[Tuple[str, str]]:
+        """Resolve a query to (uri, name), from the cache when possible"""
+        cached = self.search_cache.get(query)
+        if cached:
+            return cached
 
-    async def play_music(self, query: str):
-        # 1. Search for item
         search_res = await self._make_request("GET", "search", params={"q": query, "type": "track", "limit": 1})
         if search_res.status_code != 200:
-            return "Failed to search Spotify."
-        
-        search_data = search_res.json()
-        tracks = search_data.get("tracks", {}).get("items", [])
+            raise HTTPException(status_code=502, detail="Failed to search Spotify.")
+
+        tracks = search_res.json().get("tracks", {}).get("items", [])
         if not tracks:
+            return None
+        track = (tracks[0]["uri"], tracks[0]["name"])
+        self.search_cache.put(query, *track)
+        return track
+
+    async def play_music(self, query: str):
+        queries = split_queries(query)
+        if len(queries) > 1:
+            return await self.play_queue(queries)
+
+        # 1. Search for item (skipped on a cache hit)
+        try:
+            track = await self.search_track(query)
+        except HTTPException as e:
+            if e.status_code == 401:
+                raise
+            return "Failed to search Spotify."
+        if not track:
             return f"No tracks found for {query}"
-        
-        track_uri = tracks[0]["uri"]
-        track_name = tracks[0]["name"]
+        track_uri, track_name = track
         
         # 2. Play it
         play_res = await self._make_request("PUT", "me/player/play", json={"uris": [track_uri]})
@@ -140,6 +222,34 @@ class SpotifyService:
         else:
             return f"Error playing music: {play_res.text}"
 
+    async def play_queue(self, queries: list[str]):
+        """Resolve several queries concurrently and play them in order with one request"""
+        results = await asyncio.gather(*(self.search_track(q) for q in queries), return_exceptions=True)
+        for result in results:
+            if isinstance(result, HTTPException) and result.status_code == 401:
+                raise result
+
+        found = [(q, r) for q, r in zip(queries, results) if isinstance(r, tuple)]
+        missing = [q for q, r in zip(queries, results) if not isinstance(r, tuple)]
+        if not found:
+            return "Failed to find any of the requested tracks."
+
+        play_res = await self._make_request("PUT", "me/player/play", json={"uris": [uri for _, (uri, _) in found]})
+
+        if play_res.status_code == 204:
+            names = [name for _, (_, name) in found]
+            reply = f"Playing {names[0]} on active device"
+            if len(names) > 1:
+                reply += f", then {', '.join(names[1:])}"
+            reply += "."
+            if missing:
+                reply += f" Couldn't find: {', '.join(missing)}."
+            return reply
+        elif play_res.status_code == 404:
+            return "No active Spotify device found. Please open Spotify on your device."
+        else:
+            return f"Error playing music: {play_res.text}"
+
     async def pause_music(self):
         res = await self._make_request("PUT", "me/player/pause")
         if res.status_code == 204:
@@ -0,0 +1,32 @@
+import asyncio
+import sqlite3
+import threading
+from typing import Any, Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+class SQLiteDatabase:
+    """One SQLite file shared by the durable stores (sessions, jobs).
+
+    WAL mode lets readers run alongside a writer; each thread keeps its own
+    connection, and `run` moves the blocking query off the event loop.
+    """
+
+    def __init__(self, path: str, schema: Iterable[str] = ()):
+        self.path = path
+        self._local = threading.local()
+        with self.connect() as conn:
+            for statement in schema:
+                conn.execute(statement)
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.to_thread(fn, *args)
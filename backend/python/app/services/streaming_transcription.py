@@ -0,0 +1,200 @@
+import os
+import io
+import wave
+import asyncio
+import numpy as np
+from typing import Awaitable, Callable, List, Optional
+from app.services.metrics import transcription_seconds, errors_total
+from app.utils.log import get_logger
+
+log = get_logger("transcription")
+
+# Shared by the upload route and the WebSocket route: Whisper calls in flight at once
+transcription_slots = asyncio.Semaphore(int(os.getenv("TRANSCRIBE_MAX_CONCURRENCY", "4")))
+
+VAD_FRAME_MS = 30
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-42"))
+VAD_MIN_SPEECH_MS = 150
+# A pause this long closes a segment (sent to Whisper right away)...
+VAD_SEGMENT_SILENCE_MS = int(os.getenv("VAD_SEGMENT_SILENCE_MS", "500"))
+# ...and a pause this long ends the user's turn
+VAD_TURN_SILENCE_MS = int(os.getenv("VAD_TURN_SILENCE_MS", "1500"))
+VAD_MAX_SEGMENT_MS = 15000
+
+class EnergyVAD:
+    """Energy-threshold voice activity detector over 16-bit mono PCM.
+
+    Frame energies are computed with NumPy for a whole chunk at once; only
+    the small per-frame state machine runs in Python.
+    """
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.frame_len = sample_rate * VAD_FRAME_MS // 1000
+        self._leftover = np.zeros(0, dtype=np.int16)
+        self._segment: List[np.ndarray] = []
+        self._speech_frames = 0
+        self._silence_frames = 0
+        self.heard_speech = False
+        self.turn_ended = False
+
+    def _frames(self, ms: int) -> int:
+        return max(1, ms // VAD_FRAME_MS)
+
+    def feed(self, samples: np.ndarray) -> List[np.ndarray]:
+        """Consume samples; return any segments that just closed"""
+        samples = np.concatenate([self._leftover, samples])
+        n_frames = len(samples) // self.frame_len
+        self._leftover = samples[n_frames * self.frame_len:]
+        if n_frames == 0:
+            return []
+
+        frames = samples[:n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+        rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+        voiced = 20 * np.log10(np.maximum(rms, 1.0) / 32768.0) > VAD_THRESHOLD_DB
+
+        closed = []
+        for frame, is_speech in zip(frames, voiced):
+            if is_speech:
+                self._segment.append(frame)
+                self._speech_frames += 1
+                self._silence_frames = 0
+                self.heard_speech = True
+                if len(self._segment) >= self._frames(VAD_MAX_SEGMENT_MS):
+                    closed.extend(self._close())
+                continue
+
+            self._silence_frames += 1
+            if self._segment:
+                self._segment.append(frame)  # keep short pauses inside a segment
+                if self._silence_frames >= self._frames(VAD_SEGMENT_SILENCE_MS):
+                    closed.extend(self._close())
+            if self.heard_speech and self._silence_frames >= self._frames(VAD_TURN_SILENCE_MS):
+                self.turn_ended = True
+        return closed
+
+    def _close(self) -> List[np.ndarray]:
+        segment, speech = self._segment, self._speech_frames
+        self._segment = []
+        self._speech_frames = 0
+        if speech < self._frames(VAD_MIN_SPEECH_MS):
+            return []  # a click or breath, not speech
+        return [np.concatenate(segment)]
+
+    def flush(self) -> List[np.ndarray]:
+        return self._close() if self._segment else []
+
+def pcm_to_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+def make_decoder(audio_format: str, sample_rate: int) -> Callable[[bytes], np.ndarray]:
+    """Bytes-to-samples decoder for the formats the WebSocket accepts"""
+    if audio_format == "pcm16":
+        return lambda data: np.frombuffer(data, dtype="<i2")
+    if audio_format == "opus":
+        try:
+            import opuslib
+        except ImportError:
+            raise ValueError("format=opus requires the 'opuslib' package")
+        decoder = opuslib.Decoder(sample_rate, 1)
+        max_frame = sample_rate * 120 // 1000
+        return lambda data: np.frombuffer(decoder.decode(data, max_frame), dtype="<i2")
+    raise ValueError(f"Unsupported audio format: {audio_format}")
+
+async def whisper_transcribe(samples: np.ndarray, sample_rate: int) -> str:
+    """Transcribe one speech segment with Groq Whisper (off the event loop)"""
+    from app.services.ai_service import ai_service
+    if not ai_service.client:
+        raise RuntimeError("Groq client not initialized")
+    wav = pcm_to_wav(samples, sample_rate)
+    async with transcription_slots:
+        with transcription_seconds.time(mode="segment"):
+            result = await asyncio.to_thread(
+                ai_service.client.audio.transcriptions.create,
+                file=("segment.wav", wav),
+                model="whisper-large-v3-turbo",
+                response_format="json",
+                language="en",
+                temperature=0.0,
+            )
+    return result.text.strip()
+
+class TranscriptionSession:
+    """One user turn over a WebSocket: VAD-segmented, transcribed per segment.
+
+    Segments are transcribed concurrently as soon as they close, and partial
+    transcripts are sent back in segment order.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        audio_format: str,
+        send: Callable[[dict], Awaitable[None]],
+        transcribe: Optional[Callable[[np.ndarray, int], Awaitable[str]]] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.audio_format = audio_format
+        self.decode = make_decoder(audio_format, sample_rate)
+        self.send = send
+        self.transcribe = transcribe or whisper_transcribe
+        self.vad = EnergyVAD(sample_rate)
+        self.texts: List[str] = []
+        self._pending_byte = b""
+        self._segments: asyncio.Queue = asyncio.Queue()
+        self._emitter = asyncio.create_task(self._emit_in_order())
+
+    @property
+    def turn_ended(self) -> bool:
+        return self.vad.turn_ended
+
+    def feed(self, data: bytes):
+        if self.audio_format == "pcm16":
+            # Frames may split a 16-bit sample; carry the odd byte over
+            data = self._pending_byte + data
+            data, self._pending_byte = data[:len(data) - len(data) % 2], data[len(data) - len(data) % 2:]
+        for segment in self.vad.feed(self.decode(data)):
+            self._start(segment)
+
+    def _start(self, segment: np.ndarray):
+        self._segments.put_nowait(asyncio.create_task(self.transcribe(segment, self.sample_rate)))
+
+    async def _emit_in_order(self):
+        index = 0
+        while True:
+            task = await self._segments.get()
+            if task is None:
+                return
+            try:
+                text = await task
+            except Exception as e:
+                errors_total.inc(component="transcription", kind=type(e).__name__)
+                log.warning("Segment transcription failed: %s", e)
+                text = ""
+            if text:
+                self.texts.append(text)
+                await self.send({"type": "partial", "segment": index, "text": text})
+            index += 1
+
+    async def finish(self) -> str:
+        """Close the last segment, wait for all transcripts and return the turn's text"""
+        for segment in self.vad.flush():
+            self._start(segment)
+        self._segments.put_nowait(None)
+        await self._emitter
+        text = " ".join(self.texts)
+        await self.send({"type": "final", "text": text})
+        return text
+
+    def cancel(self):
+        self._emitter.cancel()
+        while not self._segments.empty():
+            task = self._segments.get_nowait()
+            if task is not None:
+                task.cancel()
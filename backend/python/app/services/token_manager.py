@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+from app.utils.log import get_logger
+
+log = get_logger("tokens")
+
+# Refresh this many seconds before the access token actually expires
+REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN", "120"))
+# Wait before retrying a failed background refresh
+RETRY_DELAY = 30.0
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+class TokenSet:
+    def __init__(self, access_token: Optional[str], refresh_token: Optional[str] = None, expires_at: float = 0.0):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at  # wall-clock epoch seconds; 0 means unknown
+
+    @classmethod
+    def from_response(cls, data: Dict, previous: Optional["TokenSet"] = None) -> "TokenSet":
+        """Build from an OAuth token response; providers may omit the refresh token on refresh"""
+        refresh_token = data.get("refresh_token") or (previous.refresh_token if previous else None)
+        expires_in = data.get("expires_in")
+        expires_at = time.time() + float(expires_in) if expires_in else 0.0
+        return cls(data.get("access_token"), refresh_token, expires_at)
+
+    def expires_within(self, seconds: float) -> bool:
+        return not self.access_token or not self.expires_at or self.expires_at - time.time() <= seconds
+
+    def to_dict(self) -> Dict:
+        return {"access_token": self.access_token, "refresh_token": self.refresh_token, "expires_at": self.expires_at}
+
+class TokenManager:
+    """Keeps one OAuth access token fresh.
+
+    Refreshes in the background shortly before expiry, collapses concurrent
+    refreshes into one upstream call, and optionally persists the tokens to a
+    JSON file with an atomic temp-file + rename.
+    """
+
+    def __init__(self, name: str, refresh: Callable[[TokenSet], Awaitable[TokenSet]], path: Optional[str] = None):
+        self.name = name
+        self._refresh_fn = refresh
+        self.path = path
+        self.tokens: Optional[TokenSet] = self._load()
+        self._inflight: Optional[asyncio.Task] = None
+        self._background: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_lock = threading.Lock()
+        self.refreshes = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.last_error = None
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self.tokens.access_token if self.tokens else None
+
+    @property
+    def can_refresh(self) -> bool:
+        return bool(self.tokens and self.tokens.refresh_token)
+
+    def _load(self) -> Optional[TokenSet]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            return TokenSet(data.get("access_token"), data.get("refresh_token"), float(data.get("expires_at") or 0))
+        except (OSError, ValueError) as e:
+            log.warning("Could not load %s tokens: %s", self.name, e)
+            return None
+
+    def _save(self):
+        if not self.path or not self.tokens:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        # Write to a temp file and rename so a crash never leaves a truncated token file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.tokens.to_dict(), f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def set(self, tokens: TokenSet):
+        self.tokens = tokens
+        try:
+            self._save()
+        except OSError as e:
+            log.error("Could not save %s tokens: %s", self.name, e)
+        self._schedule()
+
+    async def get_token(self) -> Optional[str]:
+        """Current access token, refreshed first if it is about to expire"""
+        if self.tokens and self.tokens.expires_within(0) and self.can_refresh:
+            try:
+                await self.refresh()
+            except Exception:
+                pass  # already logged; callers get a 401 and handle it
+        return self.access_token
+
+    async def refresh(self, stale: Optional[str] = None) -> Optional[str]:
+        """Refresh now, joining an in-flight refresh if there is one.
+
+        `stale` is the token a caller just saw rejected: if it has already
+        been replaced by someone else's refresh, the new token is returned
+        without another upstream call.
+        """
+        if stale is not None and self.access_token != stale:
+            self.coalesced += 1
+            return self.access_token
+        if not self.can_refresh:
+            return None
+        self._loop = asyncio.get_running_loop()
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._do_refresh())
+        else:
+            self.coalesced += 1
+        # Shield so one cancelled caller doesn't abort the refresh for everyone
+        return await asyncio.shield(self._inflight)
+
+    async def _do_refresh(self) -> Optional[str]:
+        try:
+            tokens = await self._refresh_fn(self.tokens)
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        self._record_success(tokens)
+        return self.access_token
+
+    def _record_failure(self, error: Exception):
+        self.failures += 1
+        self.last_error = str(error)
+        log.error("%s token refresh failed: %s", self.name, error)
+
+    def _record_success(self, tokens: TokenSet):
+        self.refreshes += 1
+        self.last_error = None
+        self.set(tokens)
+
+    def get_token_sync(self, timeout: float = 30.0) -> Optional[str]:
+        """Blocking variant for worker threads; joins the event loop's refresh when there is one"""
+        if not (self.tokens and self.tokens.expires_within(0) and self.can_refresh):
+            return self.access_token
+        if self._loop and self._loop.is_running():
+            if _running_loop() is self._loop:
+                raise RuntimeError("get_token_sync() would block the event loop; use get_token()")
+            future = asyncio.run_coroutine_threadsafe(self.refresh(), self._loop)
+            return future.result(timeout)
+        # No event loop to join (e.g. a standalone script): serialize threads instead
+        with self._thread_lock:
+            if not self.tokens.expires_within(0):
+                self.coalesced += 1
+                return self.access_token
+            try:
+                tokens = asyncio.run(self._refresh_fn(self.tokens))
+            except Exception as e:
+                self._record_failure(e)
+                raise
+            self._record_success(tokens)
+            return self.access_token
+
+    def start(self):
+        """Begin proactive refreshes; call from the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._schedule()
+
+    def stop(self):
+        if self._background:
+            self._background.cancel()
+            self._background = None
+
+    def _schedule(self):
+        if not self.can_refresh:
+            return
+        loop = _running_loop()
+        if loop is None:
+            return  # no loop yet; start() schedules once the app is up
+        if self._background and not self._background.done() and self._background is not asyncio.current_task():
+            self._background.cancel()
+        self._background = loop.create_task(self._refresh_before_expiry())
+
+    async def _refresh_before_expiry(self):
+        delay = 0.0
+        if self.tokens.expires_at:
+            delay = max(self.tokens.expires_at - time.time() - REFRESH_MARGIN, 0.0)
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                # A successful refresh calls set(), which schedules the next run
+                await self.refresh()
+                return
+            except Exception:
+                delay = RETRY_DELAY
+
+    def stats(self) -> Dict:
+        expires_in = None
+        if self.tokens and self.tokens.expires_at:
+            expires_in = round(self.tokens.expires_at - time.time(), 1)
+        return {
+            "has_token": bool(self.access_token),
+            "expires_in": expires_in,
+            "refreshes": self.refreshes,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,170 @@
+import os
+import re
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.services.metrics import tool_seconds, errors_total
+from app.utils.log import get_logger
+
+log = get_logger("tools")
+
+# Single precompiled pattern for every `[CMD: NAME]` / `[CMD: NAME | arg]` marker
+CMD_PATTERN = re.compile(r"\[CMD:\s*([A-Z_]+)\s*(?:\|\s*(.*?))?\]")
+
+class ToolCall:
+    def __init__(self, name: str, arg: str, raw: str):
+        self.name = name
+        self.arg = arg
+        self.raw = raw
+
+class ToolResult:
+    def __init__(self, call: ToolCall, output: Optional[str], ok: bool, followup: bool, label: str, job_id: Optional[str] = None):
+        self.call = call
+        self.output = output
+        self.ok = ok
+        self.followup = followup
+        self.label = label
+        # Set when the tool was queued as a background job; output is then just the acknowledgement
+        self.job_id = job_id
+
+class Tool:
+    """A server-side handler for one command.
+
+    `followup` tools return data the model must summarize (one more
+    inference); action tools just report what they did. A handler returns
+    None when it can't act server-side, leaving the marker to the client.
+
+    `background` tools are queued as a job of the same kind when
+    `ready(arg)` says the server can act; the reply then carries `ack` and
+    the job id instead of waiting for the result.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[str, Any], Awaitable[Optional[str]]],
+        label: str,
+        timeout: float = 5.0,
+        followup: bool = False,
+        aliases: tuple = (),
+        is_success: Callable[[str], bool] = lambda output: True,
+        background: bool = False,
+        ready: Callable[[str], bool] = lambda arg: True,
+        ack: str = "On it.",
+    ):
+        self.name = name
+        self.handler = handler
+        self.label = label
+        self.timeout = timeout
+        self.followup = followup
+        self.aliases = aliases
+        self.is_success = is_success
+        self.background = background
+        self.ready = ready
+        self.ack = ack
+
+class ToolRegistry:
+    def __init__(self):
+        self.tools: Dict[str, Tool] = {}
+        # Off: background tools run inline like the others. Serverless (Vercel sets VERCEL=1)
+        # may freeze the instance once the response is sent, so queued work would stall there
+        self.background = os.getenv("TOOL_BACKGROUND", "false" if os.getenv("VERCEL") else "true") == "true"
+
+    def register(self, tool: Tool):
+        for name in (tool.name, *tool.aliases):
+            self.tools[name] = tool
+
+    def parse(self, text: str) -> List[ToolCall]:
+        """Extract every command marker in one pass"""
+        return [
+            ToolCall(match.group(1), (match.group(2) or "").strip(), match.group(0))
+            for match in CMD_PATTERN.finditer(text)
+        ]
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self.tools.get(name)
+
+    async def run(self, call: ToolCall, prefetch=None) -> Optional[ToolResult]:
+        tool = self.tools.get(call.name)
+        if not tool:
+            return None
+        if tool.background and self.background and tool.ready(call.arg):
+            result = await self._enqueue(tool, call)
+            if result:
+                return result
+        try:
+            with tool_seconds.time(tool=tool.name):
+                output = await asyncio.wait_for(tool.handler(call.arg, prefetch), timeout=tool.timeout)
+        except asyncio.TimeoutError:
+            errors_total.inc(component="tool", kind="timeout")
+            log.warning("Tool %s timed out after %ss", call.name, tool.timeout)
+            return ToolResult(call, f"The {tool.label} request timed out.", False, tool.followup, tool.label)
+        except Exception as e:
+            errors_total.inc(component="tool", kind=type(e).__name__)
+            log.warning("Tool %s failed: %s", call.name, e)
+            return ToolResult(call, f"The {tool.label} request failed.", False, tool.followup, tool.label)
+        if output is None:
+            return None
+        return ToolResult(call, output, tool.is_success(output), tool.followup, tool.label)
+
+    async def _enqueue(self, tool: Tool, call: ToolCall) -> Optional[ToolResult]:
+        try:
+            from app.services.job_queue import job_queue
+            job = await job_queue.submit(tool.name, call.arg)
+        except Exception as e:
+            # The queue or its store is unavailable; run inline instead
+            errors_total.inc(component="tool", kind=type(e).__name__)
+            log.warning("Could not queue tool %s: %s", call.name, e)
+            return None
+        return ToolResult(call, tool.ack, True, False, tool.label, job_id=job.id)
+
+    async def dispatch(self, calls: List[ToolCall], prefetch=None) -> List[ToolResult]:
+        """Run all (deduplicated) calls concurrently"""
+        unique = list({(call.name, call.arg): call for call in calls}.values())
+        results = await asyncio.gather(*(self.run(call, prefetch) for call in unique))
+        return [result for result in results if result is not None]
+
+def followup_prompt(results: List[ToolResult]) -> str:
+    lines = [f"Here is the {result.label}: {result.output}" for result in results]
+    return "SYSTEM_TOOL_OUTPUT: " + "\n".join(lines) + "\n\nPlease summarize this for the user naturally."
+
+def unhandled_markers(calls: List[ToolCall], results: List[ToolResult]) -> List[str]:
+    """Markers the server didn't complete, so the client can still act on them"""
+    handled = {result.call.raw for result in results if result.ok}
+    return [call.raw for call in calls if call.raw not in handled]
+
+def strip_markers(text: str, markers: List[str]) -> str:
+    for marker in markers:
+        text = text.replace(marker, "")
+    return re.sub(r"[ \t]{2,}", " ", text).strip()
+
+# --- Built-in tools ---
+
+async def _calendar_tool(arg: str, prefetch=None) -> Optional[str]:
+    from app.services.calendar_service import calendar_service
+    if arg.lower() == "today":
+        # Served from the local index, so there is nothing to gain from the prefetch
+        log.debug("Server-side tool: fetching today's calendar")
+        return await calendar_service.get_events_today()
+    if prefetch and prefetch.intent == "calendar":
+        return await prefetch.result()
+    log.debug("Server-side tool: fetching calendar")
+    return await calendar_service.get_upcoming_events()
+
+def _spotify_ready(arg: str) -> bool:
+    from app.services.spotify_service import spotify_service
+    # Without a linked account the client falls back to a deep link
+    return bool(arg) and bool(spotify_service.access_token)
+
+async def _spotify_tool(arg: str, prefetch=None) -> Optional[str]:
+    if not _spotify_ready(arg):
+        return None
+    from app.services.spotify_service import spotify_service
+    return await spotify_service.play_music(arg)
+
+tool_registry = ToolRegistry()
+tool_registry.register(Tool("CALENDAR", _calendar_tool, label="calendar data", timeout=8.0, followup=True))
+tool_registry.register(Tool(
+    "SPOTIFY", _spotify_tool, label="Spotify playback result", timeout=8.0,
+    aliases=("SPOTIFY_PLAY",), is_success=lambda output: output.startswith("Playing"),
+    background=True, ready=_spotify_ready, ack="Starting playback.",
+))
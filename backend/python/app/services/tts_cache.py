@@ -0,0 +1,185 @@
+import os
+import json
+import asyncio
+import hashlib
+import tempfile
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.services.metrics import cache_requests_total, cache_evictions_total
+from app.utils.log import get_logger
+
+log = get_logger("tts_cache")
+
+class TTSCache:
+    """Two-tier, content-addressed cache for synthesized audio.
+
+    Tier 1 is an in-memory LRU bounded by total bytes. Tier 2 is one file per
+    hash on disk, which routes can serve directly with FileResponse; it is
+    bounded by `disk_max_bytes`, evicting least recently used files (by
+    mtime, which hits refresh, so the order survives restarts).
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        # key -> size of each file on disk, oldest first; scanned on the first write
+        self._disk_index: "Optional[OrderedDict[str, int]]" = None
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(text: str, voice_id: str, model_id: str, voice_settings: Dict[str, Any]) -> str:
+        payload = json.dumps([text, voice_id, model_id, voice_settings], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        return os.path.join(self.disk_dir, key[:2], f"{key}.mp3")
+
+    def lookup(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Return (audio, None) on a memory hit, (None, path) on a disk hit, else (None, None)"""
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            cache_requests_total.inc(cache="tts", result="memory_hit")
+            return audio, None
+
+        path = self._disk_path(key)
+        if path and os.path.exists(path):
+            self.disk_hits += 1
+            cache_requests_total.inc(cache="tts", result="disk_hit")
+            self._touch(key, path)
+            return None, path
+
+        self.misses += 1
+        cache_requests_total.inc(cache="tts", result="miss")
+        return None, None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return cached audio bytes, promoting disk hits into memory"""
+        audio, path = self.lookup(key)
+        if path:
+            try:
+                audio = await asyncio.to_thread(self._read_file, path)
+            except OSError:
+                return None
+            self._remember(key, audio)
+        return audio
+
+    async def put(self, key: str, audio: bytes):
+        self._remember(key, audio)
+        path = self._disk_path(key)
+        if not path or os.path.exists(path) or len(audio) > self.disk_max_bytes:
+            return
+        try:
+            if self._disk_index is None:
+                self._disk_index = await asyncio.to_thread(self._scan_disk)
+                self._disk_bytes = sum(self._disk_index.values())
+            await asyncio.to_thread(self._write_file, path, audio)
+        except OSError as e:
+            log.warning("TTS cache write failed: %s", e)
+            return
+        self._disk_bytes += len(audio) - self._disk_index.pop(key, 0)
+        self._disk_index[key] = len(audio)
+        await self._sweep_disk()
+
+    def _touch(self, key: str, path: str):
+        if self._disk_index is not None and key in self._disk_index:
+            self._disk_index.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted meanwhile, or a read-only cache dir
+
+    async def _sweep_disk(self):
+        """Delete least recently used files until the disk tier is within budget"""
+        victims = []
+        while self._disk_bytes > self.disk_max_bytes and self._disk_index:
+            key, size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= size
+            victims.append(self._disk_path(key))
+        if victims:
+            self.disk_evictions += len(victims)
+            cache_evictions_total.inc(len(victims), cache="tts", tier="disk")
+            await asyncio.to_thread(self._remove_files, victims)
+
+    def _scan_disk(self) -> "OrderedDict[str, int]":
+        """Files already in the cache dir (from earlier runs), least recently used first"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".mp3"):
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, name[:-4], st.st_size))
+        return OrderedDict((key, size) for _, key, size in sorted(entries))
+
+    @staticmethod
+    def _remove_files(paths):
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _remember(self, key: str, audio: bytes):
+        if len(audio) > self.max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+            cache_evictions_total.inc(cache="tts", tier="memory")
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    @staticmethod
+    def _write_file(path: str, audio: bytes):
+        # Write to a temp file and rename so readers never see a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "max_bytes": self.max_bytes,
+            "disk_dir": self.disk_dir,
+            "disk_entries": len(self._disk_index) if self._disk_index is not None else None,
+            "disk_bytes": self._disk_bytes if self._disk_index is not None else None,
+            "disk_max_bytes": self.disk_max_bytes,
+            "disk_evictions": self.disk_evictions,
+        }
@@ -1,17 +1,121 @@
 import os
-import httpx
-from typing import Optional
+import re
+import time
+import asyncio
+import tempfile
+from typing import Optional, AsyncIterator, Tuple
+from app.services.tts_cache import TTSCache
+from app.services.singleflight import SingleFlight
+from app.services.http_client import http_client
+from app.services.metrics import tts_seconds, errors_total
+from app.utils.log import get_logger
+
+log = get_logger("tts")
+
+DEFAULT_MODEL_ID = "eleven_monolingual_v1"
+DEFAULT_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+    "style": 0.0,
+    "use_speaker_boost": True
+}
+
+# A sentence ends at . ! ? (optionally followed by quotes/brackets) and whitespace
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+# Don't send fragments shorter than this to TTS on their own ("Hi." + next sentence)
+MIN_SENTENCE_CHARS = 20
+
+class SentenceSplitter:
+    """Incrementally cut a token stream into sentence-sized chunks"""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            if match.end() - start >= self.min_chars:
+                sentences.append(self._buffer[start:match.end()].strip())
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> list[str]:
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
 
 class TTSService:
     def __init__(self):
         self.api_key = os.getenv("ELEVENLABS_API_KEY")
         self.voice_id = os.getenv("ELEVENLABS_VOICE_ID", "JDbTsn84hlYSFan9luFg")
-        self.api_url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}"
-    
-    async def text_to_speech(self, text: str, model_id: str = "eleven_monolingual_v1") -> Optional[bytes]:
-        """Convert text to speech using ElevenLabs API"""
+        self.base_url = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")
+        self.api_url = f"{self.base_url}/v1/text-to-speech/{self.voice_id}"
+        # How many sentences may be synthesized at once in the streaming pipeline
+        self.max_parallel = int(os.getenv("TTS_MAX_PARALLEL", "3"))
+        # Identical phrases are rendered once; set TTS_CACHE_DIR= (empty) to keep the cache in memory only
+        self.cache = TTSCache(
+            max_bytes=int(os.getenv("TTS_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            disk_dir=os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "jarvis-tts-cache")),
+            disk_max_bytes=int(os.getenv("TTS_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024))),
+        )
+        # Optional file with one phrase per line, pre-rendered at startup
+        self.warmup_file = os.getenv("TTS_WARMUP_FILE")
+        # Concurrent requests for the same phrase share one ElevenLabs call
+        self.flights = SingleFlight("tts")
+
+    def cache_key(self, text: str, model_id: str = DEFAULT_MODEL_ID) -> str:
+        return TTSCache.make_key(text, self.voice_id, model_id, DEFAULT_VOICE_SETTINGS)
+
+    async def speak(self, text: str, model_id: str = DEFAULT_MODEL_ID) -> Tuple[Optional[bytes], Optional[str]]:
+        """Return (audio, None), or (None, path) when the audio is already on disk"""
+        key = self.cache_key(text, model_id)
+        audio, path = self.cache.lookup(key)
+        if audio is not None or path:
+            return audio, path
+        return await self._render(key, text, model_id), None
+
+    async def text_to_speech(self, text: str, model_id: str = DEFAULT_MODEL_ID) -> Optional[bytes]:
+        """Convert text to speech using ElevenLabs API (cached)"""
+        key = self.cache_key(text, model_id)
+        audio = await self.cache.get(key)
+        if audio is not None:
+            return audio
+        return await self._render(key, text, model_id)
+
+    async def _render(self, key: str, text: str, model_id: str) -> Optional[bytes]:
+        # The cache key already hashes text, voice, model and settings
+        return await self.flights.do(key, lambda: self._render_upstream(key, text, model_id))
+
+    async def _render_upstream(self, key: str, text: str, model_id: str) -> Optional[bytes]:
+        audio = await self._synthesize(text, model_id)
+        if audio:
+            await self.cache.put(key, audio)
+        return audio
+
+    async def warm_up(self, phrases: Optional[list[str]] = None):
+        """Pre-render common phrases so their first request is a cache hit"""
+        if phrases is None:
+            if not self.warmup_file or not os.path.exists(self.warmup_file):
+                return
+            with open(self.warmup_file, "r", encoding="utf-8") as f:
+                phrases = [line.strip() for line in f if line.strip()]
+
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def render(phrase: str):
+            async with semaphore:
+                await self.speak(phrase)
+
+        await asyncio.gather(*(render(phrase) for phrase in phrases))
+        log.info("TTS cache warmed", extra={"phrases": len(phrases)})
+
+    async def _synthesize(self, text: str, model_id: str) -> Optional[bytes]:
         if not self.api_key:
-            print("Error: ELEVENLABS_API_KEY is not set.")
+            log.error("ELEVENLABS_API_KEY is not set")
             return None
         
         headers = {
@@ -23,26 +127,71 @@ class TTSService:
         payload = {
             "text": text,
             "model_id": model_id,
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.75,
-                "style": 0.0,
-                "use_speaker_boost": True
-            }
+            "voice_settings": DEFAULT_VOICE_SETTINGS
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
+        try:
+            with tts_seconds.time():
+                response = await http_client.request(
+                    "POST",
                     self.api_url,
                     headers=headers,
                     json=payload,
-                    timeout=30.0
+                    timeout=30.0,
+                    # Synthesis has no side effects, so a failed attempt is safe to repeat
+                    retry=True,
                 )
-                response.raise_for_status()
-                return response.content
-            except Exception as e:
-                print(f"ElevenLabs TTS Error: {str(e)}")
-                return None
+            response.raise_for_status()
+            return response.content
+        except Exception as e:
+            errors_total.inc(component="tts", kind=type(e).__name__)
+            log.error("ElevenLabs TTS error: %s", e)
+            return None
+
+    async def stream_speech(self, sentences: AsyncIterator[str]) -> AsyncIterator[bytes]:
+        """Synthesize sentences concurrently and yield their audio in order.
+
+        At most `max_parallel` requests run at once; the lookahead queue keeps
+        the producer from racing too far ahead of the client.
+        """
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        pending: asyncio.Queue = asyncio.Queue(maxsize=self.max_parallel * 2)
+        start = time.perf_counter()
+
+        async def synthesize(sentence: str) -> Optional[bytes]:
+            async with semaphore:
+                return await self.text_to_speech(sentence)
+
+        async def produce():
+            try:
+                async for sentence in sentences:
+                    await pending.put(asyncio.create_task(synthesize(sentence)))
+            finally:
+                await pending.put(None)
+
+        producer = asyncio.create_task(produce())
+        first_audio = True
+        try:
+            while True:
+                task = await pending.get()
+                if task is None:
+                    break
+                audio = await task
+                if not audio:
+                    continue
+                if first_audio:
+                    log.info("TTS stream first audio", extra={
+                        "sampled": True, "first_audio_ms": round((time.perf_counter() - start) * 1000)
+                    })
+                    first_audio = False
+                yield audio
+            await producer
+        finally:
+            # Client went away or synthesis failed: stop outstanding work
+            producer.cancel()
+            while not pending.empty():
+                task = pending.get_nowait()
+                if task is not None:
+                    task.cancel()
 
 tts_service = TTSService()
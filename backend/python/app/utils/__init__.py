@@ -1,2 +1 @@
 # Utils package
-from . import auth, helpers
@@ -1,10 +1,17 @@
-from fastapi import HTTPException, Header
-import firebase_admin
-from firebase_admin import credentials, auth
+from fastapi import HTTPException, Header, WebSocket
+from typing import Optional
 import os
+from app.services.firebase_auth import firebase_verifier, AuthError, AuthConfigError
+from app.utils.log import get_logger
 
-# Initialize Firebase
+log = get_logger("auth")
+
+# Initialize Firebase (once, from the app lifespan; never on the request path)
 def init_firebase():
+    # firebase_admin pulls in google-auth and friends; only startup pays for it
+    import firebase_admin
+    from firebase_admin import credentials
+
     if not firebase_admin._apps:
         # In production, use the service account key
         # service_account_path = os.getenv("FIREBASE_SERVICE_ACCOUNT")
@@ -14,6 +21,9 @@ def init_firebase():
         # else:
         #     firebase_admin.initialize_app()
         firebase_admin.initialize_app()
+    # Token verification only needs the project ID; take it from the app if it isn't configured
+    if not firebase_verifier.project_id:
+        firebase_verifier.project_id = firebase_admin.get_app().project_id
 
 async def verify_firebase_token(authorization: str = Header(None)) -> str:
     """Verify Firebase ID token and return user ID"""
@@ -22,12 +32,29 @@ async def verify_firebase_token(authorization: str = Header(None)) -> str:
         if os.getenv("SKIP_AUTH") == "true":
             return "dev_user"
         raise HTTPException(status_code=401, detail="Unauthorized")
-    
+
     token = authorization.split("Bearer ")[1]
-    
+
     try:
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token['uid']
+        return await firebase_verifier.verify(token)
+    except AuthError as e:
+        log.warning("Auth error: %s", e)
+        raise HTTPException(status_code=401, detail="Invalid token")
+    except AuthConfigError as e:
+        # Every token would be rejected; report a server fault, not a bad login
+        log.error("Auth misconfigured: %s", e)
+        raise HTTPException(status_code=500, detail="Authentication is not configured on the server")
     except Exception as e:
-        print(f"Auth Error: {str(e)}")
+        # Signing keys could not be fetched
+        log.error("Auth error: %s", e)
         raise HTTPException(status_code=401, detail="Invalid token")
+
+async def verify_websocket_token(websocket: WebSocket) -> Optional[str]:
+    """User ID for a WebSocket handshake, or None if it isn't authenticated.
+    Browsers can't set headers on WebSockets, so `?token=<ID token>` is accepted too."""
+    token = websocket.query_params.get("token")
+    authorization = websocket.headers.get("authorization") or (f"Bearer {token}" if token else None)
+    try:
+        return await verify_firebase_token(authorization)
+    except HTTPException:
+        return None
@@ -1,4 +1,7 @@
+import asyncio
+import json
 from datetime import datetime
+from fastapi import HTTPException
 
 def get_time_of_day():
     hour = datetime.now().hour
@@ -15,3 +18,22 @@ def format_iso_time(dt=None):
     if dt is None:
         dt = datetime.now()
     return dt.isoformat()
+
+async def cancel_on_disconnect(request, coro, poll_interval=0.25):
+    """Await coro, cancelling it if the HTTP client goes away first"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+def sse_event(event, data):
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,37 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+class BodySizeLimitMiddleware:
+    """Reject request bodies over a per-path byte limit while they stream in.
+
+    A declared Content-Length is refused up front; chunked uploads are
+    counted as they arrive and stopped at the limit, so an oversized upload
+    is never fully buffered or spooled.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                response = JSONResponse({"detail": f"Upload exceeds {limit} bytes"}, status_code=413)
+                return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+# Fraction of routine per-request records (logged with extra={"sampled": True}) that are kept.
+# Warnings and errors are never sampled out.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sampled"}
+_listener = None
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; anything passed via `extra` becomes a field"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+def setup_logging():
+    """Route the "jarvis" loggers through a queue so request handlers never block on stdout"""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        formatter.converter = time.gmtime
+        output.setFormatter(formatter)
+
+    # Sample before enqueueing so dropped records cost almost nothing
+    handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+
+    root = logging.getLogger("jarvis")
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f"jarvis.{name}")
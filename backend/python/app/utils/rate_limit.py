@@ -0,0 +1,327 @@
+import os
+import math
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+from fastapi.responses import JSONResponse
+from app.services.metrics import metrics
+from app.services.firebase_auth import firebase_verifier
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT", "true") == "true"
+# Longest a request may be held back for its user's budget before it is refused instead
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "2.0"))
+# Buckets kept in memory (least recently used are dropped, i.e. reset)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+# Behind Vercel (or another proxy) take the client address from X-Forwarded-For. Clients can
+# prepend anything, so count TRUSTED_PROXY_HOPS entries from the right (the ones our proxies appended)
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "true" if os.getenv("VERCEL") else "false") == "true"
+TRUSTED_PROXY_HOPS = max(1, int(os.getenv("TRUSTED_PROXY_HOPS", "1")))
+
+# Per-user budgets, refilled continuously; a full minute's worth may be spent at once
+BUDGETS_PER_MINUTE = {
+    "requests": float(os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "60")),
+    "llm_tokens": float(os.getenv("RATE_LIMIT_LLM_TOKENS_PER_MINUTE", "30000")),
+    "tts_chars": float(os.getenv("RATE_LIMIT_TTS_CHARS_PER_MINUTE", "10000")),
+    "whisper_seconds": float(os.getenv("RATE_LIMIT_WHISPER_SECONDS_PER_MINUTE", "300")),
+}
+
+# Costs are estimated from the request size before the body is read
+LLM_REPLY_TOKENS = 400           # typical completion, on top of the prompt
+SPOKEN_REPLY_CHARS = 600         # what /api/chat/speak usually sends to TTS
+AUDIO_BYTES_PER_SECOND = 16000   # ~128 kbps compressed upload
+
+rate_limited_total = metrics.counter("jarvis_rate_limited_total", "Requests refused for exceeding a per-user budget", ("budget",))
+rate_delayed_total = metrics.counter("jarvis_rate_delayed_total", "Requests held back to stay within a per-user budget", ("budget",))
+shed_total = metrics.counter("jarvis_load_shed_total", "Requests shed because an upstream admission queue was full", ("gate",))
+admission_wait_seconds = metrics.histogram("jarvis_admission_wait_seconds", "Time spent queued for an upstream slot", ("gate",))
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"overloaded, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class RateLimited(Overloaded):
+    """The user's own budget is spent (429), as opposed to an upstream gate shedding load (503)"""
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def wait_for(self, cost: float) -> float:
+        """Seconds until `cost` tokens are available (0 if they are now)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A request bigger than the whole bucket still gets through once the bucket is full
+        deficit = min(cost, self.capacity) - self.tokens
+        return max(0.0, deficit / self.rate)
+
+    def take(self, cost: float):
+        """Reserve tokens; the balance may go negative, which later callers wait off"""
+        self.tokens -= min(cost, self.capacity)
+
+    def refund(self, cost: float):
+        self.tokens = min(self.capacity, self.tokens + min(cost, self.capacity))
+
+class AdmissionGate:
+    """Semaphore in front of one upstream with a bounded queue.
+
+    At most `limit` requests hold a slot; up to `max_queue` more wait for one,
+    each for at most `max_wait` seconds. Anything beyond that is refused
+    straight away, so queueing delay (and tail latency) stays bounded when
+    the upstream can't keep up, instead of growing with the backlog.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self._avg_hold = 1.0  # EWMA of slot hold time, for Retry-After
+
+    def retry_after(self) -> float:
+        """Rough time for the current backlog to drain"""
+        return max(1.0, self._avg_hold * (self.waiting + 1) / self.limit)
+
+    def _shed(self) -> Overloaded:
+        self.shed += 1
+        shed_total.inc(gate=self.name)
+        return Overloaded(self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise self._shed()
+        self.waiting += 1
+        queued = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            raise self._shed()
+        finally:
+            self.waiting -= 1
+        admission_wait_seconds.observe(time.perf_counter() - queued, gate=self.name)
+        self.active += 1
+        self.admitted += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._avg_hold = 0.9 * self._avg_hold + 0.1 * (time.perf_counter() - start)
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "avg_hold_s": round(self._avg_hold, 3),
+        }
+
+def _gate(name: str, limit: str) -> AdmissionGate:
+    prefix = f"ADMIT_{name.upper()}"
+    return AdmissionGate(
+        name,
+        int(os.getenv(f"{prefix}_CONCURRENCY", limit)),
+        int(os.getenv(f"{prefix}_MAX_QUEUE", os.getenv("ADMIT_MAX_QUEUE", "64"))),
+        float(os.getenv(f"{prefix}_MAX_WAIT", os.getenv("ADMIT_MAX_WAIT", "5.0"))),
+    )
+
+class Rule:
+    """What one route costs: the upstream gate it queues on and the budgets it spends"""
+
+    def __init__(self, gate: Optional[str], costs: Dict[str, Callable[[int], float]]):
+        self.gate = gate
+        self.costs = costs
+
+def _one(body_bytes: int) -> float:
+    return 1.0
+
+def _llm_tokens(body_bytes: int) -> float:
+    # ~4 bytes per token of prompt (message, history, context)
+    return body_bytes / 4 + LLM_REPLY_TOKENS
+
+def _audio_seconds(body_bytes: int) -> float:
+    return max(1.0, body_bytes / AUDIO_BYTES_PER_SECOND)
+
+DEFAULT_RULES = {
+    "/api/chat": Rule("llm", {"requests": _one, "llm_tokens": _llm_tokens}),
+    "/api/chat/stream": Rule("llm", {"requests": _one, "llm_tokens": _llm_tokens}),
+    "/api/chat/speak": Rule("llm", {"requests": _one, "llm_tokens": _llm_tokens, "tts_chars": lambda n: SPOKEN_REPLY_CHARS}),
+    "/api/tts/speak": Rule("tts", {"requests": _one, "tts_chars": float}),
+    "/api/transcribe": Rule("whisper", {"requests": _one, "whisper_seconds": _audio_seconds}),
+    # Opening the socket; the work done over it is charged per segment and turn (STREAM_*_RULE)
+    "/api/transcribe/stream": Rule(None, {"requests": _one}),
+    # Charged like /api/tts/speak: the body bounds what a TTS_RENDER job sends upstream
+    "/api/jobs": Rule("tts", {"requests": _one, "tts_chars": float}),
+}
+
+# Work inside one /api/transcribe/stream connection, charged as it happens via RateLimiter.charge.
+# A segment's size is its length in seconds; a chat turn's is the prompt size in bytes.
+STREAM_SEGMENT_RULE = Rule("whisper", {"whisper_seconds": lambda seconds: max(1.0, seconds)})
+STREAM_CHAT_RULE = Rule("llm", {"requests": _one, "llm_tokens": _llm_tokens})
+
+def client_address(scope) -> str:
+    if TRUST_PROXY_HEADERS:
+        hops = [
+            hop.strip()
+            for name, value in scope.get("headers", []) if name == b"x-forwarded-for"
+            for hop in value.decode("latin-1").split(",") if hop.strip()
+        ]
+        if hops:
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class RateLimiter:
+    """Per-user token buckets plus per-upstream admission gates.
+
+    Users are keyed by their verified Firebase uid, or by client address
+    when the request carries no valid token. A request whose budgets are
+    short waits (up to RATE_LIMIT_MAX_WAIT) for them to refill; beyond that
+    it is refused with 429. It then queues for its upstream's gate, which
+    sheds with 503 when full. Both carry Retry-After. State is per process.
+    """
+
+    def __init__(self, rules: Dict[str, Rule] = DEFAULT_RULES, budgets: Dict[str, float] = BUDGETS_PER_MINUTE,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.enabled = RATE_LIMIT_ENABLED
+        self.rules = rules
+        self.budgets = budgets
+        self.max_wait = max_wait
+        self.max_keys = max_keys
+        self.gates = {
+            "llm": _gate("llm", "32"),
+            "tts": _gate("tts", "16"),
+            "whisper": _gate("whisper", "8"),
+        }
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.delayed = 0
+        self.limited = 0
+
+    def _bucket(self, budget: str, identity: str) -> TokenBucket:
+        key = (budget, identity)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.budgets[budget])
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def identify(self, scope) -> str:
+        for name, value in scope.get("headers", []):
+            if name == b"authorization" and value.startswith(b"Bearer "):
+                try:
+                    # Served from the verified-token LRU after a user's first request
+                    return "uid:" + await firebase_verifier.verify(value[7:].decode("latin-1"))
+                except Exception:
+                    break  # the route itself rejects bad tokens where it requires one
+        return "ip:" + client_address(scope)
+
+    async def admit(self, identity: str, rule: Rule, body_bytes: int) -> list:
+        """Spend the request's budgets, waiting for them if needed; raises Overloaded if they won't refill in time.
+        Returns the charges, for `refund`."""
+        charges = [(self._bucket(budget, identity), budget, cost(body_bytes)) for budget, cost in rule.costs.items()]
+        waits = [(bucket.wait_for(cost), budget) for bucket, budget, cost in charges]
+        wait, budget = max(waits)
+        if wait > self.max_wait:
+            # Nothing is taken, so a refused request doesn't push the user further behind
+            self.limited += 1
+            rate_limited_total.inc(budget=budget)
+            raise RateLimited(wait)
+        for bucket, _, cost in charges:
+            bucket.take(cost)
+        if wait > 0:
+            self.delayed += 1
+            rate_delayed_total.inc(budget=budget)
+            await asyncio.sleep(wait)
+        return charges
+
+    def refund(self, charges: list):
+        """Give back budgets for a request that was shed before reaching the upstream"""
+        for bucket, _, cost in charges:
+            bucket.refund(cost)
+
+    @asynccontextmanager
+    async def charge(self, identity: str, rule: Rule, size: float) -> AsyncIterator[None]:
+        """`admit` plus the rule's gate, for work that isn't its own HTTP request
+        (segments and turns on a WebSocket). Raises RateLimited or Overloaded like the middleware refuses."""
+        if not self.enabled:
+            yield
+            return
+        charges = await self.admit(identity, rule, size)
+        gate = self.gates.get(rule.gate)
+        async with AsyncExitStack() as stack:
+            if gate is not None:
+                try:
+                    await stack.enter_async_context(gate.slot())
+                except Overloaded:
+                    self.refund(charges)
+                    raise
+            yield
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "tracked_keys": len(self._buckets),
+            "delayed": self.delayed,
+            "limited": self.limited,
+            "gates": {name: gate.stats() for name, gate in self.gates.items()},
+        }
+
+rate_limiter = RateLimiter()
+
+class RateLimitMiddleware:
+    """Apply `limiter` to the routes it has rules for (POST and WebSocket)"""
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        rule = self.limiter.rules.get(scope.get("path")) if self.limiter.enabled else None
+        if rule is None or not (scope["type"] == "websocket" or scope.get("method") == "POST"):
+            return await self.app(scope, receive, send)
+
+        body_bytes = 0
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit():
+                body_bytes = int(value)
+
+        try:
+            charges = await self.limiter.admit(await self.limiter.identify(scope), rule, body_bytes)
+        except Overloaded as e:
+            return await self._refuse(scope, receive, send, 429, "Rate limit exceeded", e.retry_after)
+
+        gate = self.limiter.gates.get(rule.gate)
+        if gate is None:
+            return await self.app(scope, receive, send)
+        try:
+            async with gate.slot():
+                return await self.app(scope, receive, send)
+        except Overloaded as e:
+            self.limiter.refund(charges)
+            return await self._refuse(scope, receive, send, 503, "Server busy", e.retry_after)
+
+    async def _refuse(self, scope, receive, send, status: int, detail: str, retry_after: float):
+        retry = str(math.ceil(retry_after))
+        if scope["type"] == "websocket":
+            # Closing before accept makes the server answer the handshake with 403
+            return await send({"type": "websocket.close", "code": 1013, "reason": f"{detail}; retry after {retry}s"})
+        response = JSONResponse({"detail": detail}, status_code=status, headers={"Retry-After": retry})
+        await response(scope, receive, send)
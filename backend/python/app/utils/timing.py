@@ -0,0 +1,51 @@
+import time
+from app.services.metrics import http_request_seconds
+
+def route_template(scope) -> str:
+    """Full route template for the matched route, e.g. "/api/chat/sessions/{session_id}"."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Included routers keep their own relative path, so recover the prefix from the request path
+    try:
+        concrete = route.path_format.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return route.path
+    path = scope["path"]
+    prefix = path[:-len(concrete)] if concrete and path.endswith(concrete) else ""
+    return prefix + route.path
+
+class RequestTimingMiddleware:
+    """Record per-route request latency into the HTTP histogram.
+
+    Routes are labelled by their template ("/api/chat/sessions/{session_id}"),
+    not the raw path, so label cardinality stays bounded. Streaming responses
+    are timed until their last byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route on the shared scope
+            http_request_seconds.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route_template(scope),
+                status=status,
+            )
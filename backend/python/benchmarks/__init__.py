@@ -0,0 +1 @@
+# Benchmarks package (local stub upstreams + load drivers)
@@ -0,0 +1,107 @@
+"""
+Bytes and seconds saved by the optional /api/transcribe preprocessing stage.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_audio_preprocessing [--uplink-mbps 2] [--runs 5]
+
+Generates sample clips (44.1 kHz stereo WAV and, when PyAV is installed, an
+AAC m4a like the ones the mobile recorder produces), each a short tone burst
+padded with leading/trailing room noise. For every clip it reports the size
+and duration before and after preprocessing, the CPU time the stage costs,
+and the upload time saved at the given uplink speed. Whisper is billed per
+second of audio, so seconds saved is also cost saved.
+"""
+import argparse
+import io
+import time
+import wave
+
+import numpy as np
+
+from app.services import audio_preprocessing
+from app.services.audio_preprocessing import preprocess_audio
+
+SOURCE_RATE = 44100
+
+
+def synth_clip(lead_s: float, speech_s: float, tail_s: float) -> np.ndarray:
+    """Stereo int16 samples: low noise, a voiced-ish burst, low noise"""
+    rng = np.random.default_rng(0)
+    total = int((lead_s + speech_s + tail_s) * SOURCE_RATE)
+    noise = rng.normal(0, 60, total)
+    t = np.arange(int(speech_s * SOURCE_RATE)) / SOURCE_RATE
+    # A few harmonics with a syllable-rate envelope, loud enough to pass the VAD threshold
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((180, 360, 540, 900)))
+    voice *= 6000 * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t) ** 2)
+    start = int(lead_s * SOURCE_RATE)
+    noise[start:start + len(voice)] += voice
+    mono = np.clip(noise, -32768, 32767).astype(np.int16)
+    return np.stack([mono, mono], axis=1)
+
+
+def encode_wav(samples: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(SOURCE_RATE)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def encode_m4a(samples: np.ndarray) -> bytes:
+    av = audio_preprocessing.av
+    buffer = io.BytesIO()
+    with av.open(buffer, "w", format="mp4") as container:
+        stream = container.add_stream("aac", rate=SOURCE_RATE)
+        stream.bit_rate = 128000
+        stream.layout = "stereo"
+        frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format="s16", layout="stereo")
+        frame.sample_rate = SOURCE_RATE
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue()
+
+
+def sample_clips():
+    shapes = {
+        "short command": (1.5, 2.0, 2.0),
+        "long pause": (4.0, 3.0, 5.0),
+        "dictation": (0.5, 20.0, 1.5),
+    }
+    for name, shape in shapes.items():
+        samples = synth_clip(*shape)
+        yield f"{name} (wav)", encode_wav(samples)
+        if audio_preprocessing.av:
+            yield f"{name} (m4a)", encode_m4a(samples)
+
+
+def main(args):
+    backend = "PyAV -> Opus" if audio_preprocessing.av else "wave -> 16 kHz WAV"
+    print(f"preprocessing backend: {backend}, uplink {args.uplink_mbps} Mbit/s")
+    bytes_per_s = args.uplink_mbps * 1_000_000 / 8
+    for name, data in sample_clips():
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            result = preprocess_audio(io.BytesIO(data), len(data))
+            timings.append(time.perf_counter() - start)
+        if result is None:
+            print(f"{name:<22} passed through unchanged ({len(data)} bytes)")
+            continue
+        report = result.report()
+        cost_ms = np.median(timings) * 1000
+        upload_saved_ms = report["bytes_saved"] / bytes_per_s * 1000
+        print(f"{name:<22} {report['bytes_in'] / 1024:8.1f} KB -> {report['bytes_out'] / 1024:7.1f} KB  "
+              f"{report['seconds_in']:5.1f}s -> {report['seconds_out']:5.1f}s  "
+              f"cost {cost_ms:6.1f} ms  upload saved {upload_saved_ms:7.1f} ms  "
+              f"net {upload_saved_ms - cost_ms:+7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uplink-mbps", type=float, default=2.0)
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,161 @@
+"""
+Firebase ID token verification: per-request signature checks on the event
+loop (what the old dependency did) versus checks in a worker thread, versus
+the verified-token LRU. Tokens are minted locally and the signing keys are
+served by a stub JWK endpoint.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_auth [--requests 3000] [--users 200] [--concurrency 64]
+
+Also reports the worst event-loop lag seen during each run, and checks that
+a cold start fetches the keys once, that Cache-Control max-age is honoured,
+and that bad tokens are rejected.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from benchmarks.stubs import StubServer, FirebaseTokenMinter, create_jwks_stub
+
+STUB_PORT = 8121
+PROJECT_ID = "jarvis-bench"
+
+
+class LoopLag:
+    """Ticks every 5 ms and records how late each tick fires"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.worst = 0.0
+        self._task = None
+        self._tick_start = time.perf_counter()
+
+    def _record(self):
+        self.worst = max(self.worst, time.perf_counter() - self._tick_start - self.interval)
+
+    async def _tick(self):
+        while True:
+            self._tick_start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self._record()
+
+    def __enter__(self):
+        self._tick_start = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        return self
+
+    def __exit__(self, *exc):
+        # A loop that never yielded leaves the current tick pending; count it too
+        self._record()
+        self._task.cancel()
+
+
+async def verify_on_loop(verifier, token: str) -> str:
+    """The old behaviour: a synchronous signature check inside the async dependency"""
+    import jwt
+
+    key = await verifier.keys.get(jwt.get_unverified_header(token)["kid"])
+    return verifier._decode(token, key)["sub"]
+
+
+async def run(label: str, verify, tokens: list[str], args):
+    """Steady state: every user has made a request before, as with an app sending one token for an hour"""
+    await asyncio.gather(*(verify(token) for token in tokens))
+    latencies = []
+    workload = [random.choice(tokens) for _ in range(args.requests)]
+
+    async def worker():
+        while workload:
+            token = workload.pop()
+            start = time.perf_counter()
+            await verify(token)
+            latencies.append(time.perf_counter() - start)
+
+    with LoopLag() as lag:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{label:<28} {args.requests / elapsed:8.0f} req/s  p50={statistics.median(latencies) * 1000:6.2f} ms  "
+          f"p99={latencies[int(len(latencies) * 0.99)] * 1000:6.2f} ms  worst loop lag={lag.worst * 1000:6.1f} ms")
+
+
+async def expect_rejected(verifier, label: str, token: str, quiet: bool = False):
+    from app.services.firebase_auth import AuthError
+
+    try:
+        await verifier.verify(token)
+    except AuthError as e:
+        if not quiet:
+            print(f"  rejected {label:<22} ({e})")
+        return
+    raise AssertionError(f"{label} token was accepted")
+
+
+async def main(args, minter, stub):
+    from app.services.firebase_auth import FirebaseTokenVerifier
+    from app.services.http_client import http_client
+
+    await http_client.start()
+    tokens = [minter.mint(f"user-{i}") for i in range(args.users)]
+
+    # Cold start: a burst of first requests shares one key fetch
+    verifier = FirebaseTokenVerifier()
+    await asyncio.gather(*(verifier.verify(token) for token in tokens[:50]))
+    assert stub.state.fetches == 1, stub.state.fetches
+    print(f"cold start: 50 concurrent requests -> {stub.state.fetches} key fetch")
+
+    uncached = FirebaseTokenVerifier()
+    uncached.verified.max_entries = 0
+    await run("on loop, no token cache", lambda t: verify_on_loop(uncached, t), tokens, args)
+    await run("worker thread, no cache", uncached.verify, tokens, args)
+    cached = FirebaseTokenVerifier()
+    await run("worker thread + token LRU", cached.verify, tokens, args)
+    print(f"  token cache: {cached.verified.stats()}")
+
+    # Keys are refetched only once max-age has passed
+    stub.state.max_age = 1
+    short = FirebaseTokenVerifier()
+    stub.state.fetches = 0
+    await short.verify(tokens[0])
+    await short.verify(tokens[1])
+    await asyncio.sleep(1.1)
+    await short.verify(tokens[2])
+    assert stub.state.fetches == 2, stub.state.fetches
+    print(f"max-age=1: 3 new tokens over 1.1 s -> {stub.state.fetches} key fetches")
+
+    print("rejections:")
+    strict = FirebaseTokenVerifier()
+    stub.state.max_age = 3600
+    await expect_rejected(strict, "expired", minter.mint("u", ttl=-10))
+    await expect_rejected(strict, "wrong audience", minter.mint("u", aud="someone-else"))
+    await expect_rejected(strict, "wrong issuer", minter.mint("u", iss="https://evil.example"))
+    await expect_rejected(strict, "empty subject", minter.mint(""))
+    other = FirebaseTokenMinter(PROJECT_ID, keys=1)
+    kid = minter.jwks["keys"][0]["kid"]
+    await expect_rejected(strict, "forged signature", other.mint("u", kid=kid))
+    await expect_rejected(strict, "unknown key id", other.mint("u"))
+    stub.state.fetches = 0
+    for _ in range(20):
+        await expect_rejected(strict, "unknown key id", other.mint("u"), quiet=True)
+    print(f"  20 unknown key ids -> {stub.state.fetches} extra key fetches")
+
+    await http_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    minter = FirebaseTokenMinter(PROJECT_ID)
+    jwks_app = create_jwks_stub(minter)
+    with StubServer(jwks_app, STUB_PORT) as stub:
+        os.environ["FIREBASE_PROJECT_ID"] = PROJECT_ID
+        os.environ["FIREBASE_JWKS_URL"] = f"{stub.url}/jwk"
+        asyncio.run(main(args, minter, jwks_app))
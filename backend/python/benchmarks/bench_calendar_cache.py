@@ -0,0 +1,81 @@
+"""
+Calendar tool latency: direct events.list per query versus the local
+sync-token cache, against a fake Google Calendar API with injectable latency.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_calendar_cache [--latency 0.15] [--queries 200]
+
+Also replays a push notification through /api/calendar/notifications (which
+refuses it without the channel token) and checks that the incremental sync
+picks up the change.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+
+from benchmarks.stubs import FakeCalendarAPI
+
+
+async def main(args):
+    import main as backend
+    from app.services.calendar_service import calendar_service
+
+    now = datetime.now(timezone.utc)
+    fake = FakeCalendarAPI(latency=args.latency)
+    for i in range(args.events):
+        fake.add_event(f"Event {i}", now + timedelta(hours=i - args.events // 4))
+
+    # Wire the fake API in place of googleapiclient
+    calendar_service.creds = SimpleNamespace(valid=True)
+    calendar_service.service = fake
+
+    # Baseline: one events.list round trip per calendar tool call
+    direct = []
+    for _ in range(min(args.queries, 10)):
+        start = time.perf_counter()
+        await asyncio.to_thread(fake.events().list(calendarId="primary", maxResults=5).execute)
+        direct.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await calendar_service.get_upcoming_events()
+    cold = time.perf_counter() - start
+
+    warm = []
+    for _ in range(args.queries):
+        start = time.perf_counter()
+        result = await calendar_service.get_upcoming_events()
+        warm.append(time.perf_counter() - start)
+    assert result.count("\n") == 4, result
+    today = await calendar_service.get_events_today()
+    assert today != "No events today." and "Event" in today, today
+
+    # Replay a push notification and confirm the incremental sync sees it
+    fake.add_event("Dentist", now + timedelta(minutes=5))
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        refused = await client.post("/api/calendar/notifications", headers={"X-Goog-Resource-State": "exists"})
+        assert refused.status_code == 403, refused.status_code
+        await client.post("/api/calendar/notifications", headers={
+            "X-Goog-Resource-State": "exists", "X-Goog-Channel-Token": os.environ["CALENDAR_WEBHOOK_TOKEN"],
+        })
+    assert "Dentist" in await calendar_service.get_upcoming_events(args.events)
+
+    print(f"direct events.list    p50={statistics.median(direct) * 1e3:9.3f} ms")
+    print(f"cold cache (full sync)     {cold * 1e3:9.3f} ms")
+    print(f"warm cache            p50={statistics.median(warm) * 1e6:9.1f} us")
+    print(f"sync counters: {calendar_service.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    os.environ["CALENDAR_WEBHOOK_TOKEN"] = "bench"
+    asyncio.run(main(parser.parse_args()))
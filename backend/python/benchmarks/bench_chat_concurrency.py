@@ -0,0 +1,53 @@
+"""
+Load benchmark for AIService.chat_with_gemini against a local stub LLM.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_chat_concurrency [--latency 0.2] [--requests 64]
+
+With a non-blocking inference path, throughput should scale roughly linearly
+with concurrency until LLM_MAX_CONCURRENCY is reached.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.stubs import StubServer, create_llm_stub
+
+STUB_PORT = 8101
+
+
+async def run_level(ai_service, concurrency: int, total: int) -> float:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            return await ai_service.chat_with_gemini(f"ping {i}", {}, [])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    from app.services.ai_service import AIService
+
+    ai_service = AIService()
+    print(f"stub latency={args.latency}s, requests per level={args.requests}, "
+          f"LLM_MAX_CONCURRENCY={ai_service.max_concurrency}")
+    for concurrency in (1, 2, 4, 8, 16, 32):
+        rps = await run_level(ai_service, concurrency, args.requests)
+        print(f"concurrency={concurrency:>3}  throughput={rps:8.2f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=64)
+    args = parser.parse_args()
+
+    with StubServer(create_llm_stub(latency=args.latency), STUB_PORT) as stub:
+        os.environ["GROQ_API_KEY"] = "stub"
+        os.environ["GROQ_BASE_URL"] = stub.url
+        os.environ["RESPONSE_CACHE"] = "false"
+        asyncio.run(main(args))
@@ -0,0 +1,82 @@
+"""
+Time-to-first-audio for the pipelined /api/chat/speak endpoint versus the
+sequential /api/chat then /api/tts/speak flow, against stub LLM and TTS servers.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_chat_speak [--requests 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stubs import StubServer, create_llm_stub, create_tts_stub
+
+LLM_PORT = 8103
+TTS_PORT = 8104
+APP_PORT = 8203
+
+REPLY = ("The weather looks clear today with a light breeze. "
+         "You have two meetings this afternoon, both on video. "
+         "Remember to pick up groceries on the way home. "
+         "Let me know if you want me to set a reminder.")
+
+
+async def sequential(client) -> float:
+    start = time.perf_counter()
+    chat = await client.post("/api/chat", json={"message": "brief me"})
+    await client.post("/api/tts/speak", json={"text": chat.json()["response"]})
+    return time.perf_counter() - start
+
+
+async def pipelined(client) -> tuple[float, float, bytes]:
+    start = time.perf_counter()
+    first = None
+    audio = b""
+    async with client.stream("POST", "/api/chat/speak", json={"message": "brief me"}) as response:
+        async for chunk in response.aiter_bytes():
+            if first is None:
+                first = time.perf_counter() - start
+            audio += chunk
+    return first, time.perf_counter() - start, audio
+
+
+async def main(args):
+    import main as backend
+
+    with StubServer(backend.app, APP_PORT) as server:
+        async with httpx.AsyncClient(base_url=server.url, timeout=60) as client:
+            seq, first_audio, total = [], [], []
+            for _ in range(args.requests):
+                seq.append(await sequential(client))
+                first, end, audio = await pipelined(client)
+                assert audio.startswith(b"<audio:The weather"), audio[:40]
+                first_audio.append(first)
+                total.append(end)
+
+    ms = lambda values: f"{statistics.median(values) * 1000:7.1f} ms"
+    print(f"sequential chat + tts   first audio p50={ms(seq)}")
+    print(f"pipelined /chat/speak   first audio p50={ms(first_audio)}  last audio p50={ms(total)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubServer(create_llm_stub(latency=0.3, reply=REPLY, token_delay=0.02), LLM_PORT) as llm, \
+            StubServer(create_tts_stub(), TTS_PORT) as tts:
+        os.environ.update({
+            "GROQ_API_KEY": "stub",
+            "GROQ_BASE_URL": llm.url,
+            "RESPONSE_CACHE": "false",
+            "ELEVENLABS_API_KEY": "stub",
+            "ELEVENLABS_BASE_URL": tts.url,
+            # Measure the pipeline itself, not the TTS audio cache
+            "TTS_CACHE_MAX_BYTES": "0",
+            "TTS_CACHE_DIR": "",
+        })
+        asyncio.run(main(args))
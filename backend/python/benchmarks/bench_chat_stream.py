@@ -0,0 +1,108 @@
+"""
+Harness for /api/chat/stream against a fake streaming LLM.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_chat_stream [--latency 0.3] [--token-delay 0.02]
+
+Checks that tokens arrive incrementally, that a [CMD: CALENDAR] marker emitted
+mid-stream triggers the calendar round-trip, and reports time-to-first-byte
+against total latency for /api/chat and /api/chat/stream.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stubs import StubServer, create_llm_stub
+
+STUB_PORT = 8102
+APP_PORT = 8202
+
+LONG_REPLY = ("Sure. Here is a fairly long answer that streams word by word, "
+              "so the first words should reach you long before the last ones. ") * 3
+
+
+def scripted_reply(body: dict) -> str:
+    """Emit a calendar marker on the first turn and summarise on the follow-up"""
+    last = body["messages"][-1]["content"]
+    if last.startswith("SYSTEM_TOOL_OUTPUT"):
+        return "You have nothing scheduled. Enjoy the free time."
+    if "schedule" in last:
+        return "Let me check your calendar. [CMD: CALENDAR] One moment."
+    return LONG_REPLY
+
+
+def parse_sse(raw: str) -> list[tuple[str, dict]]:
+    events = []
+    for frame in raw.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def timed_stream(client, message: str):
+    start = time.perf_counter()
+    first = None
+    raw = ""
+    async with client.stream("POST", "/api/chat/stream", json={"message": message}) as response:
+        async for chunk in response.aiter_text():
+            if first is None:
+                first = time.perf_counter() - start
+            raw += chunk
+    return first, time.perf_counter() - start, parse_sse(raw)
+
+
+async def main(args):
+    import main as backend
+
+    # Served over a real socket: httpx's ASGI transport buffers whole responses
+    with StubServer(backend.app, APP_PORT) as server:
+        async with httpx.AsyncClient(base_url=server.url, timeout=60) as client:
+            await run_checks(client, args)
+
+
+async def run_checks(client, args):
+    # Tool marker detection partway through the stream
+    _, _, events = await timed_stream(client, "what is on my schedule?")
+    names = [name for name, _ in events]
+    commands = [data["name"] for name, data in events if name == "command"]
+    assert commands == ["CALENDAR"], commands
+    assert names[-1] == "done", names
+    print(f"tool turn: {names.count('token')} token events, commands={commands}, "
+          f"final={events[-1][1]['response']!r}")
+
+    # TTFB: blocking endpoint vs streaming endpoint
+    blocking, stream_first, stream_total = [], [], []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        await client.post("/api/chat", json={"message": "tell me something"})
+        blocking.append(time.perf_counter() - start)
+
+        first, total, events = await timed_stream(client, "tell me something")
+        assert sum(name == "token" for name, _ in events) > 1
+        stream_first.append(first)
+        stream_total.append(total)
+
+    ms = lambda values: f"{statistics.median(values) * 1000:7.1f} ms"
+    print(f"/api/chat         time to response  p50={ms(blocking)}")
+    print(f"/api/chat/stream  time to 1st byte  p50={ms(stream_first)}")
+    print(f"/api/chat/stream  time to last byte p50={ms(stream_total)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+
+    stub_app = create_llm_stub(latency=args.latency, reply=scripted_reply, token_delay=args.token_delay)
+    with StubServer(stub_app, STUB_PORT) as stub:
+        os.environ["GROQ_API_KEY"] = "stub"
+        os.environ["GROQ_BASE_URL"] = stub.url
+        os.environ["RESPONSE_CACHE"] = "false"
+        asyncio.run(main(args))
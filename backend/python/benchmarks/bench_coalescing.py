@@ -0,0 +1,110 @@
+"""
+Concurrency check for single-flight coalescing in TTSService and AIService,
+against stub ElevenLabs and LLM servers.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_coalescing [--callers 50] [--keys 4]
+
+Fires `callers` identical requests per key at the same time and asserts that
+each key reaches the upstream exactly once. Also checks that a cancelled
+caller doesn't abort the shared call for the others, and that the call is
+cancelled once every caller has gone.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.stubs import StubServer, create_llm_stub, create_tts_stub
+
+LLM_PORT = 8119
+TTS_PORT = 8120
+
+
+async def burst(call, keys: int, callers: int) -> tuple[list, float]:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(call(k) for k in range(keys) for _ in range(callers)))
+    return results, time.perf_counter() - start
+
+
+async def check_tts(tts_service, stub, args):
+    stub.state.calls = 0
+    results, elapsed = await burst(lambda k: tts_service.text_to_speech(f"Good morning, device group {k}."), args.keys, args.callers)
+    assert all(results), "every caller gets audio"
+    assert stub.state.calls == args.keys, f"expected {args.keys} upstream TTS calls, got {stub.state.calls}"
+    print(f"tts   {args.keys * args.callers:>4} calls over {args.keys} phrases -> {stub.state.calls} upstream "
+          f"in {elapsed * 1000:.0f} ms  {tts_service.flights.stats()}")
+
+
+async def check_llm(ai_service, stub, args):
+    stub.state.calls = 0
+    context = {"currentTime": "08:00", "location": "Islamabad"}
+    results, elapsed = await burst(
+        lambda k: ai_service.chat_with_gemini(f"read today's announcement number {k} for everyone", context, []),
+        args.keys, args.callers,
+    )
+    assert not any(ai_service.is_error_response(r) for r in results), results[:3]
+    assert stub.state.calls == args.keys, f"expected {args.keys} upstream LLM calls, got {stub.state.calls}"
+    print(f"llm   {args.keys * args.callers:>4} calls over {args.keys} prompts -> {stub.state.calls} upstream "
+          f"in {elapsed * 1000:.0f} ms  {ai_service.flights.stats()}")
+
+
+async def check_cancellation():
+    from app.services.singleflight import SingleFlight
+
+    flights = SingleFlight("check")
+    started = 0
+    cancelled = asyncio.Event()
+
+    async def upstream():
+        nonlocal started
+        started += 1
+        try:
+            await asyncio.sleep(0.2)
+            return "ok"
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    # The first caller gives up; the one that joined still gets the result
+    first = asyncio.create_task(flights.do("a", upstream))
+    second = asyncio.create_task(flights.do("a", upstream))
+    await asyncio.sleep(0.05)
+    first.cancel()
+    assert await second == "ok" and started == 1 and not cancelled.is_set()
+
+    # With every caller gone the upstream call is abandoned
+    lone = asyncio.create_task(flights.do("b", upstream))
+    await asyncio.sleep(0.05)
+    lone.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert flights.in_flight == 0
+    print("cancel: a cancelled caller leaves the shared call running; the last one cancels it")
+
+
+async def main(args, tts_stub, llm_stub):
+    from app.services.tts_service import TTSService
+    from app.services.ai_service import AIService
+
+    await check_tts(TTSService(), tts_stub, args)
+    await check_llm(AIService(), llm_stub, args)
+    await check_cancellation()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--callers", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=4)
+    args = parser.parse_args()
+
+    llm_app = create_llm_stub(latency=0.3, reply="Today's announcement: the office closes early.", token_delay=0)
+    tts_app = create_tts_stub(latency=0.3)
+    with StubServer(llm_app, LLM_PORT) as llm, StubServer(tts_app, TTS_PORT) as tts:
+        os.environ["GROQ_API_KEY"] = "stub"
+        os.environ["GROQ_BASE_URL"] = llm.url
+        os.environ["ELEVENLABS_API_KEY"] = "stub"
+        os.environ["ELEVENLABS_BASE_URL"] = tts.url
+        os.environ["TTS_CACHE_DIR"] = ""
+        os.environ["RESPONSE_CACHE"] = "false"
+        os.environ["TOOL_PREFETCH"] = "false"
+        asyncio.run(main(args, tts_app, llm_app))
@@ -0,0 +1,185 @@
+"""
+Cold-start cost of the serverless entry point, per route.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_cold_start [--runs 5] [--update] [--tolerance 0.25]
+
+Every scenario runs in a fresh interpreter: import `main`, then send one
+request straight to the ASGI app (no lifespan, as on a serverless cold start).
+Reports the median time from `import main` to the response, the modules
+loaded, which heavy third-party packages were pulled in, and the slowest
+third-party imports from one `python -X importtime` run.
+
+Results are compared with benchmarks/baselines/cold_start.json; a scenario
+that got slower than the tolerance allows, or that now loads a heavy package
+it didn't before, is a regression (exit code 1). Timings are machine-specific:
+re-record with --update after an intended change or on new hardware.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "cold_start.json")
+# Packages whose presence on a route is worth flagging
+HEAVY = ("httpx", "numpy", "groq", "jwt", "cryptography", "firebase_admin", "googleapiclient", "google.auth", "av", "uvicorn")
+# Absolute slack on top of the relative tolerance, for timer noise on fast scenarios
+NOISE_MS = 30.0
+
+SCENARIOS = [
+    ("import main", None, None, None),
+    ("GET /api/health", "GET", "/api/health", None),
+    ("GET /api/tts/cache/stats", "GET", "/api/tts/cache/stats", None),
+    ("GET /api/calendar/stats", "GET", "/api/calendar/stats", None),
+    ("GET /api/chat/cache/stats", "GET", "/api/chat/cache/stats", None),
+    ("POST /api/chat", "POST", "/api/chat", {"message": "hello"}),
+    # Everything a long-running server loads at startup
+    ("all services", "ALL", None, None),
+]
+
+
+async def asgi_request(app, method: str, path: str, payload) -> int:
+    body = json.dumps(payload).encode() if payload is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "client": ("127.0.0.1", 1), "server": ("localhost", 80),
+        "headers": [(b"host", b"localhost"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+    }
+    pending = [{"type": "http.request", "body": body, "more_body": False}]
+    status = None
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await asyncio.Future()  # the client never disconnects
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def load_everything(main):
+    from app.services.providers import LazyService
+    for value in vars(main).values():
+        if isinstance(value, LazyService):
+            value._lazy_resolve()
+    main.init_firebase()
+    main.http_client.client
+
+
+def child(method: str, path: str, payload: str):
+    """Runs in the fresh interpreter; prints one JSON line"""
+    start = time.perf_counter()
+    import main
+    status = None
+    if method == "ALL":
+        load_everything(main)
+    elif method:
+        status = asyncio.run(asgi_request(main.app, method, path, json.loads(payload) if payload else None))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "ms": round(elapsed * 1000, 1),
+        "status": status,
+        "modules": len(sys.modules),
+        "heavy": [name for name in HEAVY if name in sys.modules],
+    }))
+
+
+def run_child(scenario, importtime: bool = False) -> tuple[dict, str]:
+    _, method, path, payload = scenario
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-m", "benchmarks.bench_cold_start", "--child", method or "", path or "", json.dumps(payload) if payload else ""]
+    # No upstream keys, so no route calls out; a set project ID keeps firebase_admin from probing for one
+    # and the memory job store leaves no database file behind
+    env = dict(os.environ, LAZY_SERVICES="true", LOG_LEVEL="ERROR", GROQ_API_KEY="", TTS_CACHE_DIR="",
+               FIREBASE_PROJECT_ID="jarvis-bench", JOB_STORE="memory")
+    done = subprocess.run(command, capture_output=True, text=True, env=env, check=True)
+    return json.loads(done.stdout.strip().splitlines()[-1]), done.stderr
+
+
+def slowest_imports(stderr: str, top: int = 4) -> list[tuple[str, float]]:
+    """Cumulative -X importtime cost of the top-level third-party packages"""
+    seen = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        if "." in name or name in sys.stdlib_module_names or name.startswith("_") or name in ("main", "app", "benchmarks"):
+            continue
+        # The outermost occurrence carries everything it imported
+        seen[name] = max(seen.get(name, 0.0), int(cumulative) / 1000)
+    return sorted(seen.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def compare(name: str, result: dict, baseline: dict, tolerance: float) -> list[str]:
+    previous = baseline.get(name)
+    if not previous:
+        return []
+    problems = []
+    allowed = previous["ms"] * (1 + tolerance) + NOISE_MS
+    if result["ms"] > allowed:
+        problems.append(f"{name}: {result['ms']:.0f} ms > {allowed:.0f} ms allowed (baseline {previous['ms']:.0f} ms)")
+    new_heavy = sorted(set(result["heavy"]) - set(previous["heavy"]))
+    if new_heavy:
+        problems.append(f"{name}: now imports {', '.join(new_heavy)}")
+    return problems
+
+
+def main(args):
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+
+    results, problems = {}, []
+    for scenario in SCENARIOS:
+        name = scenario[0]
+        runs = [run_child(scenario)[0] for _ in range(args.runs)]
+        result = dict(runs[0], ms=round(statistics.median(run["ms"] for run in runs), 1))
+        results[name] = result
+        _, stderr = run_child(scenario, importtime=True)
+        slow = ", ".join(f"{pkg} {ms:.0f}" for pkg, ms in slowest_imports(stderr))
+        previous = baseline.get(name, {}).get("ms")
+        delta = f"(baseline {previous:6.0f} ms)" if previous else ""
+        status = f"HTTP {result['status']}" if result["status"] else ""
+        print(f"{name:<27} {result['ms']:6.0f} ms {delta:<22} {status:<9} modules={result['modules']:<5} "
+              f"heavy=[{', '.join(result['heavy'])}]")
+        print(f"{'':<27} slowest imports (ms): {slow}")
+        problems += compare(name, result, baseline, args.tolerance)
+
+    if args.update:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {os.path.relpath(BASELINE)}")
+    elif problems:
+        print("\nREGRESSIONS:\n  " + "\n  ".join(problems))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(*sys.argv[2:5])
+        sys.exit(0)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update", action="store_true", help="record the current numbers as the baseline")
+    args = parser.parse_args()
+    main(args)
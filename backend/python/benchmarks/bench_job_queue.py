@@ -0,0 +1,205 @@
+"""
+Background job queue: chat latency with tool actions run inline versus
+queued, plus the queue's own guarantees. Uses a stub LLM that asks for
+Spotify playback on every turn and a stub Spotify API.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_job_queue [--requests 40] [--concurrency 8] [--latency 0.15]
+
+Reports p50/p95 chat latency both ways and, for queued runs, how long the
+playback itself took to land. Then checks that identical submissions share
+one job, that higher priorities jump the queue, that failures are retried
+with backoff, and that unfinished jobs survive a restart with the SQLite store.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.stubs import StubServer, create_llm_stub, create_spotify_stub
+
+LLM_PORT = 8122
+SPOTIFY_PORT = 8123
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def scripted_reply(body: dict) -> str:
+    song = body["messages"][-1]["content"].removeprefix("play ")
+    return f"Sure, putting on {song}. [CMD: SPOTIFY | {song}]"
+
+
+async def chat_run(label: str, background: bool, args, spotify_stub):
+    from app.services.ai_service import ai_service
+    from app.services.job_queue import job_queue
+    from app.services.tool_service import tool_registry
+
+    tool_registry.background = background
+    spotify_stub.state.plays = 0
+    gate = asyncio.Semaphore(args.concurrency)
+    chat_ms, landed_ms = [], []
+
+    async def one(i):
+        async with gate:
+            start = time.perf_counter()
+            reply, jobs = await ai_service.chat(f"play {label} song {i}", {}, [])
+            chat_ms.append((time.perf_counter() - start) * 1000)
+            for queued in jobs:
+                job = await job_queue.wait(queued["id"], timeout=30)
+                assert job.status == "done" and job.ok, job.to_dict()
+            landed_ms.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    assert spotify_stub.state.plays == args.requests, spotify_stub.state.plays
+    print(f"{label:<10} chat p50={statistics.median(chat_ms):7.1f} ms  p95={percentile(chat_ms, 0.95):7.1f} ms   "
+          f"playback started p50={statistics.median(landed_ms):7.1f} ms")
+
+
+async def check_dedupe(spotify_stub):
+    from app.services.job_queue import job_queue
+
+    spotify_stub.state.plays = 0
+    jobs = await asyncio.gather(*(job_queue.submit("SPOTIFY", "the same song") for _ in range(20)))
+    assert len({job.id for job in jobs}) == 1
+    await job_queue.wait(jobs[0].id, timeout=10)
+    assert spotify_stub.state.plays == 1, spotify_stub.state.plays
+    print(f"dedupe: 20 identical submissions -> 1 job, {spotify_stub.state.plays} play call")
+
+
+async def check_priorities():
+    from app.services.job_queue import JobQueue, JobHandler, MemoryJobStore, PRIORITY_HIGH, PRIORITY_LOW
+
+    order = []
+    release = asyncio.Event()
+
+    async def record(arg: str):
+        if arg == "blocker":
+            await release.wait()
+        order.append(arg)
+        return arg
+
+    queue = JobQueue(MemoryJobStore(), workers=1)
+    queue.register(JobHandler("RECORD", record))
+    blocker = await queue.submit("RECORD", "blocker")
+    await asyncio.sleep(0.01)  # the single worker is now busy
+    low = [await queue.submit("RECORD", f"low-{i}", priority=PRIORITY_LOW) for i in range(3)]
+    high = [await queue.submit("RECORD", f"high-{i}", priority=PRIORITY_HIGH) for i in range(3)]
+    release.set()
+    for job in [blocker, *low, *high]:
+        await queue.wait(job.id, timeout=5)
+    await queue.stop()
+    assert order == ["blocker", "high-0", "high-1", "high-2", "low-0", "low-1", "low-2"], order
+    print(f"priorities: {' -> '.join(order)}")
+
+
+async def check_retries():
+    from app.services.job_queue import JobQueue, JobHandler, MemoryJobStore
+
+    calls = {"flaky": 0, "broken": 0}
+
+    async def flaky(arg: str):
+        calls["flaky"] += 1
+        if calls["flaky"] < 3:
+            raise ConnectionError("upstream reset")
+        return "ok"
+
+    async def broken(arg: str):
+        calls["broken"] += 1
+        raise ConnectionError("upstream down")
+
+    async def slow(arg: str):
+        await asyncio.sleep(1)
+
+    queue = JobQueue(MemoryJobStore(), workers=2)
+    queue.register(JobHandler("FLAKY", flaky, max_attempts=3))
+    queue.register(JobHandler("BROKEN", broken, max_attempts=3))
+    queue.register(JobHandler("SLOW", slow, timeout=0.05, max_attempts=2))
+    start = time.perf_counter()
+    jobs = [await queue.submit(kind) for kind in ("FLAKY", "BROKEN", "SLOW")]
+    flaky_job, broken_job, slow_job = [await queue.wait(job.id, timeout=10) for job in jobs]
+    await queue.stop()
+    assert flaky_job.status == "done" and flaky_job.attempts == 3, flaky_job.to_dict()
+    assert broken_job.status == "failed" and broken_job.attempts == 3, broken_job.to_dict()
+    assert slow_job.status == "failed" and slow_job.error == "timed out", slow_job.to_dict()
+    print(f"retries: flaky done after {flaky_job.attempts} attempts, broken failed after {broken_job.attempts} "
+          f"({broken_job.error}), slow failed with '{slow_job.error}' in {time.perf_counter() - start:.2f} s")
+
+
+async def check_restart():
+    from app.services.job_queue import JobQueue, JobHandler, SQLiteJobStore
+
+    done = []
+    hang = asyncio.Event()
+
+    async def first_life(arg: str):
+        await hang.wait()  # the process "dies" with this job running
+
+    async def second_life(arg: str):
+        done.append(arg)
+        return f"handled {arg}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "jobs.db")
+        before = JobQueue(SQLiteJobStore(path), workers=1)
+        before.register(JobHandler("WORK", first_life))
+        jobs = [await before.submit("WORK", f"job-{i}") for i in range(5)]
+        await asyncio.sleep(0.05)
+        await before.stop()
+
+        after = JobQueue(SQLiteJobStore(path), workers=2)
+        after.register(JobHandler("WORK", second_life))
+        await after.start()
+        finished = [await after.wait(job.id, timeout=5) for job in jobs]
+        await after.stop()
+        assert all(job.status == "done" for job in finished), [job.to_dict() for job in finished]
+        print(f"restart: {after.recovered} unfinished jobs resumed from SQLite (1 was mid-run), "
+              f"{len(done)} completed")
+
+
+async def main(args, spotify_stub):
+    from app.services.http_client import http_client
+    from app.services.job_queue import job_queue
+    from app.services.spotify_service import spotify_service
+    from app.services.token_manager import TokenSet
+
+    spotify_service.tokens.set(TokenSet("stub", expires_at=time.time() + 3600))
+    try:
+        await chat_run("inline", False, args, spotify_stub)
+        await chat_run("queued", True, args, spotify_stub)
+        print(f"  queue: {job_queue.stats()}")
+        await check_dedupe(spotify_stub)
+        await check_priorities()
+        await check_retries()
+        await check_restart()
+    finally:
+        await job_queue.stop()
+        await http_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.15, help="Spotify stub latency per call")
+    args = parser.parse_args()
+
+    llm_app = create_llm_stub(latency=0.1, reply=scripted_reply, token_delay=0.0)
+    spotify_app = create_spotify_stub(latency=args.latency)
+    with StubServer(llm_app, LLM_PORT) as llm, StubServer(spotify_app, SPOTIFY_PORT) as spotify:
+        os.environ.update({
+            "GROQ_API_KEY": "stub",
+            "GROQ_BASE_URL": llm.url,
+            "RESPONSE_CACHE": "false",
+            "SPOTIFY_API_BASE_URL": f"{spotify.url}/v1",
+            "SPOTIFY_TOKEN_FILE": "",
+            "JOB_STORE": "memory",
+            "JOB_WORKERS": "16",
+            "JOB_RETRY_BACKOFF": "0.05",
+            "LOG_LEVEL": "ERROR",
+        })
+        asyncio.run(main(args, spotify_app))
@@ -0,0 +1,117 @@
+"""
+LLM router: hedged requests, provider fallback and circuit breaking.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_llm_router [--requests 300] [--concurrency 8]
+
+Runs two local OpenAI-compatible stubs as "groq" and a fallback provider:
+  1. Tail latency: both stubs answer in ~80 ms but 3% of requests take 1.5 s.
+     Compares p50/p95/p99 with hedging off and on, and the extra request rate.
+  2. Rate limiting: the primary answers every request with 429. All requests
+     should still succeed via the fallback, and the breaker should stop
+     traffic to the primary.
+  3. Flaky upstream: 30% of primary requests fail with 503.
+Also prints which tier a few sample messages are routed to.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from benchmarks.stubs import StubServer, create_llm_stub
+
+PRIMARY_PORT = 8117
+FALLBACK_PORT = 8118
+
+
+def tail_latency() -> float:
+    return 1.5 if random.random() < 0.03 else random.uniform(0.06, 0.1)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def run_load(router, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+    messages = [{"role": "user", "content": "hello"}]
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await router.complete(messages, "small", timeout=10)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies, failures
+
+
+def report(label, latencies, failures, stubs):
+    calls = " ".join(f"{name}={stub.state.calls}" for name, stub in stubs.items())
+    print(f"{label:<28} p50={statistics.median(latencies):6.0f} ms  p95={percentile(latencies, 95):6.0f} ms  "
+          f"p99={percentile(latencies, 99):6.0f} ms  failed={failures}  upstream calls: {calls}")
+
+
+def reset(stubs, error_rate=0.0):
+    for stub in stubs.values():
+        stub.state.calls = stub.state.errors = 0
+        stub.state.models = {}
+    stubs["primary"].state.error_rate = error_rate
+
+
+async def main(args, stubs):
+    from app.services import llm_router as module
+    from app.services.http_client import http_client
+
+    try:
+        for hedge in (False, True):
+            reset(stubs)
+            router = module.LLMRouter(hedge=hedge)
+            # Warm the latency trackers so the hedge delay is the measured p95
+            await run_load(router, 40, args.concurrency)
+            reset(stubs)
+            latencies, failures = await run_load(router, args.requests, args.concurrency)
+            report(f"tail latency, hedge={'on' if hedge else 'off'}", latencies, failures, stubs)
+            if hedge:
+                print(f"{'':<28} hedges={router.hedges} ({router.hedges / args.requests:.1%} extra requests), "
+                      f"won by the hedge: {router.hedge_wins}")
+
+        for label, status_rate in (("primary 429 on every call", 1.0), ("primary 503 on 30% of calls", 0.3)):
+            reset(stubs, error_rate=status_rate)
+            router = module.LLMRouter(hedge=True)
+            latencies, failures = await run_load(router, args.requests // 2, args.concurrency)
+            report(label, latencies, failures, stubs)
+            primary = router.stats()["providers"]["groq"]
+            print(f"{'':<28} fallbacks={router.fallbacks} primary breaker={primary['breaker']} "
+                  f"opens={primary['breaker_opens']} primary errors seen={primary['errors']}")
+
+        router = module.LLMRouter()
+        for message in ("hey jarvis", "thanks, that's great", "play some lofi music",
+                        "what's on my calendar tomorrow", "explain how vaccines train the immune system"):
+            print(f"tier {router.tier_for(message):<5} <- {message!r}")
+    finally:
+        await http_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    random.seed(7)
+
+    primary = create_llm_stub(latency=tail_latency, reply="Hi!", token_delay=0, error_status=429)
+    fallback = create_llm_stub(latency=tail_latency, reply="Hi!", token_delay=0)
+    with StubServer(primary, PRIMARY_PORT) as p, StubServer(fallback, FALLBACK_PORT) as f:
+        os.environ["GROQ_API_KEY"] = "stub"
+        os.environ["GROQ_BASE_URL"] = p.url
+        os.environ["LLM_FALLBACK_BASE_URL"] = f"{f.url}/openai/v1"
+        asyncio.run(main(args, {"primary": primary, "fallback": fallback}))
@@ -0,0 +1,465 @@
+"""
+End-to-end load test: the whole FastAPI app against stub upstreams, with a
+realistic mix of traffic, compared with a stored baseline.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_load [--rate 10] [--seconds 30] [--mix text=4,voice=2,tool=2,tts=2]
+                                    [--llm 0.25:0.9] [--whisper 0.3:1.0] [--tts 0.2:0.7] ...
+                                    [--update] [--tolerance 0.25]
+
+The app runs in its own process (uvicorn, serverless-style lazy services)
+with Groq chat and Whisper, ElevenLabs and Spotify served by local stubs
+and Google Calendar replaced by an in-process fake. Upstream latencies are
+fixed ("0.2") or log-normal ("median:p99", seconds) and seeded, so runs are
+repeatable.
+
+Requests arrive open loop at `--rate` per second from `--users` distinct
+clients, each one of:
+- text:  a streamed chat turn (/api/chat/stream)
+- voice: upload transcription, then spoken reply (/api/transcribe + /api/chat/speak)
+- tool:  a calendar question or a Spotify request, whose background job is awaited
+- tts:   /api/tts/speak of a common phrase (mostly cache hits)
+
+Reports throughput and p50/p95/p99 per route (plus time to first token,
+first audio and job completion), the app's event-loop lag and memory.
+Results are compared with benchmarks/baselines/load.json: a p95 that got
+slower than the tolerance allows (on routes with at least MIN_SAMPLES
+requests), more errors, more loop lag, a larger memory peak or lower
+throughput is a regression (exit code 1). Re-record with --update after an
+intended change or on new hardware; runs with a different configuration
+than the baseline are reported but not compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.stubs import StubServer, create_llm_stub, create_spotify_stub, create_tts_stub, parse_latency
+
+LLM_PORT = 8125
+TTS_PORT = 8126
+SPOTIFY_PORT = 8127
+APP_PORT = 8225
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "load.json")
+# Absolute slack on top of the relative tolerance, for timer noise on fast routes
+NOISE_MS = 20.0
+# Below this many samples a p95 is close to the maximum and too noisy to compare
+MIN_SAMPLES = 30
+
+TTS_PHRASES = [
+    "Good morning.", "Sure, one moment.", "Here is your schedule for today.", "Playing it now.",
+    "I couldn't find that.", "Your next meeting starts in ten minutes.", "Done.", "Anything else?",
+]
+TOPICS = ["the weather", "black holes", "sourdough", "the stock market", "jazz history", "marathon training",
+          "houseplants", "electric cars", "chess openings", "the Roman empire", "sleep", "coffee"]
+
+
+# --- Stub behaviour ---
+
+def scripted_reply(body: dict) -> str:
+    """Answer like the assistant would: tool markers for tool questions, prose otherwise"""
+    messages = body["messages"]
+    last = messages[-1]["content"]
+    if any("SYSTEM_TOOL_OUTPUT" in message["content"] for message in messages):
+        return "You have a few things on today. The first one is this morning, and the rest are after lunch."
+    if "calendar" in last:
+        return "Let me check. [CMD: CALENDAR]"
+    if last.startswith("play "):
+        return f"Sure, putting on {last[5:]}. [CMD: SPOTIFY | {last[5:]}]"
+    topic = last.rsplit(" about ", 1)[-1]
+    return (f"Here is a quick overview of {topic}. It has a longer history than most people think. "
+            f"The key ideas are simple once you see them laid out. Want me to go deeper on any part?")
+
+
+# --- App process ---
+
+class LoopMonitor:
+    """Samples event-loop lag every `interval` and process memory every few ticks"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.reset()
+
+    def reset(self):
+        self.lags = []
+        self.rss_start = self.rss_peak = self.rss()
+
+    @staticmethod
+    def rss() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(time.perf_counter() - start - self.interval)
+            if len(self.lags) % 10 == 0:
+                self.rss_peak = max(self.rss_peak, self.rss())
+
+    async def stats(self, reset: bool = False):
+        lags = sorted(self.lags) or [0.0]
+        result = {
+            "loop_lag_p50_ms": round(lags[len(lags) // 2] * 1000, 2),
+            "loop_lag_p99_ms": round(lags[min(int(len(lags) * 0.99), len(lags) - 1)] * 1000, 2),
+            "loop_lag_max_ms": round(lags[-1] * 1000, 2),
+            "rss_start_mb": round(self.rss_start / 2**20, 1),
+            "rss_end_mb": round(self.rss() / 2**20, 1),
+            "rss_peak_mb": round(self.rss_peak / 2**20, 1),
+        }
+        if reset:
+            self.reset()
+        return result
+
+
+def serve(port: int, calendar_latency: str, seed: int):
+    """Runs in the app process"""
+    import uvicorn
+    import main
+    from benchmarks.stubs import FakeCalendarAPI
+    from app.services.calendar_service import calendar_service
+    from app.services.spotify_service import spotify_service
+    from app.services.token_manager import TokenSet
+    from types import SimpleNamespace
+
+    fake = FakeCalendarAPI(latency=parse_latency(calendar_latency, seed))
+    now = datetime.now(timezone.utc)
+    for i in range(40):
+        fake.add_event(f"Event {i}", now + timedelta(hours=i - 10))
+    calendar_service.creds = SimpleNamespace(valid=True)
+    calendar_service.service = fake
+    spotify_service.tokens.set(TokenSet("stub", expires_at=time.time() + 3600))
+
+    monitor = LoopMonitor()
+    main.app.add_api_route("/__bench/stats", monitor.stats, methods=["GET"])
+
+    async def run():
+        sampler = asyncio.create_task(monitor.run())
+        server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+        await server.serve()
+        sampler.cancel()
+
+    asyncio.run(run())
+
+
+def start_app(args, llm_url: str, tts_url: str, spotify_url: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        GROQ_API_KEY="stub", GROQ_BASE_URL=llm_url,
+        ELEVENLABS_API_KEY="stub", ELEVENLABS_BASE_URL=tts_url,
+        SPOTIFY_API_BASE_URL=f"{spotify_url}/v1", SPOTIFY_TOKEN_FILE="",
+        # Serverless-style process; state that would outlive the run stays in memory
+        LAZY_SERVICES="true", JOB_STORE="memory", TTS_CACHE_DIR="", SESSION_STORE="memory",
+        # Distinct answers per question, so every chat turn reaches the LLM
+        RESPONSE_CACHE="false",
+        # Each simulated client gets its own rate-limit budget
+        TRUST_PROXY_HEADERS="true",
+        # Job polling needs a signed-in user; simulated clients send no token
+        SKIP_AUTH="true",
+        FIREBASE_PROJECT_ID="jarvis-bench", LOG_LEVEL="ERROR",
+    )
+    command = [sys.executable, "-m", "benchmarks.bench_load", "--serve", str(APP_PORT), args.calendar, str(args.seed)]
+    return subprocess.Popen(command, env=env)
+
+
+# --- Load generator ---
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.enabled = True
+
+    def add(self, name: str, seconds: float, ok: bool = True, status: int = 200):
+        if not self.enabled:
+            return
+        self.statuses[name][status] += 1
+        if ok:
+            self.latencies[name].append(seconds)
+        else:
+            self.errors[name] += 1
+
+
+async def timed_post(client, recorder: Recorder, name: str, user: str, **kwargs):
+    start = time.perf_counter()
+    response = await client.post(kwargs.pop("path"), headers={"X-Forwarded-For": user}, **kwargs)
+    recorder.add(name, time.perf_counter() - start, response.status_code == 200, response.status_code)
+    return response
+
+
+async def text_turn(client, recorder: Recorder, user: str, rng: random.Random):
+    message = f"tell me about {rng.choice(TOPICS)} #{rng.randrange(10**6)}"
+    start = time.perf_counter()
+    first = None
+    status = None
+    async with client.stream("POST", "/api/chat/stream", json={"message": message},
+                             headers={"X-Forwarded-For": user}) as response:
+        status = response.status_code
+        async for line in response.aiter_lines():
+            if first is None and line == "event: token":
+                first = time.perf_counter() - start
+            if line == "event: error":
+                status = 599
+    ok = status == 200
+    recorder.add("POST /api/chat/stream", time.perf_counter() - start, ok, status)
+    if ok and first is not None:
+        recorder.add("POST /api/chat/stream: first token", first)
+
+
+async def voice_turn(client, recorder: Recorder, user: str, rng: random.Random):
+    start = time.perf_counter()
+    audio = bytes(rng.randrange(16, 64) * 1024)
+    response = await timed_post(client, recorder, "POST /api/transcribe", user, path="/api/transcribe",
+                                files={"audio": ("voice.m4a", audio, "audio/m4a")})
+    if response.status_code != 200:
+        return
+    message = f"{response.json()['transcription']} about {rng.choice(TOPICS)} #{rng.randrange(10**6)}"
+    speak_start = time.perf_counter()
+    first = None
+    async with client.stream("POST", "/api/chat/speak", json={"message": message},
+                             headers={"X-Forwarded-For": user}) as speech:
+        async for _ in speech.aiter_bytes():
+            if first is None:
+                first = time.perf_counter() - speak_start
+        ok = speech.status_code == 200 and first is not None
+    recorder.add("POST /api/chat/speak", time.perf_counter() - speak_start, ok, speech.status_code)
+    if ok:
+        recorder.add("POST /api/chat/speak: first audio", first)
+        recorder.add("voice turn (end to end)", time.perf_counter() - start)
+
+
+async def tool_turn(client, recorder: Recorder, user: str, rng: random.Random):
+    if rng.random() < 0.5:
+        message = f"what's on my calendar today #{rng.randrange(10**6)}"
+        await timed_post(client, recorder, "POST /api/chat (calendar)", user, path="/api/chat", json={"message": message})
+        return
+    start = time.perf_counter()
+    response = await timed_post(client, recorder, "POST /api/chat (spotify)", user, path="/api/chat",
+                                json={"message": f"play song {rng.randrange(10**6)}"})
+    if response.status_code != 200:
+        return
+    for job in response.json().get("jobs", []):
+        done = await client.get(f"/api/jobs/{job['id']}", params={"wait": 20})
+        ok = done.status_code == 200 and done.json()["status"] == "done"
+        recorder.add("POST /api/chat (spotify): playback started", time.perf_counter() - start, ok, done.status_code)
+
+
+async def tts_turn(client, recorder: Recorder, user: str, rng: random.Random):
+    await timed_post(client, recorder, "POST /api/tts/speak", user, path="/api/tts/speak",
+                     json={"text": rng.choice(TTS_PHRASES)})
+
+
+WORKLOADS = {"text": text_turn, "voice": voice_turn, "tool": tool_turn, "tts": tts_turn}
+
+
+async def drive(client, args, mix: dict, recorder: Recorder, seconds: float, seed: int):
+    """Open loop: start `rate` workloads per second no matter how long earlier ones take"""
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    tasks = []
+    count = int(args.rate * seconds)
+    start = time.perf_counter()
+    for i in range(count):
+        await asyncio.sleep(max(0.0, start + i / args.rate - time.perf_counter()))
+        kind = rng.choices(kinds, weights)[0]
+        user = f"10.{i % args.users // 250}.{i % args.users % 250}.1"
+        task_rng = random.Random(rng.random())
+        tasks.append(asyncio.create_task(WORKLOADS[kind](client, recorder, user, task_rng)))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures and recorder.enabled:
+        recorder.errors["client exceptions"] += len(failures)
+        print(f"  {len(failures)} workloads raised, e.g. {failures[0]!r}")
+    return time.perf_counter() - start
+
+
+# --- Reporting ---
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def summarize(recorder: Recorder, elapsed: float, app: dict, upstream: dict) -> dict:
+    routes = {}
+    for name in sorted(set(recorder.latencies) | set(recorder.errors)):
+        values = recorder.latencies.get(name, [])
+        total = len(values) + recorder.errors.get(name, 0)
+        routes[name] = {
+            "count": total,
+            "error_rate": round(recorder.errors.get(name, 0) / total, 4) if total else 0.0,
+            "p50_ms": round(statistics.median(values) * 1000, 1) if values else None,
+            "p95_ms": round(percentile(values, 0.95) * 1000, 1) if values else None,
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1) if values else None,
+        }
+        if recorder.errors.get(name):
+            routes[name]["statuses"] = {str(status): n for status, n in recorder.statuses[name].items()}
+    # Derived timings ("route: first token") and whole workloads aren't requests of their own
+    requests = sum(route["count"] for name, route in routes.items() if name.startswith("POST") and ": " not in name)
+    return {"throughput_rps": round(requests / elapsed, 2), "routes": routes, "app": app, "upstream": upstream}
+
+
+def print_report(result: dict, baseline: dict):
+    previous = baseline.get("routes", {})
+    print(f"\n{'route':<44} {'n':>5} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}   baseline p95")
+    for name, route in result["routes"].items():
+        fmt = lambda value: f"{value:6.0f}ms" if value is not None else "      -"
+        base = previous.get(name, {}).get("p95_ms")
+        print(f"{name:<44} {route['count']:>5} {route['error_rate'] * 100:5.1f}% {fmt(route['p50_ms'])} "
+              f"{fmt(route['p95_ms'])} {fmt(route['p99_ms'])}   {fmt(base) if base else ''}")
+    app = result["app"]
+    print(f"\nthroughput {result['throughput_rps']} req/s   event-loop lag p50={app['loop_lag_p50_ms']} ms "
+          f"p99={app['loop_lag_p99_ms']} ms max={app['loop_lag_max_ms']} ms   "
+          f"RSS {app['rss_start_mb']} -> {app['rss_end_mb']} MB (peak {app['rss_peak_mb']} MB)")
+    print(f"upstream calls: {result['upstream']}")
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    problems = []
+    for name, route in result["routes"].items():
+        before = baseline["routes"].get(name)
+        if not before:
+            continue
+        if route["p95_ms"] is not None and before["p95_ms"] is not None and route["count"] >= MIN_SAMPLES:
+            allowed = before["p95_ms"] * (1 + tolerance) + NOISE_MS
+            if route["p95_ms"] > allowed:
+                problems.append(f"{name}: p95 {route['p95_ms']:.0f} ms > {allowed:.0f} ms allowed "
+                                f"(baseline {before['p95_ms']:.0f} ms)")
+        if route["error_rate"] > before["error_rate"] + 0.01:
+            problems.append(f"{name}: error rate {route['error_rate']:.1%} (baseline {before['error_rate']:.1%})")
+    app, before = result["app"], baseline["app"]
+    allowed = before["loop_lag_p99_ms"] * (1 + tolerance) + 5
+    if app["loop_lag_p99_ms"] > allowed:
+        problems.append(f"event-loop lag p99 {app['loop_lag_p99_ms']} ms > {allowed:.1f} ms allowed")
+    allowed = before["rss_peak_mb"] * (1 + tolerance)
+    if app["rss_peak_mb"] > allowed:
+        problems.append(f"RSS peak {app['rss_peak_mb']} MB > {allowed:.0f} MB allowed")
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        problems.append(f"throughput {result['throughput_rps']} req/s (baseline {baseline['throughput_rps']})")
+    return problems
+
+
+async def wait_until_up(client):
+    for _ in range(300):
+        try:
+            if (await client.get("/api/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("app did not start")
+
+
+async def run(args, mix: dict, stubs: dict) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=60, limits=limits) as client:
+        await wait_until_up(client)
+        recorder = Recorder()
+        # Warm up (imports, pools, caches) without recording
+        recorder.enabled = False
+        await drive(client, args, mix, recorder, args.warmup, seed=args.seed + 1000)
+        await client.get("/__bench/stats", params={"reset": True})
+        for stub in stubs.values():
+            for name in ("calls", "transcriptions", "searches", "plays"):
+                if hasattr(stub.state, name):
+                    setattr(stub.state, name, 0)
+        recorder.enabled = True
+        elapsed = await drive(client, args, mix, recorder, args.seconds, seed=args.seed)
+        app = (await client.get("/__bench/stats")).json()
+    upstream = {
+        "llm_chat": stubs["llm"].state.calls,
+        "whisper": stubs["llm"].state.transcriptions,
+        "tts": stubs["tts"].state.calls,
+        "spotify_search": stubs["spotify"].state.searches,
+        "spotify_play": stubs["spotify"].state.plays,
+    }
+    return summarize(recorder, elapsed, app, upstream)
+
+
+def main(args):
+    mix = {kind: float(weight) for kind, weight in (item.split("=") for item in args.mix.split(","))}
+    unknown = set(mix) - set(WORKLOADS)
+    if unknown:
+        sys.exit(f"unknown workloads: {', '.join(sorted(unknown))}")
+    config = {key: getattr(args, key) for key in ("rate", "seconds", "users", "mix", "seed", "llm", "token_delay",
+                                                   "whisper", "tts", "spotify", "calendar")}
+
+    stubs = {
+        "llm": create_llm_stub(latency=parse_latency(args.llm, args.seed), reply=scripted_reply,
+                               token_delay=args.token_delay,
+                               transcription_latency=parse_latency(args.whisper, args.seed + 1)),
+        "tts": create_tts_stub(latency=parse_latency(args.tts, args.seed + 2), per_char=0.001),
+        "spotify": create_spotify_stub(latency=parse_latency(args.spotify, args.seed + 3)),
+    }
+    with StubServer(stubs["llm"], LLM_PORT) as llm, StubServer(stubs["tts"], TTS_PORT) as tts, \
+            StubServer(stubs["spotify"], SPOTIFY_PORT) as spotify:
+        app = start_app(args, llm.url, tts.url, spotify.url)
+        try:
+            print(f"{args.rate} workloads/s for {args.seconds:.0f} s (after {args.warmup:.0f} s warm-up), mix {mix}, "
+                  f"{args.users} users")
+            result = asyncio.run(run(args, mix, stubs))
+        finally:
+            app.terminate()
+            app.wait(timeout=10)
+    result["config"] = config
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+    comparable = baseline.get("config") == config
+    print_report(result, baseline if comparable else {})
+
+    if args.update:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {os.path.relpath(BASELINE)}")
+    elif not baseline:
+        print("no baseline yet; record one with --update")
+    elif not comparable:
+        print("configuration differs from the baseline's; not compared")
+    else:
+        problems = compare(result, baseline, args.tolerance)
+        if problems:
+            print("\nREGRESSIONS:\n  " + "\n  ".join(problems))
+            sys.exit(1)
+        print("no regressions against the baseline")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve(int(sys.argv[2]), sys.argv[3], int(sys.argv[4]))
+        sys.exit(0)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=10.0, help="workloads started per second")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--mix", default="text=4,voice=2,tool=2,tts=2")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--llm", default="0.25:0.9", help="LLM time to first token, seconds (median:p99)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="gap between streamed tokens")
+    parser.add_argument("--whisper", default="0.3:1.0")
+    parser.add_argument("--tts", default="0.2:0.7")
+    parser.add_argument("--spotify", default="0.1:0.4")
+    parser.add_argument("--calendar", default="0.15:0.5")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update", action="store_true", help="record the current results as the baseline")
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+"""
+Per-request CPU for prompt assembly: cached prefix vs rebuilding the f-string.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_prompt_assembly [--iterations 20000] [--turns 0,10,40]
+
+"before" re-creates what chat_with_gemini used to do: format the whole system
+prompt and copy every history turn into a new dict. "after" is the current
+AIService path (memoized prefix message, small context message, clean turns
+reused as-is). Both share the same history budgeting, including its memoized
+token counts, so the difference is prompt assembly alone. Also checks that the
+prefix is byte-identical across requests whose time/location differ.
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ["RESPONSE_CACHE"] = "false"
+
+from app.services.ai_service import ai_service
+from app.services.prompt_service import PREFIX_TEMPLATE, CONTEXT_TEMPLATE, system_messages
+
+
+def legacy_build(context, user_message, history):
+    system_prompt = PREFIX_TEMPLATE.format(
+        assistant_name=context.get('assistantName', 'JARVIS'), user_name=context.get('userName', 'the user')
+    ) + CONTEXT_TEMPLATE.format(time=context.get('currentTime', 'unknown'), location=context.get('location', 'unknown'))
+    messages = [{"role": "system", "content": system_prompt}]
+    turns = [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in history or []
+        if msg.get("role") in ["user", "assistant"] and isinstance(msg.get("content"), str)
+    ]
+    summary, recent = ai_service.history.prepare(turns, None)
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+    messages.extend(recent)
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+
+def current_build(context, user_message, history):
+    return ai_service._build_messages(system_messages(context), user_message, history, None)
+
+
+def measure(build, history, iterations):
+    contexts = [
+        {"assistantName": "JARVIS", "userName": "Saad", "currentTime": f"2026-01-01 10:{i % 60:02d}", "location": "Islamabad"}
+        for i in range(60)
+    ]
+    start = time.process_time()
+    for i in range(iterations):
+        build(contexts[i % 60], "what's on my calendar today?", history)
+    cpu_us = (time.process_time() - start) / iterations * 1e6
+
+    # Peak transient allocation while assembling one prompt
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    build(contexts[0], "what's on my calendar today?", history)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_us, peak - base
+
+
+def main(args):
+    first = system_messages({"currentTime": "09:00", "location": "Lahore"})
+    second = system_messages({"currentTime": "17:45", "location": "Karachi"})
+    assert first[0]["content"].encode() == second[0]["content"].encode()
+    print(f"stable prefix: {len(first[0]['content'].encode())} bytes, identical across requests")
+
+    for n in (int(x) for x in args.turns.split(",")):
+        history = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}: a short message about something"}
+            for i in range(n)
+        ]
+        before_us, before_bytes = measure(legacy_build, history, args.iterations)
+        after_us, after_bytes = measure(current_build, history, args.iterations)
+        print(f"history={n:>3}  before {before_us:7.2f} us/req  after {after_us:7.2f} us/req  "
+              f"({before_us / after_us:4.2f}x)  peak alloc {before_bytes / 1024:5.1f} KB -> {after_bytes / 1024:5.1f} KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--turns", default="0,10,40")
+    main(parser.parse_args())
@@ -0,0 +1,145 @@
+"""
+Rate limiting and admission control under overload, against a stub LLM.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_rate_limit [--capacity 8] [--latency 0.2] [--overload 3] [--seconds 5]
+
+The upstream serves `capacity` requests at a time (LLM_MAX_CONCURRENCY), each
+taking `latency` seconds. Many distinct users then offer `overload` times
+that throughput, open loop, to /api/chat:
+
+- without admission control every request is accepted, queues inside the
+  service, and latency grows with the backlog for as long as the overload lasts;
+- with it, the LLM gate admits what the upstream can serve within
+  ADMIT_MAX_WAIT and sheds the rest with 503 + Retry-After, so the latency
+  of accepted requests stays bounded.
+
+A second run has one user flooding the endpoint next to quiet users: the
+flood is throttled to the per-user budget (429 + Retry-After) once its
+burst allowance is spent, and every quiet request is still served, within
+ADMIT_MAX_WAIT of the upstream time even while the flood's burst holds the gate.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from collections import Counter
+
+from benchmarks.stubs import StubServer, create_llm_stub
+
+STUB_PORT = 8124
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else float("nan")
+
+
+def summary(label: str, latencies: list[float], statuses: Counter, retry_after: list[str]) -> str:
+    served = f"p50={statistics.median(latencies) * 1000:7.0f} ms  p95={percentile(latencies, 0.95) * 1000:7.0f} ms  " \
+             f"p99={percentile(latencies, 0.99) * 1000:7.0f} ms  max={max(latencies) * 1000:7.0f} ms" if latencies else "none served"
+    retry = f"  Retry-After {min(retry_after)}-{max(retry_after)} s" if retry_after else ""
+    return f"{label:<24} {dict(sorted(statuses.items()))}  200s: {served}{retry}"
+
+
+async def post(client, message: str, user: str):
+    start = time.perf_counter()
+    response = await client.post("/api/chat", json={"message": message}, headers={"X-Forwarded-For": user})
+    return response.status_code, time.perf_counter() - start, response.headers.get("retry-after")
+
+
+async def open_loop(client, rate: float, seconds: float, label: str):
+    """Fire `rate` requests per second from distinct users regardless of how fast they complete"""
+    latencies, statuses, retry_after = [], Counter(), []
+
+    async def one(i):
+        status, elapsed, retry = await post(client, f"{label} question {i}", f"10.0.{i // 250}.{i % 250}")
+        statuses[status] += 1
+        if status == 200:
+            latencies.append(elapsed)
+        if retry:
+            retry_after.append(retry)
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(int(rate * seconds)):
+        await asyncio.sleep(max(0.0, start + i / rate - time.perf_counter()))
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+    return latencies, statuses, retry_after
+
+
+async def noisy_neighbour(client, seconds: float):
+    noisy, noisy_served, quiet = Counter(), [], []
+    noisy_retry = []
+    deadline = time.perf_counter() + seconds
+
+    async def flood():
+        while time.perf_counter() < deadline:
+            status, elapsed, retry = await post(client, f"flood {time.perf_counter()}", "10.9.9.9")
+            noisy[status] += 1
+            if status == 200:
+                noisy_served.append(elapsed)
+            if retry:
+                noisy_retry.append(retry)
+                await asyncio.sleep(0.05)  # a misbehaving client that ignores Retry-After
+
+    async def polite(user: int):
+        i = 0
+        while time.perf_counter() < deadline:
+            status, elapsed, _ = await post(client, f"quiet {user} {i}", f"10.8.0.{user}")
+            assert status == 200, status
+            quiet.append(elapsed)
+            i += 1
+            await asyncio.sleep(1.0)
+
+    await asyncio.gather(*(flood() for _ in range(20)), *(polite(user) for user in range(10)))
+    print(summary("flooding user", noisy_served, noisy, noisy_retry))
+    print(summary("quiet users (10)", quiet, Counter({200: len(quiet)}), []))
+
+
+async def main(args):
+    import httpx
+    import main as server
+    from app.utils.rate_limit import rate_limiter
+
+    rate = args.overload * args.capacity / args.latency
+    print(f"upstream capacity {args.capacity / args.latency:.0f} req/s, offered {rate:.0f} req/s for {args.seconds:.0f} s")
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        rate_limiter.enabled = False
+        print(summary("no admission control", *await open_loop(client, rate, args.seconds, "off")))
+        await asyncio.sleep(1)
+        rate_limiter.enabled = True
+        print(summary("admission control", *await open_loop(client, rate, args.seconds, "on")))
+        print(f"  gate: {rate_limiter.gates['llm'].stats()}")
+        await asyncio.sleep(1)
+        await noisy_neighbour(client, args.seconds)
+        print(f"  limiter: delayed={rate_limiter.delayed} limited={rate_limiter.limited}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--overload", type=float, default=3.0)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with StubServer(create_llm_stub(latency=args.latency, token_delay=0.0), STUB_PORT) as stub:
+        os.environ.update({
+            "GROQ_API_KEY": "stub",
+            "GROQ_BASE_URL": stub.url,
+            "RESPONSE_CACHE": "false",
+            "TOOL_PREFETCH": "false",
+            "LLM_MAX_CONCURRENCY": str(args.capacity),
+            "LLM_TIMEOUT": "120",
+            "ADMIT_LLM_CONCURRENCY": str(args.capacity),
+            "ADMIT_LLM_MAX_QUEUE": str(args.capacity * 2),
+            "ADMIT_LLM_MAX_WAIT": "1.0",
+            "TRUST_PROXY_HEADERS": "true",
+            "LAZY_SERVICES": "true",
+            "LOG_LEVEL": "ERROR",
+        })
+        asyncio.run(main(args))
@@ -0,0 +1,86 @@
+"""
+Serial vs speculative calendar tool turns against a stub LLM and a fake
+Google Calendar API.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_speculative_prefetch [--llm-latency 0.3] [--requests 10]
+
+Serial: LLM call -> calendar fetch -> LLM call.
+Speculative: the intent rules start the calendar fetch before the first
+inference and, when confident, inject the data so one LLM call suffices.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from benchmarks.stubs import FakeCalendarAPI, StubServer, create_llm_stub
+
+STUB_PORT = 8106
+
+MESSAGES = [
+    "What's on my calendar today?",    # confident -> injected
+    "Am I free tomorrow?",             # weak -> parallel prefetch
+    "Tell me a joke about robots.",    # no prediction
+]
+
+
+def scripted_reply(body: dict) -> str:
+    contents = [m["content"] for m in body["messages"]]
+    if any(c.startswith("SYSTEM_TOOL_OUTPUT") for c in contents):
+        return "You have a standup at ten and lunch with Sam."
+    last_user = contents[-1].lower()
+    if "calendar" in last_user or "free" in last_user:
+        return "Let me look. [CMD: CALENDAR]"
+    return "Why did the robot cross the road? It was programmed to."
+
+
+async def run(ai_service, message: str, requests: int) -> float:
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await ai_service.chat_with_gemini(message, {}, [])
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def main(args):
+    from app.services.ai_service import AIService
+    from app.services.calendar_service import calendar_service
+    from app.services.prefetch_service import tool_prefetcher
+
+    fake = FakeCalendarAPI(latency=args.calendar_latency)
+    now = datetime.now(timezone.utc)
+    for i in range(20):
+        fake.add_event(f"Event {i}", now + timedelta(hours=i))
+    calendar_service.creds = SimpleNamespace(valid=True)
+    calendar_service.service = fake
+    await calendar_service.get_upcoming_events()  # warm the local index
+
+    ai_service = AIService()
+    for message in MESSAGES:
+        tool_prefetcher.enabled = False
+        serial = await run(ai_service, message, args.requests)
+        tool_prefetcher.enabled = True
+        speculative = await run(ai_service, message, args.requests)
+        print(f"{message!r:34} serial p50={serial * 1e3:7.1f} ms  speculative p50={speculative * 1e3:7.1f} ms")
+
+    print(f"prefetch stats: {tool_prefetcher.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--calendar-latency", type=float, default=0.15)
+    parser.add_argument("--requests", type=int, default=10)
+    args = parser.parse_args()
+
+    stub_app = create_llm_stub(latency=args.llm_latency, reply=scripted_reply, token_delay=0)
+    with StubServer(stub_app, STUB_PORT) as stub:
+        os.environ["GROQ_API_KEY"] = "stub"
+        os.environ["GROQ_BASE_URL"] = stub.url
+        os.environ["RESPONSE_CACHE"] = "false"
+        asyncio.run(main(args))
@@ -0,0 +1,76 @@
+"""
+Spotify play latency with the search cache and batch queueing, against a local stub.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_spotify_cache [--latency 0.15] [--songs 4]
+
+Compares a cold play (search + play) with a repeat of the same request, which
+should skip the search round-trip, and a multi-song request resolved
+concurrently and started with one play call against playing the songs one by
+one. The stub counts upstream calls so the savings are visible directly.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.stubs import StubServer, create_spotify_stub
+
+STUB_PORT = 8114
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - start) * 1000
+
+
+async def main(args, stub):
+    from app.services.http_client import http_client
+    from app.services.spotify_service import spotify_service
+    from app.services.token_manager import TokenSet
+
+    spotify_service.tokens.set(TokenSet("stub", expires_at=time.time() + 3600))
+    songs = [f"bench song {i}" for i in range(args.songs)]
+    try:
+        reply, cold_ms = await timed(spotify_service.play_music("Bohemian Rhapsody"))
+        _, warm_ms = await timed(spotify_service.play_music("bohemian   rhapsody!"))
+        assert reply.startswith("Playing"), reply
+        print(f"single play   cold {cold_ms:6.1f} ms   repeat {warm_ms:6.1f} ms   "
+              f"searches={stub.state.searches} plays={stub.state.plays}")
+
+        stub.state.searches = stub.state.plays = 0
+        start = time.perf_counter()
+        for song in songs:
+            await spotify_service.play_music(f"{song} sequential")
+        sequential_ms = (time.perf_counter() - start) * 1000
+        print(f"{args.songs} songs one by one   {sequential_ms:6.1f} ms   "
+              f"searches={stub.state.searches} plays={stub.state.plays}")
+
+        stub.state.searches = stub.state.plays = 0
+        reply, batch_ms = await timed(spotify_service.play_music("; ".join(songs)))
+        assert len(stub.state.last_uris) == args.songs, stub.state.last_uris
+        print(f"{args.songs} songs batched      {batch_ms:6.1f} ms   "
+              f"searches={stub.state.searches} plays={stub.state.plays}")
+
+        stub.state.searches = stub.state.plays = 0
+        _, repeat_ms = await timed(spotify_service.play_music("; ".join(songs)))
+        print(f"{args.songs} songs batched again {repeat_ms:6.1f} ms   "
+              f"searches={stub.state.searches} plays={stub.state.plays}")
+        print(f"reply: {reply}")
+        print(f"cache: {spotify_service.search_cache.stats()}")
+    finally:
+        await http_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--songs", type=int, default=4)
+    args = parser.parse_args()
+
+    stub_app = create_spotify_stub(latency=args.latency)
+    with StubServer(stub_app, STUB_PORT) as stub:
+        os.environ["SPOTIFY_API_BASE_URL"] = f"{stub.url}/v1"
+        os.environ["SPOTIFY_TOKEN_FILE"] = ""
+        asyncio.run(main(args, stub_app))
@@ -0,0 +1,91 @@
+"""
+Spotify token refresh: proactive vs on-expiry, and coalescing under concurrency.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_spotify_tokens [--latency 0.15] [--concurrency 20]
+
+Against the local Spotify stub (token endpoint included) it measures the first
+search after the access token expires in three situations:
+  - revoked server-side: 401, refresh, retry (the only path before this change)
+  - expired locally: refreshed inline before the request
+  - refreshed in the background ahead of expiry: no extra round-trip
+then fires concurrent requests at a revoked token and counts how many refresh
+calls reach the token endpoint (should be 1). Tokens persist to a temp file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.stubs import StubServer, create_spotify_stub
+
+STUB_PORT = 8115
+
+
+async def timed_search(spotify_service, query: str) -> float:
+    start = time.perf_counter()
+    track = await spotify_service.search_track(query)
+    assert track, query
+    return (time.perf_counter() - start) * 1000
+
+
+async def main(args, stub, token_file):
+    from app.services import token_manager
+    from app.services.http_client import http_client
+    from app.services.spotify_service import spotify_service
+    from app.services.token_manager import TokenSet
+
+    tokens = spotify_service.tokens
+    try:
+        # Seed a refresh token the way the OAuth callback would
+        tokens.set(TokenSet("expired-token", "refresh-seed", time.time() + 3600))
+        stub.state.revoked.add("expired-token")
+        tokens.start()
+
+        await timed_search(spotify_service, "warm up connection")  # 401 -> refresh -> retry
+        stub.state.revoked.add(tokens.access_token)
+        retry_ms = await timed_search(spotify_service, "after revoke")
+
+        tokens.tokens.expires_at = time.time() - 1
+        inline_ms = await timed_search(spotify_service, "after local expiry")
+
+        # Expiry inside the refresh margin: the background task refreshes right away
+        token_manager.REFRESH_MARGIN = 5
+        tokens.set(TokenSet(tokens.access_token, tokens.tokens.refresh_token, time.time() + 1))
+        await asyncio.sleep(1.5 + args.latency)
+        proactive_ms = await timed_search(spotify_service, "after background refresh")
+
+        print(f"first search after expiry  401+retry {retry_ms:6.1f} ms   "
+              f"inline refresh {inline_ms:6.1f} ms   proactive {proactive_ms:6.1f} ms")
+
+        before = stub.state.token_refreshes
+        stub.state.revoked.add(tokens.access_token)
+        await asyncio.gather(*(timed_search(spotify_service, f"concurrent {i}") for i in range(args.concurrency)))
+        print(f"{args.concurrency} concurrent requests on a revoked token -> "
+              f"{stub.state.token_refreshes - before} refresh call(s)   stats={tokens.stats()}")
+
+        with open(token_file) as f:
+            saved = json.load(f)
+        assert saved["access_token"] == tokens.access_token
+        print(f"persisted: {token_file} (mode {oct(os.stat(token_file).st_mode & 0o777)})")
+    finally:
+        tokens.stop()
+        await http_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    stub_app = create_spotify_stub(latency=args.latency)
+    with StubServer(stub_app, STUB_PORT) as stub, tempfile.TemporaryDirectory() as tmp:
+        token_file = os.path.join(tmp, "spotify_tokens.json")
+        os.environ["SPOTIFY_API_BASE_URL"] = f"{stub.url}/v1"
+        os.environ["SPOTIFY_TOKEN_URL"] = f"{stub.url}/api/token"
+        os.environ["SPOTIFY_TOKEN_FILE"] = token_file
+        os.environ["SPOTIFY_SEARCH_CACHE_SIZE"] = "0"
+        asyncio.run(main(args, stub_app, token_file))
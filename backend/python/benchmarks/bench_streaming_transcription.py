@@ -0,0 +1,105 @@
+"""
+Harness for the /api/transcribe/stream WebSocket with a stub transcriber and
+a stub LLM.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_streaming_transcription [--wav recording.wav]
+
+Streams audio in 20 ms frames at real-time pace: a 16 kHz mono 16-bit WAV
+recording if given, otherwise a synthetic fixture of speech-like bursts
+separated by pauses. Prints each message with its arrival time on the audio
+clock: partial transcripts should land shortly after each burst ends, long
+before the audio finishes, and the chat reply starts on its own once the
+trailing pause ends the turn.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from benchmarks.stubs import StubServer, create_llm_stub
+
+STUB_PORT = 8112
+SAMPLE_RATE = 16000
+
+
+def synthetic_fixture() -> np.ndarray:
+    """Three 'utterance' bursts of band-limited noise, then a long pause"""
+    rng = np.random.default_rng(7)
+
+    def speech(seconds):
+        noise = rng.normal(0, 6000, int(SAMPLE_RATE * seconds))
+        return np.convolve(noise, np.ones(8) / 8, mode="same")
+
+    def silence(seconds):
+        return rng.normal(0, 30, int(SAMPLE_RATE * seconds))
+
+    parts = [silence(0.3), speech(1.2), silence(0.7), speech(0.9), silence(0.8), speech(1.5), silence(2.0)]
+    return np.clip(np.concatenate(parts), -32768, 32767).astype("<i2")
+
+
+def load_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as wav:
+        assert wav.getnchannels() == 1 and wav.getsampwidth() == 2 and wav.getframerate() == SAMPLE_RATE, \
+            "expected 16 kHz mono 16-bit WAV"
+        return np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+
+
+async def stub_transcribe(samples: np.ndarray, sample_rate: int) -> str:
+    await asyncio.sleep(0.25)
+    return f"[{len(samples) / sample_rate:.1f}s of speech]"
+
+
+def main(args):
+    import main as backend
+    from app.services import streaming_transcription
+
+    streaming_transcription.whisper_transcribe = stub_transcribe
+    audio = load_wav(args.wav) if args.wav else synthetic_fixture()
+    frame = SAMPLE_RATE // 50  # 20 ms
+
+    with TestClient(backend.app) as client:
+        with client.websocket_connect(f"/api/transcribe/stream?sample_rate={SAMPLE_RATE}") as ws:
+            ws.send_text(json.dumps({"type": "config", "context": {"assistantName": "Jarvis"}}))
+            start = time.perf_counter()
+
+            def read():
+                while True:
+                    message = ws.receive_json()
+                    at = time.perf_counter() - start
+                    if message["type"] in ("partial", "final"):
+                        print(f"{message['type']:>7} @ {at:5.2f}s  {message['text']}")
+                    elif message["type"] == "chat" and message["event"] == "done":
+                        print(f"   chat @ {at:5.2f}s  {message['data']['response']!r}")
+                        return
+                    elif message["type"] == "error" or message.get("event") == "error":
+                        print(f"  error @ {at:5.2f}s  {message}")
+                        return
+
+            reader = threading.Thread(target=read)
+            reader.start()
+            for offset in range(0, len(audio), frame):
+                ws.send_bytes(audio[offset:offset + frame].tobytes())
+                time.sleep(0.02 * args.pace)
+            sent = time.perf_counter()
+            reader.join(timeout=30)
+    print(f"audio duration {len(audio) / SAMPLE_RATE:.1f}s, streamed in {sent - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wav")
+    parser.add_argument("--pace", type=float, default=1.0, help="1.0 = real time, 0 = as fast as possible")
+    args = parser.parse_args()
+
+    with StubServer(create_llm_stub(latency=0.2, reply="Got it, here is my answer."), STUB_PORT) as stub:
+        os.environ["GROQ_API_KEY"] = "stub"
+        os.environ["GROQ_BASE_URL"] = stub.url
+        os.environ["RESPONSE_CACHE"] = "false"
+        main(args)
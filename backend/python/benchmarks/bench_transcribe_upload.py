@@ -0,0 +1,82 @@
+"""
+Memory under concurrent /api/transcribe uploads against a stub Whisper API.
+
+Usage (from backend/python):
+    python -m benchmarks.bench_transcribe_upload [--size-mb 8] [--levels 1,4,8,16]
+
+Reports the peak Python heap (tracemalloc) per concurrency level. Uploads are
+spooled to temp files and streamed to the upstream, so the peak should stay
+roughly flat instead of growing by one full upload per concurrent request.
+Also checks that an oversized upload is refused with 413.
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+import httpx
+
+from benchmarks.stubs import StubServer, create_llm_stub
+
+STUB_PORT = 8111
+APP_PORT = 8211
+
+
+def audio_stream(size: int, chunk: int = 64 * 1024):
+    """Multipart body generated on the fly so the client holds no full copy"""
+    boundary = "benchboundary"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"audio\"; filename=\"voice.m4a\"\r\n"
+            f"Content-Type: audio/m4a\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    block = b"\0" * chunk
+
+    async def body():
+        yield head
+        sent = 0
+        while sent < size:
+            n = min(chunk, size - sent)
+            yield block[:n]
+            sent += n
+        yield tail
+
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    return headers, body()
+
+
+async def upload(client, size: int) -> int:
+    headers, body = audio_stream(size)
+    response = await client.post("/api/transcribe", content=body, headers=headers)
+    return response.status_code
+
+
+async def main(args):
+    import main as backend
+
+    size = int(args.size_mb * 1024 * 1024)
+    with StubServer(backend.app, APP_PORT) as server:
+        async with httpx.AsyncClient(base_url=server.url, timeout=120) as client:
+            assert await upload(client, backend.transcription.MAX_UPLOAD_BYTES + 1) == 413
+
+            tracemalloc.start()
+            for level in (int(x) for x in args.levels.split(",")):
+                tracemalloc.reset_peak()
+                start = time.perf_counter()
+                codes = await asyncio.gather(*(upload(client, size) for _ in range(level)))
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                assert all(code == 200 for code in codes), codes
+                print(f"concurrency={level:>3}  uploaded={level * args.size_mb:6.1f} MB  "
+                      f"peak heap={peak / 1024 / 1024:7.2f} MB  elapsed={elapsed:5.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=float, default=8)
+    parser.add_argument("--levels", default="1,4,8,16")
+    args = parser.parse_args()
+
+    with StubServer(create_llm_stub(latency=0.2), STUB_PORT) as stub:
+        os.environ["GROQ_API_KEY"] = "stub"
+        os.environ["GROQ_BASE_URL"] = stub.url
+        asyncio.run(main(args))
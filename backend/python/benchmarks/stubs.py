@@ -0,0 +1,336 @@
+"""
+Local stand-ins for upstream APIs so benchmarks never touch the real services.
+Each stub is a tiny FastAPI app with an injectable latency: fixed seconds, or a
+distribution such as `lognormal(median, p99)`.
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import timedelta
+import uvicorn
+from typing import Callable, Union
+from fastapi import FastAPI, Request
+from starlette.requests import ClientDisconnect
+from fastapi.responses import Response, StreamingResponse
+
+
+Latency = Union[float, Callable[[], float]]
+
+
+def lognormal(median: float, p99: float, seed: int = None) -> Callable[[], float]:
+    """Latency distribution with the given median and 99th percentile (seconds)"""
+    rng = random.Random(seed)
+    sigma = math.log(p99 / median) / 2.326 if p99 > median else 0.0
+    return lambda: median * math.exp(sigma * rng.gauss(0.0, 1.0))
+
+
+def parse_latency(spec: str, seed: int = None) -> Latency:
+    """"0.2" is a fixed 200 ms; "0.2:0.8" a log-normal with median 0.2 s and p99 0.8 s"""
+    if ":" in spec:
+        median, p99 = (float(part) for part in spec.split(":"))
+        return lognormal(median, p99, seed)
+    return float(spec)
+
+
+def draw(latency: Latency) -> float:
+    return latency() if callable(latency) else latency
+
+
+def split_tokens(text: str) -> list[str]:
+    """Rough word-level tokenization that keeps whitespace attached"""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def create_llm_stub(
+    latency: Latency = 0.2,
+    reply: Union[str, Callable[[dict], str]] = "Hello from the stub LLM.",
+    token_delay: float = 0.01,
+    error_rate: float = 0.0,
+    error_status: int = 429,
+    transcription_latency: Latency = None,
+) -> FastAPI:
+    """Groq/OpenAI-compatible chat completions (and Whisper transcription) endpoint.
+
+    `latency` is the time before the first byte (a float, or a callable drawn
+    per request for a latency distribution), `token_delay` the gap between
+    streamed chunks. `reply` may be a callable receiving the request body, so a
+    harness can script tool markers per turn. A fraction `error_rate` of chat
+    requests fail with `error_status`. Whisper uploads take
+    `transcription_latency` (default: `latency`). `stub.state` counts calls
+    per model.
+    """
+    stub = FastAPI()
+    stub.state.calls = 0
+    stub.state.errors = 0
+    stub.state.models = {}
+    stub.state.error_rate = error_rate
+    stub.state.transcriptions = 0
+
+    async def stream_reply(body: dict, content: str):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        for i, token in enumerate(split_tokens(content)):
+            if i:
+                await asyncio.sleep(token_delay)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @stub.post("/openai/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        # Drain the upload without holding it in memory
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+        stub.state.transcriptions += 1
+        await asyncio.sleep(draw(latency if transcription_latency is None else transcription_latency))
+        return {"text": f"stub transcription of {received} bytes"}
+
+    @stub.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            # A hedged or cancelled call that gave up before sending its body
+            return Response(status_code=499)
+        stub.state.calls += 1
+        model = body.get("model", "stub")
+        stub.state.models[model] = stub.state.models.get(model, 0) + 1
+        if stub.state.error_rate and random.random() < stub.state.error_rate:
+            stub.state.errors += 1
+            return Response(status_code=error_status, headers={"retry-after": "1"} if error_status == 429 else None)
+        content = reply(body) if callable(reply) else reply
+        await asyncio.sleep(draw(latency))
+        if body.get("stream"):
+            return StreamingResponse(stream_reply(body, content), media_type="text/event-stream")
+        # A blocking completion still pays for generating every token
+        await asyncio.sleep(token_delay * max(len(split_tokens(content)) - 1, 0))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    return stub
+
+
+def create_tts_stub(latency: Latency = 0.3, per_char: float = 0.002) -> FastAPI:
+    """ElevenLabs-compatible text-to-speech endpoint returning fake audio bytes"""
+    stub = FastAPI()
+    stub.state.calls = 0
+
+    @stub.post("/v1/text-to-speech/{voice_id}")
+    async def text_to_speech(voice_id: str, request: Request):
+        body = await request.json()
+        stub.state.calls += 1
+        await asyncio.sleep(draw(latency) + per_char * len(body["text"]))
+        return Response(content=f"<audio:{body['text']}>".encode(), media_type="audio/mpeg")
+
+    return stub
+
+
+def create_spotify_stub(latency: Latency = 0.15, token_ttl: int = 3600) -> FastAPI:
+    """Spotify Web API search + playback endpoints, plus the accounts token endpoint.
+
+    Every query resolves to a deterministic fake track. Tokens issued by
+    /api/token are accepted until `token_ttl` passes or they are listed in
+    `stub.state.revoked`; any other bearer token is accepted too, so
+    harnesses can skip the OAuth dance. `stub.state` counts calls and keeps
+    the URIs of the last play request.
+    """
+    stub = FastAPI()
+    stub.state.searches = 0
+    stub.state.plays = 0
+    stub.state.token_refreshes = 0
+    stub.state.last_uris = []
+    stub.state.issued = {}  # access token -> expiry (monotonic)
+    stub.state.revoked = set()
+
+    def authorized(request: Request) -> bool:
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        expires = stub.state.issued.get(token)
+        return token not in stub.state.revoked and (expires is None or expires > time.monotonic())
+
+    @stub.post("/api/token")
+    async def token(request: Request):
+        form = await request.form()
+        stub.state.token_refreshes += 1
+        await asyncio.sleep(draw(latency))
+        access_token = f"access-{uuid.uuid4().hex}"
+        stub.state.issued[access_token] = time.monotonic() + token_ttl
+        body = {"access_token": access_token, "token_type": "Bearer", "expires_in": token_ttl}
+        if form.get("grant_type") == "authorization_code":
+            body["refresh_token"] = f"refresh-{uuid.uuid4().hex}"
+        return body
+
+    @stub.get("/v1/search")
+    async def search(request: Request, q: str, type: str = "track", limit: int = 1):
+        if not authorized(request):
+            return Response(status_code=401)
+        stub.state.searches += 1
+        await asyncio.sleep(draw(latency))
+        track_id = uuid.uuid5(uuid.NAMESPACE_URL, q.lower()).hex[:22]
+        item = {"uri": f"spotify:track:{track_id}", "name": q.title()}
+        return {"tracks": {"items": [item][:limit]}}
+
+    @stub.put("/v1/me/player/play")
+    async def play(request: Request):
+        if not authorized(request):
+            return Response(status_code=401)
+        body = await request.json()
+        stub.state.plays += 1
+        stub.state.last_uris = body.get("uris", [])
+        await asyncio.sleep(draw(latency))
+        return Response(status_code=204)
+
+    return stub
+
+class FirebaseTokenMinter:
+    """Signs Firebase-style ID tokens with locally generated RSA keys.
+
+    `jwks` is the public half in the format Google serves, so the verifier can
+    be pointed at create_jwks_stub(minter) instead of googleapis.com.
+    """
+
+    def __init__(self, project_id: str = "jarvis-bench", keys: int = 2):
+        import jwt
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        self.project_id = project_id
+        self._private = {}
+        self.jwks = {"keys": []}
+        for _ in range(keys):
+            kid = uuid.uuid4().hex
+            private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+            self._private[kid] = private_key
+            public = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+            self.jwks["keys"].append({**public, "kid": kid, "alg": "RS256", "use": "sig"})
+
+    def mint(self, uid: str, ttl: int = 3600, kid: str = None, **overrides) -> str:
+        import jwt
+
+        kid = kid or next(iter(self._private))
+        now = int(time.time())
+        claims = {
+            "iss": f"https://securetoken.google.com/{self.project_id}",
+            "aud": self.project_id,
+            "auth_time": now - 60,
+            "sub": uid,
+            "user_id": uid,
+            "iat": now,
+            "exp": now + ttl,
+        }
+        claims.update(overrides)
+        private_key = self._private.get(kid) or next(iter(self._private.values()))
+        return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+def create_jwks_stub(minter: FirebaseTokenMinter, max_age: int = 3600, latency: float = 0.1) -> FastAPI:
+    """Google's securetoken JWK endpoint, with a Cache-Control max-age (`stub.state.max_age`)"""
+    stub = FastAPI()
+    stub.state.fetches = 0
+    stub.state.max_age = max_age
+
+    @stub.get("/jwk")
+    async def jwk():
+        stub.state.fetches += 1
+        await asyncio.sleep(draw(latency))
+        return Response(
+            content=json.dumps(minter.jwks),
+            media_type="application/json",
+            headers={"Cache-Control": f"public, max-age={stub.state.max_age}, must-revalidate, no-transform"},
+        )
+
+    return stub
+
+class FakeCalendarAPI:
+    """Stand-in for the googleapiclient Calendar resource (events().list().execute()).
+
+    Supports paging and syncToken incremental sync: a sync token returns only
+    events changed since it was issued.
+    """
+
+    def __init__(self, latency: Latency = 0.15, page_size: int = 250):
+        self.latency = latency
+        self.page_size = page_size
+        self.version = 0
+        self.events_by_id = {}
+        self.calls = 0
+
+    def add_event(self, summary: str, start, duration_minutes: int = 30) -> dict:
+        self.version += 1
+        event = {
+            "id": uuid.uuid4().hex,
+            "status": "confirmed",
+            "summary": summary,
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": (start + timedelta(minutes=duration_minutes)).isoformat()},
+            "_version": self.version,
+        }
+        self.events_by_id[event["id"]] = event
+        return event
+
+    def events(self):
+        return self
+
+    def list(self, calendarId="primary", syncToken=None, pageToken=None, maxResults=250, **_):
+        return _FakeRequest(self, syncToken, pageToken, min(maxResults, self.page_size))
+
+
+class _FakeRequest:
+    def __init__(self, api: FakeCalendarAPI, sync_token, page_token, page_size):
+        self.api, self.sync_token, self.page_token, self.page_size = api, sync_token, page_token, page_size
+
+    def execute(self):
+        self.api.calls += 1
+        time.sleep(draw(self.api.latency))
+        since = int(self.sync_token) if self.sync_token else 0
+        changed = sorted(
+            (e for e in self.api.events_by_id.values() if e["_version"] > since),
+            key=lambda e: e["start"]["dateTime"],
+        )
+        offset = int(self.page_token or 0)
+        page = changed[offset:offset + self.page_size]
+        result = {"items": page}
+        if offset + self.page_size < len(changed):
+            result["nextPageToken"] = str(offset + self.page_size)
+        else:
+            result["nextSyncToken"] = str(self.api.version)
+        return result
+
+
+class StubServer:
+    """Run a stub app with uvicorn on a background thread"""
+
+    def __init__(self, app: FastAPI, port: int):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
@@ -1,24 +1,88 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, RedirectResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
-import uvicorn
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Import routers
-from app.routers import health, transcription, tts
-from app.services.ai_service import ai_service
+from app.routers import health, transcription, tts, calendar, jobs
+from app.services.http_client import http_client
+from app.services.providers import LazyService, is_loaded
+from app.utils.helpers import cancel_on_disconnect, sse_event
+from app.utils.auth import verify_firebase_token, init_firebase
+from app.services.firebase_auth import firebase_verifier
+from app.utils.limits import BodySizeLimitMiddleware
+from app.utils.rate_limit import RateLimitMiddleware, rate_limiter
+from app.utils.timing import RequestTimingMiddleware
+from app.utils.log import get_logger
+
+# Each service (and its SDKs) is imported and built on first use, so a cold
+# start only pays for what the invoked route needs
+ai_service = LazyService("app.services.ai_service", "ai_service")
+tts_service = LazyService("app.services.tts_service", "tts_service")
+spotify_service = LazyService("app.services.spotify_service", "spotify_service")
+calendar_service = LazyService("app.services.calendar_service", "calendar_service")
+tool_prefetcher = LazyService("app.services.prefetch_service", "tool_prefetcher")
+response_cache = LazyService("app.services.response_cache", "response_cache")
+session_store = LazyService("app.services.session_store", "session_store")
+job_queue = LazyService("app.services.job_queue", "job_queue")
+
+log = get_logger("main")
+
+# Serverless cold starts (Vercel sets VERCEL=1) skip the startup warm-ups below,
+# which would otherwise load every service before the first request
+LAZY_SERVICES = os.getenv("LAZY_SERVICES", "true" if os.getenv("VERCEL") else "false") == "true"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client for Spotify/ElevenLabs, kept alive across requests
+    warmups = []
+    if not LAZY_SERVICES:
+        # The pool is otherwise created by the first outbound call
+        await http_client.start()
+        # Pre-render common phrases in the background so startup isn't delayed
+        warmups.append(asyncio.create_task(tts_service.warm_up()))
+        # Keep OAuth access tokens fresh so requests never wait on a refresh
+        spotify_service.tokens.start()
+        calendar_service.tokens.start()
+        # Firebase is set up once here so no request pays for it; the signing keys are fetched ahead of the first login
+        try:
+            init_firebase()
+        except Exception as e:
+            log.warning("Firebase init failed: %s", e)
+        warmups.append(asyncio.create_task(firebase_verifier.warm_up()))
+        # Resume jobs a previous process left unfinished
+        await job_queue.start()
+    yield
+    for task in warmups:
+        task.cancel()
+    for service in (spotify_service, calendar_service):
+        if is_loaded(service):
+            service.tokens.stop()
+    if is_loaded(job_queue):
+        # Jobs still queued or running stay in the store for the next start
+        await job_queue.stop()
+    await http_client.close()
 
 app = FastAPI(
     title="JARVIS Backend API",
     description="Backend services for JARVIS AI Assistant",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# CORS middleware
+# Bound uploads while they stream in, before they are spooled
+app.add_middleware(BodySizeLimitMiddleware, limits={"/api/transcribe": transcription.MAX_UPLOAD_BYTES})
+# Per-user budgets and per-upstream admission queues; refusals carry Retry-After
+app.add_middleware(RateLimitMiddleware)
+
+# CORS middleware (outside the limits above, so browsers can read their refusals)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,6 +90,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it is outermost and also times requests rejected by the middleware above
+app.add_middleware(RequestTimingMiddleware)
 
 # Include routers
 app.include_router(health.router, prefix="/api", tags=["Health"])
@@ -45,17 +111,30 @@ async def spotify_callback(code: str):
     if success:
         return "Spotify Connected Successfully! You can close this tab."
     return "Failed to connect Spotify."
+
+@app.get("/api/spotify/cache/stats")
+async def spotify_cache_stats():
+    """Hit-rate of the search query -> track URI cache"""
+    return spotify_service.search_cache.stats()
 # ----------------------------------------------
 app.include_router(tts.router, prefix="/api/tts", tags=["Text-to-Speech"])
+app.include_router(calendar.router, prefix="/api/calendar", tags=["Calendar"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
 
 class ChatRequest(BaseModel):
     message: str
     context: Optional[Dict[str, Any]] = None
     history: Optional[list[Dict[str, str]]] = []
+    # Lets the server keep a rolling summary of turns that fall outside the history window
+    conversation_id: Optional[str] = None
+    # Server-side session: when set, history is loaded from the session store instead
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
     success: bool
+    # Tool actions queued in the background: [{"id": ..., "tool": ...}], see /api/jobs/{id}
+    jobs: list[Dict[str, str]] = []
 
 @app.get("/")
 async def root():
@@ -65,15 +144,107 @@ async def root():
         "status": "running"
     }
 
+async def resolve_history(request: ChatRequest, http_request: Request, authorization: Optional[str]):
+    """Return (history, session key, conversation id): the stored session when
+    session_id is set, otherwise the history the client sent. The conversation
+    id keys the rolling summary and is scoped to the caller (uid, or client
+    address when unauthenticated) so one user can't read another's summary."""
+    if request.session_id:
+        from app.services.session_store import session_key
+        uid = await verify_firebase_token(authorization)
+        key = session_key(uid, request.session_id)
+        return await session_store.get(key), key, key
+    conversation_id = None
+    if request.conversation_id:
+        conversation_id = f"{await rate_limiter.identify(http_request.scope)}:{request.conversation_id}"
+    return request.history, None, conversation_id
+
+async def record_turn(key: Optional[str], message: str, response: str):
+    if key and response and not ai_service.is_error_response(response):
+        await session_store.append(key, [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": response},
+        ])
+
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request, authorization: Optional[str] = Header(None)):
     """Chat endpoint for AI conversations"""
     try:
-        response = await ai_service.chat_with_gemini(request.message, request.context or {}, request.history)
-        return ChatResponse(response=response, success=True)
+        history, key, conversation_id = await resolve_history(request, http_request, authorization)
+        # Drop the upstream LLM call if the client hangs up mid-inference
+        response, queued = await cancel_on_disconnect(
+            http_request,
+            ai_service.chat(request.message, request.context or {}, history, conversation_id)
+        )
+        await record_turn(key, request.message, response)
+        return ChatResponse(response=response, success=True, jobs=queued)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request, authorization: Optional[str] = Header(None)):
+    """Streaming chat endpoint: tokens as Server-Sent Events"""
+    history, key, conversation_id = await resolve_history(request, http_request, authorization)
+
+    async def event_source():
+        async for event in ai_service.stream_chat(request.message, request.context or {}, history, conversation_id):
+            if event["event"] == "done":
+                await record_turn(key, request.message, event["data"]["response"])
+            yield sse_event(event["event"], event["data"])
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/chat/cache/stats")
+async def response_cache_stats():
+    """Hit-rate counters for the exact/semantic response cache"""
+    return response_cache.stats()
+
+@app.get("/api/chat/prefetch/stats")
+async def prefetch_stats():
+    """Hit-rate and wasted-prefetch counters for speculative tool fetches"""
+    return tool_prefetcher.stats()
+
+@app.post("/api/chat/speak")
+async def chat_speak(request: ChatRequest, http_request: Request, authorization: Optional[str] = Header(None)):
+    """Chat and speak in one pipelined call: each finished sentence goes to TTS
+    while the LLM keeps generating, and audio streams back in order."""
+    from app.services.tts_service import SentenceSplitter
+    history, key, conversation_id = await resolve_history(request, http_request, authorization)
+
+    async def sentences():
+        splitter = SentenceSplitter()
+        async for event in ai_service.stream_chat(request.message, request.context or {}, history, conversation_id):
+            if event["event"] == "done":
+                await record_turn(key, request.message, event["data"]["response"])
+            elif event["event"] == "token":
+                for sentence in splitter.feed(event["data"]["text"]):
+                    yield sentence
+            elif event["event"] == "error":
+                yield event["data"]["message"]
+        for sentence in splitter.flush():
+            yield sentence
+
+    return StreamingResponse(tts_service.stream_speech(sentences()), media_type="audio/mpeg")
+
+@app.get("/api/chat/sessions/{session_id}")
+async def get_session(session_id: str, uid: str = Depends(verify_firebase_token)):
+    """Stored messages for one of the caller's sessions"""
+    from app.services.session_store import session_key
+    return {"session_id": session_id, "messages": await session_store.get(session_key(uid, session_id))}
+
+@app.delete("/api/chat/sessions/{session_id}")
+async def delete_session(session_id: str, uid: str = Depends(verify_firebase_token)):
+    from app.services.session_store import session_key
+    await session_store.delete(session_key(uid, session_id))
+    return {"success": True}
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
 
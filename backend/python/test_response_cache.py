@@ -0,0 +1,40 @@
+from app.services.response_cache import ResponseCache
+
+CONTEXT = {"assistantName": "Jarvis", "userName": "Tony", "location": "Malibu"}
+
+
+def test_rewording_is_a_semantic_hit():
+    cache = ResponseCache()
+    cache.put("What's the capital of France?", CONTEXT, "Paris.")
+    assert cache.get("Can you tell me the capital of France please", CONTEXT) == "Paris."
+    assert cache.get("Explain how a rainbow forms", CONTEXT) is None
+    cache.put("Explain how a rainbow forms", CONTEXT, "Refraction.")
+    assert cache.get("explain how rainbows form", CONTEXT) == "Refraction."
+    assert cache.semantic_hits == 2
+
+
+def test_other_entities_numbers_and_order_miss():
+    cache = ResponseCache()
+    cache.put("What is the capital of France", CONTEXT, "Paris.")
+    cache.put("Convert 5 km to miles", CONTEXT, "3.1 miles.")
+    cache.put("Dog bites man on the street", CONTEXT, "Not news.")
+    assert cache.get("What is the capital of Spain", CONTEXT) is None
+    assert cache.get("Convert 50 km to miles", CONTEXT) is None
+    assert cache.get("Man bites dog on the street", CONTEXT) is None
+
+
+def test_context_is_hashed_not_registered():
+    cache = ResponseCache()
+    cache.put("What is the capital of France", CONTEXT, "Paris.")
+    for i in range(1000):
+        cache.get("What is the capital of France", {**CONTEXT, "userName": f"user{i}"})
+    assert not any(isinstance(value, dict) and len(value) >= 1000 for value in vars(cache).values())
+    assert cache.get("What is the capital of France", dict(CONTEXT)) == "Paris."
+    assert cache.get("What is the capital of France", {**CONTEXT, "location": "Queens"}) is None
+
+
+if __name__ == "__main__":
+    test_rewording_is_a_semantic_hit()
+    test_other_entities_numbers_and_order_miss()
+    test_context_is_hashed_not_registered()
+    print("response cache OK")
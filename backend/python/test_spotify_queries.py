@@ -0,0 +1,17 @@
+from app.services.spotify_service import split_queries
+
+
+def test_titles_containing_then_are_not_split():
+    assert split_queries("Now and Then by The Beatles") == ["Now and Then by The Beatles"]
+    assert split_queries("And Then There Were None") == ["And Then There Were None"]
+    assert split_queries("Hello, Goodbye") == ["Hello, Goodbye"]
+
+
+def test_semicolon_separates_queries():
+    assert split_queries("Now and Then; Hey Jude ;Let It Be;") == ["Now and Then", "Hey Jude", "Let It Be"]
+
+
+if __name__ == "__main__":
+    test_titles_containing_then_are_not_split()
+    test_semicolon_separates_queries()
+    print("split_queries OK")